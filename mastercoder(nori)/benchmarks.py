@@ -0,0 +1,822 @@
+"""بنچمارک‌های سامانه آموزشی
+
+نمونه اجرا:
+    python benchmarks.py startup --students 30000
+    python benchmarks.py stress --workers 32 --capacity 25 --mode process
+    python benchmarks.py search --students 30000 --courses 5000
+    python benchmarks.py conflicts --courses 5000 --students 200
+    python benchmarks.py memory --students 50000 --per-student 10
+    python benchmarks.py passwords --target-ms 250 --burst 20
+    python benchmarks.py instrumentation --rounds 2000
+    python benchmarks.py cart --students 2000 --picks 6
+    python benchmarks.py loadtest --students 5000 --workers 32 --output before.json
+    python benchmarks.py loadtest --students 5000 --workers 32 --compare before.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+
+from unimastercoder import (PASSWORD_ITERATIONS, DatabaseManager, LatencyHistogram, Metrics, UniversitySystem,
+                            hash_password, parse_schedule, verify_password)
+
+# هدف زمان راه‌اندازی (ساخت UniversitySystem) برای یک دانشگاه ۳۰ هزار نفره
+STARTUP_TARGET_SECONDS = 1.0
+# هدف تأخیر ورود (صدک ۹۵) در زمان اوج ثبت‌نام
+LOGIN_TARGET_MS = 250
+PASSWORD_COSTS = (50000, 100000, 200000, 400000, 600000)
+
+DAYS = ["شنبه", "یکشنبه", "دوشنبه", "سه‌شنبه", "چهارشنبه", "پنجشنبه"]
+SLOTS = [(8, 10), (10, 12), (12, 14), (14, 16), (16, 18)]
+DEPARTMENTS = ["کامپیوتر", "ریاضی", "فیزیک", "زبان", "برق", "عمران"]
+PERSIAN_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+
+
+def _persian(value):
+    return str(value).translate(PERSIAN_DIGITS)
+
+
+def seed_university(db_name, students=30000, courses=600, professors=150, per_student=5, capacity=(30, 400), seed=42):
+    """ساخت یک دانشگاه مصنوعی بزرگ در پایگاه داده"""
+    DatabaseManager(db_name).close()  # ایجاد جداول
+    rng = random.Random(seed)
+
+    professor_rows = [(f"P{i:05d}", f"استاد {i}", "123456", rng.choice(DEPARTMENTS)) for i in range(professors)]
+
+    course_rows = []
+    for i in range(courses):
+        pid, name, _, department = rng.choice(professor_rows)
+        days = " و ".join(sorted(rng.sample(DAYS, rng.choice([1, 2])), key=DAYS.index))
+        start, end = rng.choice(SLOTS)
+        course_rows.append((
+            f"C{i:05d}", f"درس {i}", name, pid, rng.choice([2, 3, 3, 3, 4]),
+            rng.randint(*capacity), 0, f"{days} {_persian(start)}-{_persian(end)}",
+            department, _persian(rng.randint(100, 400)),
+            f"۱۴۰۴/{_persian(rng.randint(3, 4)).rjust(2, '۰')}/{_persian(rng.randint(1, 30)).rjust(2, '۰')}",
+            "approved"
+        ))
+
+    student_rows = [
+        (f"{1400 + i % 5}{i:06d}", f"دانشجو {i}", "123456", rng.choice(DEPARTMENTS),
+         f"s{i}@uni.ac.ir", str(1400 + i % 5), 0)
+        for i in range(students)
+    ]
+
+    course_codes = [row[0] for row in course_rows]
+    enrollment_rows = [
+        (sid, code)
+        for sid, *_ in student_rows
+        for code in rng.sample(course_codes, min(per_student, len(course_codes)))
+    ]
+
+    conn = sqlite3.connect(db_name)
+    with conn:
+        conn.executemany('INSERT OR IGNORE INTO professors (pid, name, password, department) VALUES (?, ?, ?, ?)', professor_rows)
+        conn.executemany('''
+            INSERT OR IGNORE INTO courses (course_code, course_name, professor, professor_id, units, capacity, current_students,
+                                           schedule, department, classroom, exam_date, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', course_rows)
+        conn.executemany('''
+            INSERT OR IGNORE INTO students (sid, name, password, major, email, entry_year, total_units)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', student_rows)
+        conn.executemany('INSERT OR IGNORE INTO student_courses (student_id, course_code) VALUES (?, ?)', enrollment_rows)
+
+        # شمارنده‌ها یک بار و به صورت مجموعه‌ای محاسبه می‌شوند
+        conn.execute('''
+            UPDATE courses SET current_students = (
+                SELECT COUNT(*) FROM student_courses sc WHERE sc.course_code = courses.course_code
+            )
+        ''')
+        conn.execute('''
+            UPDATE students SET total_units = (
+                SELECT COALESCE(SUM(c.units), 0) FROM student_courses sc
+                JOIN courses c ON sc.course_code = c.course_code
+                WHERE sc.student_id = students.sid
+            )
+        ''')
+    conn.close()
+    return db_name
+
+
+def bench_startup(students=30000, courses=600, per_student=5, repeat=3):
+    """زمان ساخت UniversitySystem روی یک پایگاه داده بزرگ"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "university.db")
+        started = time.perf_counter()
+        seed_university(db_name, students=students, courses=courses, per_student=per_student)
+        print(f"seed: {students} students, {courses} courses, {students * per_student} enrollments "
+              f"in {time.perf_counter() - started:.2f}s")
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            system = UniversitySystem(db_name)
+            timings.append(time.perf_counter() - started)
+            system.db.close()
+
+    best, median = min(timings), statistics.median(timings)
+    print(f"startup: best {best:.3f}s, median {median:.3f}s (target {STARTUP_TARGET_SECONDS:.1f}s)")
+    return median <= STARTUP_TARGET_SECONDS
+
+
+SEARCH_QUERIES = ["د", "دا", "دانشجو 12", "درس 4", "استاد 7", "140", "۱۴۰۲۰۰", "C0001", "zzz"]
+
+
+def bench_search(students=30000, courses=5000, repeat=20):
+    """مقایسه نمایه جستجو با پیمایش خطی فعلی جعبه‌های جستجو"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "university.db")
+        seed_university(db_name, students=students, courses=courses, per_student=3)
+        system = UniversitySystem(db_name)
+        system.search_students("")  # نمایه دانشجویان در اولین جستجو ساخته می‌شود
+        system.db.close()
+
+    def linear(query):
+        query = query.lower()
+        course_hits = {code for code, c in system.courses.items()
+                       if query in c["name"].lower() or query in code.lower()}
+        student_hits = {sid for sid, st in system.students.items()
+                        if query in st["name"].lower() or query in sid}
+        return course_hits, student_hits
+
+    def indexed(query):
+        return system.search_courses(query), system.search_students(query)
+
+    print(f"{'query':>12} {'linear ms':>10} {'index ms':>10} {'hits':>8}")
+    worst = 0.0
+    for query in SEARCH_QUERIES:
+        timings = {}
+        for name, func in (("linear", linear), ("index", indexed)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                result = func(query)
+            timings[name] = (time.perf_counter() - started) / repeat * 1000
+        hits = sum(len(r or ()) for r in result)
+        worst = max(worst, timings["index"])
+        print(f"{query:>12} {timings['linear']:>10.3f} {timings['index']:>10.3f} {hits:>8}")
+    print(f"worst indexed query: {worst:.3f}ms")
+    return True
+
+
+def bench_conflicts(courses=5000, students=200):
+    """زمان بررسی تداخل همه دروس برای هر دانشجو: بیت‌مپ در برابر تجزیه دوباره متن زمان‌ها"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "university.db")
+        seed_university(db_name, students=students, courses=courses, per_student=4)
+        system = UniversitySystem(db_name)
+        system.db.close()
+
+    sids = list(system.students)[:students]
+    catalog = list(system.courses.values())
+    checks = len(sids) * len(catalog)
+
+    started = time.perf_counter()
+    mask_hits = 0
+    for sid in sids:
+        student_mask = system.students[sid].schedule_mask
+        mask_hits += sum(1 for course in catalog if course["schedule_mask"] & student_mask)
+    mask_time = time.perf_counter() - started
+
+    # روش ساده: تجزیه متن زمان هر درس و دروس دانشجو در هر بررسی
+    started = time.perf_counter()
+    naive_hits = 0
+    for sid in sids[:max(1, len(sids) // 20)]:
+        taken = [system.courses[code]["schedule"] for code in system.students[sid]["courses"]]
+        for course in catalog:
+            mask = parse_schedule(course["schedule"])
+            naive_hits += any(mask & parse_schedule(schedule) for schedule in taken)
+    naive_checks = max(1, len(sids) // 20) * len(catalog)
+    naive_time = time.perf_counter() - started
+
+    print(f"bitmap: {checks} checks in {mask_time * 1000:.1f}ms ({mask_time / checks * 1e9:.0f}ns/check), {mask_hits} clashes")
+    print(f"reparse: {naive_checks} checks in {naive_time * 1000:.1f}ms ({naive_time / naive_checks * 1e9:.0f}ns/check)")
+    return True
+
+
+STRESS_COURSE = "STRESS"
+
+
+def _seed_stress(db_name, students, capacity):
+    DatabaseManager(db_name).close()
+    conn = sqlite3.connect(db_name)
+    with conn:
+        conn.execute('''
+            INSERT INTO courses (course_code, course_name, professor, professor_id, units, capacity, current_students,
+                                 schedule, department, classroom, exam_date, status)
+            VALUES (?, 'درس آزمون فشار', 'استاد', '1001', 3, ?, 0, 'شنبه ۸-۱۰', 'کامپیوتر', '', '', 'approved')
+        ''', (STRESS_COURSE, capacity))
+        conn.executemany('''
+            INSERT INTO students (sid, name, password, major, email, entry_year, total_units)
+            VALUES (?, ?, '123456', 'کامپیوتر', '', '1404', 0)
+        ''', [(f"S{i:06d}", f"دانشجو {i}") for i in range(students)])
+    conn.close()
+
+
+def _stress_worker(db_name, student_ids, barrier=None):
+    """هر کارگر نمونه مستقل خود از UniversitySystem را دارد، مانند یک رایانه جداگانه"""
+    system = UniversitySystem(db_name)
+    if barrier is not None:
+        barrier.wait()
+    succeeded = sum(1 for sid in student_ids if system.enroll_student(sid, STRESS_COURSE)[0])
+    system.db.close()
+    return succeeded
+
+
+def stress_enroll(workers=32, students=400, capacity=25, mode="thread"):
+    """هجوم هم‌زمان چند کارگر به یک درس و بررسی عدم ثبت‌نام بیش از ظرفیت"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "university.db")
+        _seed_stress(db_name, students, capacity)
+        student_ids = [f"S{i:06d}" for i in range(students)]
+        chunks = [student_ids[i::workers] for i in range(workers)]
+
+        started = time.perf_counter()
+        if mode == "process":
+            with multiprocessing.Pool(workers) as pool:
+                succeeded = sum(pool.starmap(_stress_worker, [(db_name, chunk) for chunk in chunks]))
+        else:
+            barrier = threading.Barrier(workers)
+            results = [0] * workers
+
+            def run(i):
+                results[i] = _stress_worker(db_name, chunks[i], barrier)
+
+            threads = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            succeeded = sum(results)
+        elapsed = time.perf_counter() - started
+
+        conn = sqlite3.connect(db_name)
+        current_students, course_capacity = conn.execute(
+            'SELECT current_students, capacity FROM courses WHERE course_code = ?', (STRESS_COURSE,)).fetchone()
+        enrolled = conn.execute(
+            'SELECT COUNT(*) FROM student_courses WHERE course_code = ?', (STRESS_COURSE,)).fetchone()[0]
+        unit_drift = conn.execute('''
+            SELECT COUNT(*) FROM students s
+            WHERE s.total_units != (
+                SELECT COALESCE(SUM(c.units), 0) FROM student_courses sc
+                JOIN courses c ON sc.course_code = c.course_code WHERE sc.student_id = s.sid
+            )
+        ''').fetchone()[0]
+        conn.close()
+
+    violations = []
+    if enrolled > course_capacity:
+        violations.append(f"overbooked: {enrolled} enrolled for capacity {course_capacity}")
+    if current_students != enrolled:
+        violations.append(f"counter drift: current_students={current_students}, rows={enrolled}")
+    if succeeded != enrolled:
+        violations.append(f"reported successes {succeeded} != rows {enrolled}")
+    if enrolled != min(capacity, students):
+        violations.append(f"expected {min(capacity, students)} seats filled, got {enrolled}")
+    if unit_drift:
+        violations.append(f"{unit_drift} students with wrong total_units")
+
+    print(f"stress ({mode}, {workers} workers): {enrolled}/{course_capacity} seats filled, "
+          f"{students} attempts in {elapsed:.2f}s")
+    for violation in violations:
+        print(f"VIOLATION: {violation}")
+    return not violations
+
+
+def _legacy_cache(db_name):
+    """بارگذاری کش به شکل قدیمی (دیکشنری‌های تو در تو و فهرست دروس) برای مقایسه"""
+    conn = sqlite3.connect(db_name)
+    students = {}
+    for sid, name, password, major, email, entry_year, total_units in conn.execute(
+            'SELECT sid, name, password, major, email, entry_year, total_units FROM students'):
+        students[sid] = {"name": name, "password": password, "major": major, "email": email,
+                         "entry_year": entry_year, "total_units": total_units, "courses": []}
+    rows = conn.execute('SELECT student_id, course_code FROM student_courses ORDER BY student_id, course_code')
+    for sid, group in groupby(rows, key=itemgetter(0)):
+        students[sid]["courses"] = [code for _, code in group]
+    courses = {}
+    for row in conn.execute('''SELECT course_code, course_name, professor, professor_id, units, capacity,
+                                      current_students, schedule, department, classroom, exam_date, status
+                               FROM courses'''):
+        courses[row[0]] = dict(zip(("name", "professor", "professor_id", "units", "capacity", "current_students",
+                                    "schedule", "department", "classroom", "exam_date", "status"), row[1:]))
+    conn.close()
+    return students, courses
+
+
+def _traced(func, *args):
+    """حافظه باقی‌مانده پس از ساخت خروجی func (بایت)"""
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size, result
+
+
+def bench_memory(students=50000, courses=600, per_student=10):
+    """حافظه کش دانشجویان و دروس: دیکشنری‌های تو در تو در برابر رکوردهای __slots__"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "university.db")
+        seed_university(db_name, students=students, courses=courses, per_student=per_student)
+
+        legacy, legacy_cache = _traced(_legacy_cache, db_name)
+        del legacy_cache
+
+        system = UniversitySystem(db_name)
+
+        def load_records():
+            with system.db.connection():
+                return system._get_all_students(), system._get_all_courses()
+
+        records, record_cache = _traced(load_records)
+        del record_cache
+        system.db.close()
+        total, system = _traced(UniversitySystem, db_name)
+        system.db.close()
+
+    mb = 1024 * 1024
+    print(f"{students} students, {students * per_student} enrollments, {courses} courses")
+    print(f"dict cache:   {legacy / mb:8.1f} MB")
+    print(f"record cache: {records / mb:8.1f} MB ({records / legacy:.0%} of dict cache)")
+    print(f"full UniversitySystem (cache, indexes, calendars): {total / mb:.1f} MB")
+    return records < legacy
+
+
+def bench_passwords(target_ms=LOGIN_TARGET_MS, burst=20, costs=PASSWORD_COSTS):
+    """انتخاب هزینه هش رمز: تأخیر ورود تکی و صدک ۹۵ تأخیر هجوم همزمان ورودها روی همه هسته‌ها"""
+    workers = os.cpu_count() or 1
+    print(f"{burst} concurrent logins on {workers} cores, target p95 {target_ms}ms")
+    print(f"{'iterations':>10} {'single ms':>10} {'burst p95 ms':>13}")
+    chosen = None
+    for iterations in costs:
+        stored = hash_password("123456", iterations)
+        started = time.perf_counter()
+        verify_password("123456", stored)
+        single = (time.perf_counter() - started) * 1000
+
+        # تأخیر هر ورود از لحظه شروع هجوم (شامل انتظار در صف) سنجیده می‌شود
+        burst_started = time.perf_counter()
+
+        def login(_):
+            verify_password("123456", stored)
+            return (time.perf_counter() - burst_started) * 1000
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            latencies = sorted(pool.map(login, range(burst)))
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        if p95 <= target_ms:
+            chosen = iterations
+        print(f"{iterations:>10} {single:>10.1f} {p95:>13.1f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system = UniversitySystem(os.path.join(tmp, "university.db"))
+        system.authenticate("student", "400123456", "123456")
+        started = time.perf_counter()
+        system.authenticate("student", "400123456", "123456")
+        cached = (time.perf_counter() - started) * 1e6
+        system.db.close()
+
+    print(f"cached re-verification: {cached:.0f}us")
+    print(f"recommended PASSWORD_ITERATIONS: {chosen or 'none meets the target'} (current {PASSWORD_ITERATIONS})")
+    return chosen is not None
+
+
+def bench_instrumentation(rounds=2000):
+    """هزینه اندازه‌گیری: فراخوانی ارزان با اندازه‌گیری خاموش و چرخه ثبت‌نام/حذف با اندازه‌گیری خاموش و روشن"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "university.db")
+        seed_university(db_name, students=2000, courses=200, per_student=3)
+        system = UniversitySystem(db_name)
+        sid = next(iter(system.students))
+        code = next(code for code in system.courses if code not in system.students[sid].courses)
+        
+        # هزینه خالص لایه اندازه‌گیری خاموش روی ارزان‌ترین عملیات
+        direct = UniversitySystem.search_courses.__wrapped__
+        timings = {}
+        for name, call in (("direct", lambda: direct(system, "درس 4")), ("wrapped", lambda: system.search_courses("درس 4"))):
+            started = time.perf_counter()
+            for _ in range(rounds * 10):
+                call()
+            timings[name] = (time.perf_counter() - started) / (rounds * 10) * 1e6
+        print(f"search_courses: direct {timings['direct']:.2f}us, instrumentation off {timings['wrapped']:.2f}us")
+
+        def cycle():
+            started = time.perf_counter()
+            for _ in range(rounds):
+                system.enroll_student(sid, code)
+                system.drop_student_course(sid, code)
+            return (time.perf_counter() - started) / rounds * 1e6
+        
+        off = cycle()
+        system.set_instrumentation(True)
+        on = cycle()
+        report = system.metrics.snapshot()
+        system.db.close()
+    
+    print(f"enroll+drop: off {off:.0f}us, on {on:.0f}us ({on / off - 1:+.1%})")
+    for name, op in report["operations"].items():
+        print(f"{name:>22} n={op['count']} p50={op['p50_ms']:.2f}ms p99={op['p99_ms']:.2f}ms "
+              f"sql/op={op['sql_statements'] / op['count']:.1f}")
+    return timings["wrapped"] - timings["direct"] < 1.0
+
+
+def bench_cart(students=2000, courses=300, picks=6, seed=42):
+    """ثبت‌نام درس به درس در برابر ثبت‌نام یکجای سبد (enroll_many) روی دو نسخه یکسان از پایگاه داده
+    
+    سبد هر دانشجو همان دروسی است که در اجرای درس به درس پذیرفته شده‌اند تا هر دو روش کار یکسانی انجام دهند.
+    """
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        carts = {}
+        for method in ("enroll_student", "enroll_many"):
+            db_name = os.path.join(tmp, f"{method}.db")
+            seed_university(db_name, students=students, courses=courses, per_student=0, seed=seed)
+            system = UniversitySystem(db_name, metrics=Metrics(enabled=True))
+            codes = sorted(system.courses)
+            started = time.perf_counter()
+            if method == "enroll_student":
+                for sid in sorted(system.students):
+                    accepted = []
+                    for code in rng.sample(codes, min(len(codes), picks * 3)):
+                        if len(accepted) == picks:
+                            break
+                        if system.enroll_student(sid, code)[0]:
+                            accepted.append(code)
+                    carts[sid] = accepted
+            else:
+                for sid, cart in carts.items():
+                    if cart and not system.enroll_many(sid, cart)[0]:
+                        print(f"سبد دانشجو {sid} پذیرفته نشد")
+                        return False
+            elapsed = time.perf_counter() - started
+            report = system.metrics.snapshot()["operations"][method]
+            with system.db.connection() as conn:
+                rows = conn.execute('SELECT COUNT(*) FROM student_courses').fetchone()[0]
+            system.db.close()
+            results[method] = (elapsed, report, rows)
+    
+    for method, (elapsed, report, rows) in results.items():
+        print(f"{method:>14}: {elapsed:.2f}s, {report['count']} calls, {report['sql_statements']} SQL statements, "
+              f"{rows} enrollments, p99 {report['p99_ms']:.2f}ms")
+    single, batch = results["enroll_student"], results["enroll_many"]
+    print(f"transactions: {single[1]['count'] / max(1, batch[1]['count']):.1f}x fewer, "
+          f"statements: {single[1]['sql_statements'] / max(1, batch[1]['sql_statements']):.1f}x fewer, "
+          f"time: {single[0] / batch[0]:.1f}x faster")
+    return single[2] == batch[2]
+
+
+def _percentiles(latencies):
+    """صدک‌های ۵۰، ۹۵ و ۹۹ و بیشینه (میلی‌ثانیه) از فهرست تأخیرها (ثانیه)"""
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(latencies)
+    last = len(ordered) - 1
+    return {
+        "p50_ms": ordered[int(0.50 * last)] * 1000,
+        "p95_ms": ordered[int(0.95 * last)] * 1000,
+        "p99_ms": ordered[int(0.99 * last)] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def _registration_plans(student_ids, course_codes, picks, skew, seed):
+    """فهرست درخواست هر دانشجو؛ دروس پرطرفدار (رتبه پایین‌تر) با توزیع زیپف بیشتر انتخاب می‌شوند"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(course_codes))]
+    picks = min(picks, len(course_codes))
+    plans = []
+    for sid in student_ids:
+        wishlist = []
+        while len(wishlist) < picks:
+            code = rng.choices(course_codes, weights)[0]
+            if code not in wishlist:
+                wishlist.append(code)
+        plans.append((sid, wishlist))
+    return plans
+
+
+def _registration_worker(system, plans, drop_rate, seed, barrier=None):
+    """اجرای برنامه ثبت‌نام چند دانشجو پشت سر هم، مانند یک کلاینت؛ پس از هر ثبت‌نام موفق با احتمال drop_rate
+    یکی از دروس گرفته‌شده حذف می‌شود (حذف و اضافه)"""
+    rng = random.Random(seed)
+    result = {"enroll": [], "drop": [], "enroll_ok": 0, "drop_ok": 0, "errors": 0}
+    if barrier is not None:
+        barrier.wait()
+    for sid, wishlist in plans:
+        enrolled = []
+        for code in wishlist:
+            started = time.perf_counter()
+            success, msg = system.enroll_student(sid, code)
+            result["enroll"].append(time.perf_counter() - started)
+            if success:
+                result["enroll_ok"] += 1
+                enrolled.append(code)
+            elif msg.startswith("خطا"):
+                result["errors"] += 1
+            if enrolled and rng.random() < drop_rate:
+                victim = enrolled.pop(rng.randrange(len(enrolled)))
+                started = time.perf_counter()
+                success, msg = system.drop_student_course(sid, victim)
+                result["drop"].append(time.perf_counter() - started)
+                if success:
+                    result["drop_ok"] += 1
+                elif msg.startswith("خطا"):
+                    result["errors"] += 1
+    return result
+
+
+def _registration_process(db_name, plans, drop_rate, seed, barrier, results, lazy):
+    """کارگر پردازه‌ای: نمونه مستقل UniversitySystem، مانند یک رایانه جداگانه در سایت"""
+    system = UniversitySystem(db_name, lazy=lazy, metrics=Metrics(enabled=True))
+    result = _registration_worker(system, plans, drop_rate, seed, barrier)
+    result["lock_waits"] = system.metrics.lock_waits
+    result["db_waits"] = system.metrics.db_waits
+    system.db.close()
+    results.put(result)
+
+
+def _integrity_violations(db_name, max_units):
+    """بررسی‌های پس از آزمون: ثبت‌نام بیش از ظرفیت و انحراف شمارنده‌ها"""
+    conn = sqlite3.connect(db_name)
+    checks = {
+        "overbooked courses": '''
+            SELECT COUNT(*) FROM courses c
+            WHERE (SELECT COUNT(*) FROM student_courses sc WHERE sc.course_code = c.course_code) > c.capacity
+        ''',
+        "current_students above capacity": 'SELECT COUNT(*) FROM courses WHERE current_students > capacity',
+        "current_students drift": '''
+            SELECT COUNT(*) FROM courses c
+            WHERE c.current_students != (SELECT COUNT(*) FROM student_courses sc WHERE sc.course_code = c.course_code)
+        ''',
+        "total_units drift": '''
+            SELECT COUNT(*) FROM students s
+            WHERE s.total_units != (
+                SELECT COALESCE(SUM(c.units), 0) FROM student_courses sc
+                JOIN courses c ON sc.course_code = c.course_code WHERE sc.student_id = s.sid
+            )
+        ''',
+        "students above unit limit": f'SELECT COUNT(*) FROM students WHERE total_units > {int(max_units)}',
+    }
+    violations = {name: conn.execute(sql).fetchone()[0] for name, sql in checks.items()}
+    enrollments = conn.execute('SELECT COUNT(*) FROM student_courses').fetchone()[0]
+    conn.close()
+    return {name: count for name, count in violations.items() if count}, enrollments
+
+
+def _merge_waits(groups):
+    """ادغام هیستوگرام‌های انتظار (از نخ‌ها یا پردازه‌ها) در یک خلاصه با total_ms"""
+    merged = LatencyHistogram()
+    for histograms in groups:
+        for histogram in histograms:
+            if histogram is not None:
+                merged.merge(histogram)
+    summary = merged.summary()
+    summary.pop("buckets")
+    summary["total_ms"] = merged.total
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_test(students=5000, courses=600, professors=150, workers=32, mode="thread", picks=8, skew=1.0,
+              drop_rate=0.1, capacity=(20, 80), lazy=False, seed=42, output=None, compare=None, tolerance=0.2):
+    """شبیه‌سازی هجوم روز ثبت‌نام: همه کارگرها هم‌زمان آزاد می‌شوند و برنامه حذف و اضافه دانشجویان را اجرا می‌کنند
+    
+    در حالت thread همه کارگرها یک UniversitySystem مشترک دارند (مانند سرور API)؛ در حالت process هر کارگر نمونه
+    جداگانه دارد و رقابت بیشتر در قفل نوشتن SQLite است. در هر دو حالت انتظار قفل کش، قفل نوشتن (BEGIN IMMEDIATE)
+    و دریافت اتصال از استخر جداگانه گزارش می‌شود.
+    """
+    params = {"students": students, "courses": courses, "professors": professors, "workers": workers, "mode": mode,
+              "picks": picks, "skew": skew, "drop_rate": drop_rate, "capacity": list(capacity), "lazy": lazy, "seed": seed}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "university.db")
+        seed_university(db_name, students=students, courses=courses, professors=professors, per_student=0,
+                        capacity=capacity, seed=seed)
+        conn = sqlite3.connect(db_name)
+        student_ids = [sid for sid, in conn.execute("SELECT sid FROM students WHERE sid GLOB '14*' ORDER BY sid")]
+        course_codes = [code for code, in conn.execute("SELECT course_code FROM courses WHERE course_code GLOB 'C*' ORDER BY course_code")]
+        conn.close()
+        plans = _registration_plans(student_ids, course_codes, picks, skew, seed)
+        chunks = [plans[i::workers] for i in range(workers)]
+        
+        if mode == "process":
+            barrier = multiprocessing.Barrier(workers + 1)
+            queue = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(target=_registration_process,
+                                        args=(db_name, chunks[i], drop_rate, seed + i, barrier, queue, lazy))
+                for i in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            barrier.wait()
+            started = time.perf_counter()
+            results = [queue.get() for _ in processes]
+            elapsed = time.perf_counter() - started
+            for process in processes:
+                process.join()
+            lock_waits = [result.pop("lock_waits") for result in results]
+            db_waits = [result.pop("db_waits") for result in results]
+        else:
+            system = UniversitySystem(db_name, lazy=lazy, metrics=Metrics(enabled=True))
+            barrier = threading.Barrier(workers + 1)
+            results = [None] * workers
+
+            def run(i):
+                results[i] = _registration_worker(system, chunks[i], drop_rate, seed + i, barrier)
+            
+            threads = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            lock_waits = [system.metrics.lock_waits]
+            db_waits = [system.metrics.db_waits]
+            system.db.close()
+        
+        violations, enrollments = _integrity_violations(db_name, UniversitySystem.MAX_UNITS)
+    
+    enroll = [latency for result in results for latency in result["enroll"]]
+    drop = [latency for result in results for latency in result["drop"]]
+    enroll_ok = sum(result["enroll_ok"] for result in results)
+    drop_ok = sum(result["drop_ok"] for result in results)
+    if enroll_ok - drop_ok != enrollments:
+        violations["reported successes vs rows"] = abs(enroll_ok - drop_ok - enrollments)
+    
+    waits = _merge_waits(histograms.values() for histograms in lock_waits)
+    write_waits = _merge_waits([histograms.get("sqlite_write")] for histograms in db_waits)
+    pool_waits = _merge_waits([histograms.get("pool_checkout")] for histograms in db_waits)
+    
+    operations = len(enroll) + len(drop)
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": sys.version.split()[0], "sqlite": sqlite3.sqlite_version, "cpus": os.cpu_count()},
+        "params": params,
+        "results": {
+            "seconds": elapsed,
+            "operations": operations,
+            "throughput_ops": operations / elapsed if elapsed else 0.0,
+            "enroll": dict(_percentiles(enroll), count=len(enroll), ok=enroll_ok),
+            "drop": dict(_percentiles(drop), count=len(drop), ok=drop_ok),
+            "errors": sum(result["errors"] for result in results),
+            "lock_wait": waits,
+            "write_wait": write_waits,
+            "pool_wait": pool_waits,
+            "enrollments": enrollments,
+        },
+        "violations": violations,
+    }
+    
+    results = report["results"]
+    print(f"loadtest ({mode}, {workers} workers, {students} students, {courses} courses, commit {report['commit'] or '-'})")
+    print(f"{operations} operations in {elapsed:.2f}s: {results['throughput_ops']:.0f} ops/s, {results['errors']} errors")
+    for name in ("enroll", "drop"):
+        op = results[name]
+        print(f"{name:>7}: {op['count']:>7} ({op['ok']} ok)  p50 {op['p50_ms']:.2f}ms  p95 {op['p95_ms']:.2f}ms  "
+              f"p99 {op['p99_ms']:.2f}ms  max {op['max_ms']:.1f}ms")
+    for label, summary in (("lock wait", waits), ("write wait", write_waits), ("pool wait", pool_waits)):
+        print(f"{label:>10}: {summary['count']} acquisitions, total {summary['total_ms']:.0f}ms, "
+              f"p95 {summary['p95_ms']:.2f}ms, p99 {summary['p99_ms']:.2f}ms")
+    for name, count in violations.items():
+        print(f"VIOLATION: {name}: {count}")
+    
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"results saved to {output}")
+    
+    regressions = []
+    if compare:
+        with open(compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["params"] != params:
+            print("warning: baseline was run with different parameters")
+        previous = baseline["results"]
+        print(f"compared with {baseline.get('commit') or compare}:")
+        for label, old, new, higher_is_better in (
+            ("throughput ops/s", previous["throughput_ops"], results["throughput_ops"], True),
+            ("enroll p95 ms", previous["enroll"]["p95_ms"], results["enroll"]["p95_ms"], False),
+            ("enroll p99 ms", previous["enroll"]["p99_ms"], results["enroll"]["p99_ms"], False),
+            ("drop p95 ms", previous["drop"]["p95_ms"], results["drop"]["p95_ms"], False),
+            ("lock wait p95 ms", previous["lock_wait"]["p95_ms"], results["lock_wait"]["p95_ms"], False),
+            # نتایج قدیمی‌تر انتظار قفل نوشتن را ثبت نکرده‌اند
+            ("write wait p95 ms", previous.get("write_wait", {}).get("p95_ms", 0.0), results["write_wait"]["p95_ms"], False),
+        ):
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            print(f"{label:>18}: {old:10.2f} -> {new:10.2f} ({change:+.1%}){flag}")
+            if flag:
+                regressions.append(label)
+    return not violations and not regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="بنچمارک‌های سامانه آموزشی")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    startup = commands.add_parser("startup", help="زمان راه‌اندازی UniversitySystem")
+    startup.add_argument("--students", type=int, default=30000)
+    startup.add_argument("--courses", type=int, default=600)
+    startup.add_argument("--per-student", type=int, default=5)
+    startup.add_argument("--repeat", type=int, default=3)
+
+    stress = commands.add_parser("stress", help="آزمون فشار ثبت‌نام هم‌زمان در یک درس")
+    stress.add_argument("--workers", type=int, default=32)
+    stress.add_argument("--students", type=int, default=400)
+    stress.add_argument("--capacity", type=int, default=25)
+    stress.add_argument("--mode", choices=["thread", "process"], default="thread")
+
+    search = commands.add_parser("search", help="مقایسه نمایه جستجو با پیمایش خطی")
+    search.add_argument("--students", type=int, default=30000)
+    search.add_argument("--courses", type=int, default=5000)
+    search.add_argument("--repeat", type=int, default=20)
+
+    conflicts = commands.add_parser("conflicts", help="سرعت بررسی تداخل زمانی دروس")
+    conflicts.add_argument("--courses", type=int, default=5000)
+    conflicts.add_argument("--students", type=int, default=200)
+
+    memory = commands.add_parser("memory", help="حافظه کش: دیکشنری در برابر رکورد فشرده")
+    memory.add_argument("--students", type=int, default=50000)
+    memory.add_argument("--courses", type=int, default=600)
+    memory.add_argument("--per-student", type=int, default=10)
+
+    passwords = commands.add_parser("passwords", help="انتخاب هزینه هش رمز بر اساس تأخیر ورود")
+    passwords.add_argument("--target-ms", type=float, default=LOGIN_TARGET_MS)
+    passwords.add_argument("--burst", type=int, default=20)
+
+    instrumentation = commands.add_parser("instrumentation", help="هزینه لایه اندازه‌گیری در حالت خاموش و روشن")
+    instrumentation.add_argument("--rounds", type=int, default=2000)
+    
+    cart = commands.add_parser("cart", help="ثبت‌نام درس به درس در برابر ثبت‌نام یکجای سبد")
+    cart.add_argument("--students", type=int, default=2000)
+    cart.add_argument("--courses", type=int, default=300)
+    cart.add_argument("--picks", type=int, default=6)
+    
+    loadtest = commands.add_parser("loadtest", help="شبیه‌سازی هجوم حذف و اضافه روز ثبت‌نام با خروجی JSON")
+    loadtest.add_argument("--students", type=int, default=5000)
+    loadtest.add_argument("--courses", type=int, default=600)
+    loadtest.add_argument("--professors", type=int, default=150)
+    loadtest.add_argument("--workers", type=int, default=32)
+    loadtest.add_argument("--mode", choices=["thread", "process"], default="thread")
+    loadtest.add_argument("--picks", type=int, default=8, help="تعداد درس درخواستی هر دانشجو")
+    loadtest.add_argument("--skew", type=float, default=1.0, help="توان توزیع زیپف محبوبیت دروس")
+    loadtest.add_argument("--drop-rate", type=float, default=0.1, help="احتمال حذف یک درس پس از هر ثبت‌نام موفق")
+    loadtest.add_argument("--capacity", type=int, nargs=2, default=(20, 80), metavar=("MIN", "MAX"))
+    loadtest.add_argument("--lazy", action="store_true")
+    loadtest.add_argument("--seed", type=int, default=42)
+    loadtest.add_argument("--output", help="ذخیره نتایج در فایل JSON")
+    loadtest.add_argument("--compare", help="مقایسه با نتایج JSON قبلی")
+    loadtest.add_argument("--tolerance", type=float, default=0.2, help="بیشترین بدتر شدن مجاز پیش از اعلام پسرفت")
+    
+    args = parser.parse_args(argv)
+    if args.command == "startup":
+        ok = bench_startup(args.students, args.courses, args.per_student, args.repeat)
+    elif args.command == "stress":
+        ok = stress_enroll(args.workers, args.students, args.capacity, args.mode)
+    elif args.command == "search":
+        ok = bench_search(args.students, args.courses, args.repeat)
+    elif args.command == "conflicts":
+        ok = bench_conflicts(args.courses, args.students)
+    elif args.command == "memory":
+        ok = bench_memory(args.students, args.courses, args.per_student)
+    elif args.command == "passwords":
+        ok = bench_passwords(args.target_ms, args.burst)
+    elif args.command == "instrumentation":
+        ok = bench_instrumentation(args.rounds)
+    elif args.command == "cart":
+        ok = bench_cart(args.students, args.courses, args.picks)
+    elif args.command == "loadtest":
+        ok = load_test(args.students, args.courses, args.professors, args.workers, args.mode, args.picks, args.skew,
+                       args.drop_rate, tuple(args.capacity), args.lazy, args.seed, args.output, args.compare, args.tolerance)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
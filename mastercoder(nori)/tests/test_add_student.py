@@ -0,0 +1,62 @@
+"""آزمون رگرسیون ثبت دانشجو: هش کند رمز نباید قفل کش را نگه دارد
+
+اجرا (از پوشه mastercoder(nori)):
+    python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unimastercoder
+from unimastercoder import UniversitySystem
+
+
+class AddStudentTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_name = os.path.join(tmp.name, "university.db")
+        self.system = UniversitySystem(self.db_name)
+        self.addCleanup(self.system.db.close)
+
+    def test_hash_outside_lock(self):
+        hashing, release = threading.Event(), threading.Event()
+        real_hash = unimastercoder.hash_password
+
+        def slow_hash(password):
+            hashing.set()
+            release.wait(5)
+            return real_hash(password)
+
+        results = []
+        with mock.patch.object(unimastercoder, "hash_password", side_effect=slow_hash):
+            thread = threading.Thread(target=lambda: results.append(
+                self.system.add_student("90001", "دانشجو", "secret", "کامپیوتر")))
+            thread.start()
+            self.assertTrue(hashing.wait(5))
+            # در حین هش، نخ دیگری (مانند نخ رابط کاربری) باید بی‌درنگ قفل را بگیرد
+            acquired = self.system._lock.acquire(timeout=1)
+            if acquired:
+                self.system._lock.release()
+            release.set()
+            thread.join(5)
+        self.assertTrue(acquired)
+        self.assertEqual(results, [(True, "ثبت‌نام با موفقیت انجام شد!")])
+        self.assertTrue(self.system.authenticate("student", "90001", "secret")[0])
+
+    def test_duplicate_from_another_instance(self):
+        other = UniversitySystem(self.db_name)
+        self.assertTrue(other.add_student("90002", "دانشجو", "secret", "کامپیوتر")[0])
+        other.db.close()
+        # کش این نمونه هنوز از دانشجوی جدید خبر ندارد؛ پاسخ باید پیام تکراری باشد نه خطای پایگاه داده
+        self.assertEqual(self.system.add_student("90002", "دانشجو", "secret", "کامپیوتر"),
+                         (False, "شماره دانشجویی تکراری است!"))
+
+
+if __name__ == "__main__":
+    unittest.main()
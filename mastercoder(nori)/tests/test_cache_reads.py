@@ -0,0 +1,99 @@
+"""آزمون رگرسیون خواندن‌های رابط کاربری: کپی و جستجوی کش نباید منتظر قفل نویسنده‌ها بماند
+
+اجرا (از پوشه mastercoder(nori)):
+    python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unimastercoder import UniversitySystem
+
+
+def _course(code):
+    return {"course_code": code, "course_name": f"درس {code}", "professor": "دکتر آزمون", "professor_id": "1001",
+            "units": 3, "capacity": 10, "schedule": "شنبه ۸-۱۰", "department": "کامپیوتر"}
+
+
+class CacheReadTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.system = UniversitySystem(os.path.join(tmp.name, "university.db"))
+        self.addCleanup(self.system.db.close)
+        self.system.search_students("")  # نمایه دانشجویان در پس‌زمینه ساخته می‌شود
+
+    def test_reads_while_writer_holds_lock(self):
+        holding, release = threading.Event(), threading.Event()
+
+        def writer():
+            # مانند نویسنده‌ای که قفل را در طول BEGIN IMMEDIATE یا بارگذاری کامل کش نگه داشته است
+            with self.system._lock:
+                holding.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        self.assertTrue(holding.wait(5))
+
+        results = []
+        reader = threading.Thread(target=lambda: results.append((
+            self.system.snapshot_courses(), self.system.search_courses("10"),
+            self.system.student_rows(), self.system.student_rows("400"))))
+        reader.start()
+        reader.join(2)
+        self.assertFalse(reader.is_alive(), "خواندن کش منتظر قفل نویسنده ماند")
+        courses, matches, rows, found = results[0]
+        self.assertIn("101", courses)
+        self.assertIn("101", matches)
+        self.assertIn("400123456", [row[0] for row in rows])
+        self.assertIn("400123456", [row[0] for row in found])
+
+    def test_reads_during_structural_changes(self):
+        errors = []
+        done = threading.Event()
+
+        def writer():
+            try:
+                for i in range(100):
+                    code = f"T{i:03d}"
+                    self.system.add_course(_course(code))
+                    self.system.delete_course(code)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            while not done.is_set():
+                for code in self.system.snapshot_courses():
+                    pass
+                self.system.search_courses("t0")
+                self.system.search_courses("درس t")
+        except Exception as e:
+            errors.append(e)
+        thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.system.search_courses("t0"), set())
+
+    def test_student_rows_match_lazy_mode(self):
+        # حالت تنبل ردیف‌ها را با یک کوئری می‌سازد؛ خروجی باید با کش کامل یکی باشد
+        self.assertTrue(self.system.enroll_student("400123456", "101")[0])
+        lazy = UniversitySystem(self.system.db.db_name, lazy=True)
+        self.addCleanup(lazy.db.close)
+        for query in ("", "4001", "علی", "zzz"):
+            with self.subTest(query=query):
+                self.assertEqual(lazy.student_rows(query), self.system.student_rows(query))
+        self.assertIn(("400123456", "علی محمدی", "کامپیوتر", "1400", "ali@uni.ac.ir", 3, 1), lazy.student_rows())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""آزمون رگرسیون poll_changes: تغییرات خود نمونه نباید دوباره از پایگاه داده بازخوانی شوند
+
+اجرا (از پوشه mastercoder(nori)):
+    python -m pytest -q tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unimastercoder import UniversitySystem
+
+COURSE = "101"
+STUDENT = "400123456"
+
+
+class PollChangesTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_name = os.path.join(tmp.name, "university.db")
+        self.system = UniversitySystem(self.db_name)
+        self.addCleanup(self.system.db.close)
+        self.assertEqual(self.system.poll_changes(), 0)  # ثبت تغییرات خودی از اولین poll روشن می‌شود
+        self.system.drop_student_course(STUDENT, COURSE)
+        self.system.poll_changes()
+
+    def poll(self):
+        with mock.patch.object(self.system, "_reload_course", wraps=self.system._reload_course) as courses, \
+                mock.patch.object(self.system, "_reload_student", wraps=self.system._reload_student) as students:
+            self.assertEqual(self.system.poll_changes(), courses.call_count + students.call_count)
+        return {call.args[0] for call in courses.call_args_list + students.call_args_list}
+
+    def test_own_changes_skipped(self):
+        self.assertTrue(self.system.enroll_student(STUDENT, COURSE)[0])
+        self.assertEqual(self.poll(), set())
+        self.assertTrue(self.system.drop_student_course(STUDENT, COURSE)[0])
+        self.assertEqual(self.poll(), set())
+        self.assertEqual(self.system.db._own_versions, set())
+
+    def test_other_instance_changes_reloaded(self):
+        self.assertTrue(self.system.enroll_student(STUDENT, COURSE)[0])
+        other = UniversitySystem(self.db_name)
+        self.assertTrue(other.drop_student_course(STUDENT, COURSE)[0])
+        other.db.close()
+        self.assertEqual(self.poll(), {STUDENT, COURSE})
+        self.assertNotIn(COURSE, self.system.students[STUDENT]["courses"])
+
+    def test_rolled_back_transaction_not_recorded(self):
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.system.db.transaction() as conn:
+                conn.execute("UPDATE courses SET capacity = capacity WHERE course_code = ?", (COURSE,))
+                conn.execute("INSERT INTO courses (course_code) VALUES (?)", (COURSE,))
+        self.assertEqual(self.system.db._own_versions, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
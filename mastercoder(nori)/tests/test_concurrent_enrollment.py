@@ -0,0 +1,119 @@
+"""آزمون رگرسیون ثبت‌نام هم‌زمان: هجوم چند نخ یا چند پردازه به یک درس نباید آن را بیش از ظرفیت پر کند
+
+اجرا (از پوشه mastercoder(nori)):
+    python -m pytest -q tests
+"""
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unimastercoder import DatabaseManager, UniversitySystem
+
+COURSE = "RACE101"
+WORKERS = 8
+STUDENTS = 80
+CAPACITY = 10
+
+
+def _seed(db_name):
+    """یک درس با ظرفیت CAPACITY و STUDENTS دانشجوی بدون درس"""
+    DatabaseManager(db_name).close()  # ایجاد جداول و اجرای مهاجرت‌ها
+    conn = sqlite3.connect(db_name)
+    with conn:
+        conn.execute('''
+            INSERT INTO courses (course_code, course_name, professor, professor_id, units, capacity, current_students,
+                                 schedule, department, classroom, exam_date, status)
+            VALUES (?, 'درس آزمون هم‌زمانی', 'استاد', '1001', 3, ?, 0, 'شنبه ۸-۱۰', 'کامپیوتر', '', '', 'approved')
+        ''', (COURSE, CAPACITY))
+        conn.executemany('''
+            INSERT INTO students (sid, name, password, major, email, entry_year, total_units)
+            VALUES (?, ?, '123456', 'کامپیوتر', '', '1404', 0)
+        ''', [(f"R{i:05d}", f"دانشجو {i}") for i in range(STUDENTS)])
+    conn.close()
+
+
+def _enroll_all(db_name, student_ids, barrier=None):
+    """هر کارگر نمونه مستقل خود از UniversitySystem را دارد، مانند یک رایانه جداگانه؛ خروجی: تعداد ثبت‌نام موفق"""
+    system = UniversitySystem(db_name)
+    if barrier is not None:
+        barrier.wait()
+    succeeded = sum(1 for sid in student_ids if system.enroll_student(sid, COURSE)[0])
+    system.db.close()
+    return succeeded
+
+
+def _enroll_process(db_name, student_ids, barrier, results, index):
+    results[index] = _enroll_all(db_name, student_ids, barrier)
+
+
+class ConcurrentEnrollmentTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_name = os.path.join(tmp.name, "university.db")
+        _seed(self.db_name)
+        student_ids = [f"R{i:05d}" for i in range(STUDENTS)]
+        self.chunks = [student_ids[i::WORKERS] for i in range(WORKERS)]
+
+    def assert_not_overbooked(self, succeeded):
+        system = UniversitySystem(self.db_name)
+        try:
+            course = system.courses[COURSE]
+            self.assertLessEqual(course["current_students"], course["capacity"])
+            self.assertEqual(course["current_students"], CAPACITY)
+            self.assertEqual(succeeded, CAPACITY)
+            self.assertEqual(system.reconcile_counters(), {"students": [], "courses": []})
+        finally:
+            system.db.close()
+
+    def test_threads(self):
+        barrier = threading.Barrier(WORKERS)
+        results = [0] * WORKERS
+
+        def run(i):
+            results[i] = _enroll_all(self.db_name, self.chunks[i], barrier)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assert_not_overbooked(sum(results))
+
+    def test_processes(self):
+        # همه پردازه‌ها پیش از شروع، کش خود را با ظرفیت خالی می‌سازند تا روی پایگاه داده مسابقه دهند
+        barrier = multiprocessing.Barrier(WORKERS)
+        results = multiprocessing.Array("i", WORKERS)
+        processes = [multiprocessing.Process(target=_enroll_process, args=(self.db_name, chunk, barrier, results, i))
+                     for i, chunk in enumerate(self.chunks)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+        self.assert_not_overbooked(sum(results))
+
+    def test_course_rejected_by_another_instance(self):
+        # کش این نمونه هنوز درس را تأییدشده می‌بیند؛ شرط وضعیت باید درون تراکنش نوشتن بررسی شود
+        system = UniversitySystem(self.db_name)
+        self.addCleanup(system.db.close)
+        other = UniversitySystem(self.db_name)
+        self.assertTrue(other.reject_course(COURSE)[0])
+        other.db.close()
+        self.assertEqual(system.courses[COURSE]["status"], "approved")
+
+        self.assertFalse(system.enroll_student("R00000", COURSE)[0])
+        self.assertFalse(system.enroll_many("R00001", [COURSE])[0])
+        self.assertEqual(system.reconcile_counters(), {"students": [], "courses": []})
+        with system.db.connection() as conn:
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM student_courses').fetchone()[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
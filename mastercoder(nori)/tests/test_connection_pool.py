@@ -0,0 +1,82 @@
+"""آزمون رگرسیون استخر اتصال: اتصالی که برگرداندن تراکنشش شکست می‌خورد نباید جای خود در استخر را هدر دهد
+
+اجرا (از پوشه mastercoder(nori)):
+    python -m pytest -q tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unimastercoder import DatabaseManager, InstrumentedConnection, Metrics
+
+
+class BrokenRollbackTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # اندازه‌گیری روشن است تا اتصال‌ها از نوع InstrumentedConnection (قابل وصله) باشند
+        self.db = DatabaseManager(os.path.join(tmp.name, "university.db"), pool_size=1, pool_timeout=2,
+                                  metrics=Metrics(enabled=True))
+        self.addCleanup(self.db.close)
+
+    def leave_open_transaction(self):
+        with self.db.connection() as conn:
+            conn.execute("BEGIN")
+            conn.execute("UPDATE students SET total_units = total_units")
+
+    def test_failed_rollback_releases_slot(self):
+        failure = sqlite3.OperationalError("disk I/O error")
+        with mock.patch.object(InstrumentedConnection, "rollback", side_effect=failure):
+            for _ in range(3):
+                self.leave_open_transaction()
+
+        with self.db.connection() as conn:
+            self.assertEqual(conn.execute("SELECT 1").fetchone(), (1,))
+            self.assertFalse(conn.in_transaction)
+        self.assertEqual(self.db.pool_stats()["open"], 1)
+
+    def test_closed_connection_releases_slot(self):
+        for _ in range(3):
+            with self.db.connection() as conn:
+                conn.close()
+
+        with self.db.connection() as conn:
+            self.assertEqual(conn.execute("SELECT 1").fetchone(), (1,))
+
+    def test_waiter_gets_replacement_connection(self):
+        holding, release = threading.Event(), threading.Event()
+        results = []
+
+        def holder():
+            with mock.patch.object(InstrumentedConnection, "rollback", side_effect=sqlite3.OperationalError("boom")):
+                with self.db.connection() as conn:
+                    conn.execute("BEGIN")
+                    holding.set()
+                    release.wait(5)
+
+        def waiter():
+            with self.db.connection() as conn:
+                results.append(conn.execute("SELECT 1").fetchone())
+
+        first = threading.Thread(target=holder)
+        first.start()
+        holding.wait(5)
+        second = threading.Thread(target=waiter)
+        second.start()
+        # منتظر ماندن نخ دوم در صف استخر پیش از آزاد کردن اتصال
+        while not self.db._waiters and second.is_alive():
+            threading.Event().wait(0.01)
+        release.set()
+        first.join(5)
+        second.join(5)
+        self.assertEqual(results, [(1,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
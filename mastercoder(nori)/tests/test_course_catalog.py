@@ -0,0 +1,78 @@
+"""آزمون رگرسیون همگام‌سازی courses.json: رفت و برگشت فایل نباید شمار ثبت‌نام وب یا استاد دروس را گم کند
+
+اجرا (از پوشه mastercoder(nori)):
+    python -m pytest -q tests
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unimastercoder import UniversitySystem, read_import_rows
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LEGACY_DB = os.path.join(ROOT, "university.db")
+WEB_CATALOG = os.path.join(ROOT, "webcourse(rezaii)", "data", "courses.json")
+
+
+@unittest.skipUnless(os.path.exists(LEGACY_DB) and os.path.exists(WEB_CATALOG), "داده‌های نمونه مخزن در دسترس نیست")
+class CatalogRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_name = os.path.join(tmp.name, "university.db")
+        self.path = os.path.join(tmp.name, "courses.json")
+        shutil.copy(LEGACY_DB, self.db_name)
+        shutil.copy(WEB_CATALOG, self.path)
+        with open(WEB_CATALOG, encoding="utf-8") as f:
+            self.original = {item["code"]: item for item in json.load(f)}
+        self.system = UniversitySystem(self.db_name)
+        self.addCleanup(self.system.db.close)
+
+    def round_trip(self):
+        report = self.system.import_course_catalog(read_import_rows(self.path))
+        self.system.export_course_catalog(self.path)
+        with open(self.path, encoding="utf-8") as f:
+            return report, {item["code"]: item for item in json.load(f)}
+
+    def test_enrolled_survives_round_trip(self):
+        for _ in range(2):
+            report, exported = self.round_trip()
+            for code, item in self.original.items():
+                with self.subTest(code=code):
+                    self.assertEqual(exported[code]["enrolled"], item["enrolled"])
+        # ثبت‌نام‌های وب به شمارنده‌های این سامانه راه پیدا نمی‌کنند
+        self.assertEqual(self.system.courses["CE201"]["current_students"], 0)
+        self.assertEqual(self.system.reconcile_counters(), {"students": [], "courses": []})
+        self.assertEqual(report["inserted"] + report["updated"], 0)
+
+    def test_professor_resolved_by_title_and_id(self):
+        report, exported = self.round_trip()
+        # «دکتر احمدی» در دروس موجود به استاد 1001 وصل است
+        self.assertEqual(self.system.courses["CE201"]["professor_id"], "1001")
+        self.assertEqual(exported["CE201"]["professorId"], "1001")
+        self.assertIn("CE302", report["unassigned"])
+        self.assertEqual(self.system.courses["CE302"]["professor_id"], "")
+
+        # professorId صریح فایل بر عنوان استاد مقدم است؛ شماره ناشناخته نادیده گرفته می‌شود
+        items = list(exported.values())
+        for item in items:
+            if item["code"] == "CE302":
+                item["professorId"] = "2001"
+            if item["code"] == "CE402":
+                item["professorId"] = "9999"
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(items, f, ensure_ascii=False)
+        report = self.system.import_course_catalog(read_import_rows(self.path))
+        self.assertEqual(self.system.courses["CE302"]["professor_id"], "2001")
+        self.assertEqual(report["updated"], 1)
+        self.assertNotIn("CE302", report["unassigned"])
+        self.assertIn("CE402", report["unassigned"])
+
+
+if __name__ == "__main__":
+    unittest.main()
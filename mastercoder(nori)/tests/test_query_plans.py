@@ -0,0 +1,53 @@
+"""آزمون رگرسیون طرح اجرای کوئری‌های پرتکرار: هیچ‌کدام از DatabaseManager.HOT_QUERIES نباید کل جدول را پیمایش کند
+
+اجرا (از پوشه mastercoder(nori)):
+    python -m pytest -q tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unimastercoder import DatabaseManager
+
+# پایگاه داده قدیمی همراه مخزن (بدون user_version) برای آزمودن مسیر مهاجرت
+LEGACY_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "university.db")
+
+
+class HotQueryPlanTest(unittest.TestCase):
+    def assert_no_full_scans(self, db_name):
+        db = DatabaseManager(db_name)
+        try:
+            self.assertEqual(db.schema.version, len(DatabaseManager.MIGRATIONS))
+            plans = db.explain_queries()
+        finally:
+            db.close()
+        self.assertEqual(set(plans), {name for name, _, _ in DatabaseManager.HOT_QUERIES})
+        for name, plan in plans.items():
+            with self.subTest(query=name):
+                scans = [detail for detail in plan if DatabaseManager.is_full_scan(detail)]
+                self.assertEqual(scans, [], f"{name}: " + " | ".join(plan))
+
+    def test_new_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assert_no_full_scans(os.path.join(tmp, "university.db"))
+
+    @unittest.skipUnless(os.path.exists(LEGACY_DB), "university.db قدیمی در مخزن نیست")
+    def test_migrated_legacy_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_name = os.path.join(tmp, "university.db")
+            shutil.copy(LEGACY_DB, db_name)
+            self.assert_no_full_scans(db_name)
+
+    def test_full_scan_detection(self):
+        self.assertTrue(DatabaseManager.is_full_scan("SCAN students"))
+        self.assertTrue(DatabaseManager.is_full_scan("SCAN change_log USING INTEGER PRIMARY KEY"))
+        self.assertFalse(DatabaseManager.is_full_scan("SCAN sc USING COVERING INDEX idx_student_courses_course"))
+        self.assertFalse(DatabaseManager.is_full_scan("SEARCH courses USING INDEX sqlite_autoindex_courses_1 (course_code=?)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
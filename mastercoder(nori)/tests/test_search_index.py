@@ -0,0 +1,51 @@
+"""آزمون رگرسیون نمایه جستجو: نتیجه باید با جستجوی زیررشته‌ای قدیمی جعبه‌های جستجو یکی باشد
+
+اجرا (از پوشه mastercoder(nori)):
+    python -m pytest -q tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unimastercoder import SearchIndex, normalize_search_text
+
+ROWS = {
+    "CE101": ("CE101", "مبانی کامپیوتر"),
+    "CE201": ("CE201", "ساختمان داده"),
+    "MA101": ("MA101", "ریاضی عمومی ۱"),
+    "PH102": ("PH102", "فیزیک پایه"),
+}
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        for key, fields in ROWS.items():
+            self.index.add(key, *fields)
+
+    def linear(self, query):
+        query = normalize_search_text(query)
+        return {key for key, fields in ROWS.items()
+                if any(query in normalize_search_text(field) for field in fields)}
+
+    def test_matches_substring_scan(self):
+        for query in ("ce", "e1", "01", "1", "یک", "ان", "مپ", "ساختمان", "ce2", "داده", "هس", "x"):
+            with self.subTest(query=query):
+                self.assertEqual(self.index.search(query), self.linear(query))
+
+    def test_no_match_across_fields(self):
+        # انتهای کد و ابتدای نام در یک فیلد نیستند
+        self.assertEqual(self.index.search("1م"), set())
+        self.assertEqual(self.index.search("01م"), set())
+
+    def test_remove(self):
+        self.index.remove("CE201")
+        self.assertEqual(self.index.search("ce"), {"CE101"})
+        self.assertEqual(self.index.search("داده"), set())
+        self.assertEqual(len(self.index), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,19 +1,846 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+import argparse
+import csv
+import hashlib
+import hmac
+import json
 import sqlite3
 import os
+import queue
+import re
+import secrets
+import sys
+import textwrap
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import groupby, islice
+from operator import itemgetter
+from urllib.parse import parse_qs, urlsplit
+
+# قالب ذخیره رمز: pbkdf2_sha256$تکرار$نمک$هش (هگز)
+PASSWORD_SCHEME = "pbkdf2_sha256"
+# هزینه هش؛ با «python benchmarks.py passwords» برای سخت‌افزار سرور تنظیم شود.
+# افزایش آن باعث هش دوباره رمزهای قدیمی‌تر در ورود بعدی کاربر می‌شود.
+PASSWORD_ITERATIONS = 200000
+
+
+def hash_password(password, iterations=None):
+    iterations = iterations or PASSWORD_ITERATIONS
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{PASSWORD_SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def hash_passwords(passwords, iterations=None, workers=None):
+    """هش موازی فهرست رمزها؛ pbkdf2_hmac در حین محاسبه قفل GIL را آزاد می‌کند"""
+    passwords = list(passwords)
+    if len(passwords) < 2:
+        return [hash_password(password, iterations) for password in passwords]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(lambda password: hash_password(password, iterations), passwords))
+
+
+def is_password_hash(stored):
+    return stored.startswith(PASSWORD_SCHEME + "$")
+
+
+def verify_password(password, stored):
+    """مقایسه رمز با مقدار ذخیره‌شده در زمان ثابت؛ رمزهای متن ساده قدیمی هم پذیرفته می‌شوند"""
+    if not is_password_hash(stored):
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        _, iterations, salt, digest = stored.split("$")
+        iterations, salt, digest = int(iterations), bytes.fromhex(salt), bytes.fromhex(digest)
+    except ValueError:
+        return False
+    return hmac.compare_digest(hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations), digest)
+
+
+def password_needs_rehash(stored, iterations=None):
+    """رمز متن ساده یا هش با هزینه کمتر از هزینه فعلی"""
+    if not is_password_hash(stored):
+        return True
+    try:
+        return int(stored.split("$")[1]) < (iterations or PASSWORD_ITERATIONS)
+    except (IndexError, ValueError):
+        return True
+
+
+@lru_cache(maxsize=1)
+def _dummy_password_hash():
+    return hash_password("")
+
+
+# مرزهای بالای سطل‌های هیستوگرام تأخیر (میلی‌ثانیه)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+
+@lru_cache(maxsize=1024)
+def _statement_key(sql):
+    """شکل یکسان دستور SQL برای گروه‌بندی: فاصله‌ها فشرده و فهرست‌های «?, ?, ...» یکی می‌شوند"""
+    return re.sub(r"\?(?:\s*,\s*\?)+", "?, ...", " ".join(sql.split()))
+
+
+class LatencyHistogram:
+    __slots__ = ("count", "total", "max", "buckets")
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+    
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.buckets[bisect_left(LATENCY_BUCKETS, ms)] += 1
+    
+    def merge(self, other):
+        """افزودن هیستوگرام دیگر (مثلاً از پردازه‌ای دیگر) به این هیستوگرام"""
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+    
+    def percentile(self, fraction):
+        """تخمین صدک از روی مرز بالای سطل؛ برای سطل آخر بیشینه واقعی"""
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max)
+        return self.max
+    
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max,
+            "buckets": {str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.buckets) if count},
+        }
+
+
+class ThreadStats:
+    """شمارنده‌های یک نخ؛ فقط همان نخ آن‌ها را تغییر می‌دهد، پس ثبت هر دستور SQL به قفل نیاز ندارد"""
+    __slots__ = ("statements", "sql_time", "checkouts", "opened", "by_sql")
+    
+    def __init__(self):
+        self.statements = 0
+        self.sql_time = 0.0
+        self.checkouts = 0
+        self.opened = 0
+        self.by_sql = {}  # متن دستور -> [تعداد، زمان کل، بیشینه]
+    
+    def merge(self, other):
+        self.statements += other.statements
+        self.sql_time += other.sql_time
+        self.checkouts += other.checkouts
+        self.opened += other.opened
+        for sql, (count, total, peak) in list(other.by_sql.items()):
+            entry = self.by_sql.setdefault(sql, [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], peak)
+
+
+class Metrics:
+    """ابزار اندازه‌گیری سبک: هیستوگرام تأخیر هر عملیات، شمارش و زمان دستورات SQL و دریافت/باز شدن اتصال‌ها
+    
+    به طور پیش‌فرض خاموش است؛ در این حالت هزینه هر عملیات فقط یک بررسی enabled است
+    و اتصال‌های پایگاه داده از نوع عادی sqlite3.Connection باز می‌شوند.
+    شمارنده‌های SQL و اتصال برای هر نخ جداگانه نگه داشته می‌شوند تا به عملیات در جریان همان نخ نسبت داده شوند
+    و فقط هنگام snapshot جمع زده می‌شوند.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.sources = {}  # نام -> تابع بدون آرگومان برای آمار جانبی (استخر اتصال، کش‌ها)
+        self.reset()
+    
+    def reset(self):
+        """صفر کردن آمار؛ عملیاتی که در همین لحظه در جریان است ممکن است ناقص شمرده شود"""
+        with self._lock:
+            self.started = time.time()
+            self.operations = {}  # نام -> [هیستوگرام، دستورات SQL، زمان SQL، دریافت اتصال، باز شدن اتصال]
+            self.lock_waits = {}  # نام عملیات -> هیستوگرام انتظار برای قفل کش
+            self.db_waits = {}  # sqlite_write (BEGIN IMMEDIATE) یا pool_checkout -> هیستوگرام انتظار
+            self._local = threading.local()
+            self._threads = []  # (نخ، شمارنده‌ها)
+            self._retired = ThreadStats()  # شمارنده‌های نخ‌های پایان‌یافته
+    
+    def _thread_stats(self):
+        try:
+            return self._local.stats
+        except AttributeError:
+            pass
+        stats = self._local.stats = ThreadStats()
+        with self._lock:
+            # نخ‌های پایان‌یافته (مثلاً نخ هر درخواست سرور) در یک شمارنده ادغام می‌شوند تا فهرست رشد نکند
+            alive = []
+            for thread, thread_stats in self._threads:
+                if thread.is_alive():
+                    alive.append((thread, thread_stats))
+                else:
+                    self._retired.merge(thread_stats)
+            alive.append((threading.current_thread(), stats))
+            self._threads = alive
+        return stats
+    
+    def counters(self):
+        stats = self._thread_stats()
+        return (stats.statements, stats.sql_time, stats.checkouts, stats.opened)
+    
+    def observe(self, name, seconds, before):
+        """ثبت یک اجرای عملیات؛ before خروجی counters() در شروع عملیات است"""
+        deltas = [max(after - start, 0) for after, start in zip(self.counters(), before)]
+        with self._lock:
+            entry = self.operations.get(name)
+            if entry is None:
+                entry = self.operations[name] = [LatencyHistogram(), 0, 0.0, 0, 0]
+            entry[0].add(seconds * 1000)
+            for index, delta in enumerate(deltas, start=1):
+                entry[index] += delta
+    
+    def record_lock_wait(self, name, seconds):
+        with self._lock:
+            histogram = self.lock_waits.get(name)
+            if histogram is None:
+                histogram = self.lock_waits[name] = LatencyHistogram()
+            histogram.add(seconds * 1000)
+    
+    def record_db_wait(self, kind, seconds):
+        """انتظار برای منابع پایگاه داده: قفل نوشتن SQLite (sqlite_write) یا اتصال استخر (pool_checkout)"""
+        with self._lock:
+            histogram = self.db_waits.get(kind)
+            if histogram is None:
+                histogram = self.db_waits[kind] = LatencyHistogram()
+            histogram.add(seconds * 1000)
+    
+    def record_statement(self, sql, seconds):
+        stats = self._thread_stats()
+        stats.statements += 1
+        stats.sql_time += seconds
+        entry = stats.by_sql.get(sql)
+        if entry is None:
+            stats.by_sql[sql] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+    
+    def record_checkout(self, opened):
+        stats = self._thread_stats()
+        stats.checkouts += 1
+        stats.opened += opened
+    
+    def snapshot(self):
+        """آمار فعلی به صورت دیکشنری قابل تبدیل به JSON"""
+        with self._lock:
+            operations = {}
+            for name, (histogram, statements, sql_time, checkouts, opened) in sorted(self.operations.items()):
+                summary = histogram.summary()
+                summary.update(sql_statements=statements, sql_ms=sql_time * 1000,
+                               connection_checkouts=checkouts, connections_opened=opened)
+                operations[name] = summary
+            totals = ThreadStats()
+            totals.merge(self._retired)
+            for _, thread_stats in self._threads:
+                totals.merge(thread_stats)
+            by_statement = {}
+            for sql, (count, total, peak) in totals.by_sql.items():
+                entry = by_statement.setdefault(_statement_key(sql), [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += total
+                entry[2] = max(entry[2], peak)
+            statements = [
+                {"sql": sql, "count": count, "total_ms": total * 1000, "mean_ms": total * 1000 / count, "max_ms": peak * 1000}
+                for sql, (count, total, peak) in by_statement.items()
+            ]
+            report = {
+                "enabled": self.enabled,
+                "since": self.started,
+                "seconds": time.time() - self.started,
+                "operations": operations,
+                "sql": sorted(statements, key=itemgetter("total_ms"), reverse=True),
+                "connections": {"checkouts": totals.checkouts, "opened": totals.opened},
+                "lock_waits": {name: histogram.summary() for name, histogram in sorted(self.lock_waits.items())},
+                "db_waits": {kind: histogram.summary() for kind, histogram in sorted(self.db_waits.items())},
+            }
+        for name, source in self.sources.items():
+            report[name] = source()
+        return report
+    
+    def dump(self, path):
+        """نوشتن آمار در فایل JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+
+def instrumented(method):
+    """ثبت زمان اجرا و هزینه پایگاه داده متد در self.metrics، فقط وقتی اندازه‌گیری روشن است"""
+    name = method.__name__
+    
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if not metrics.enabled:
+            return method(self, *args, **kwargs)
+        before = metrics.counters()
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            metrics.observe(name, time.perf_counter() - start, before)
+    return wrapper
+
+
+def synchronized(method):
+    """اجرای متد با نگه داشتن قفل کش UniversitySystem
+    
+    اتصال استخر پیش از قفل گرفته می‌شود (و در فراخوانی‌های تو در تو همان اتصال استفاده می‌شود)
+    تا نخی که قفل را دارد هرگز منتظر استخر پر شده توسط نخ‌های منتظر قفل نماند.
+    """
+    name = method.__name__
+    
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.db.connection():
+            if self.metrics.enabled:
+                start = time.perf_counter()
+                self._lock.acquire()
+                self.metrics.record_lock_wait(name, time.perf_counter() - start)
+            else:
+                self._lock.acquire()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._lock.release()
+    return wrapper
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """زمان execute فقط گام اول را شامل می‌شود؛ خواندن ردیف‌های بعدی SELECT جزو آن نیست"""
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.metrics.record_statement(sql, time.perf_counter() - start)
+    
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.metrics.record_statement(sql, time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """اتصالی که دستوراتش در metrics ثبت می‌شود؛ فقط وقتی اندازه‌گیری روشن است باز می‌شود"""
+    metrics = None
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return super().cursor(InstrumentedCursor).execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return super().cursor(InstrumentedCursor).executemany(sql, seq_of_parameters)
+
+
+class SchemaInfo:
+    """طرح شناسایی‌شده پایگاه داده؛ یک بار پس از مهاجرت‌ها ساخته و کش می‌شود"""
+    def __init__(self, version, columns):
+        self.version = version
+        self.columns = columns  # نام جدول -> مجموعه نام ستون‌ها
+        self.course_status = "status" in columns.get("courses", ())
+    
+    def has_column(self, table, column):
+        return column in self.columns.get(table, ())
+
 
 class DatabaseManager:
-    def __init__(self, db_name="university.db"):
+    # مهاجرت‌ها به ترتیب اجرا می‌شوند؛ شماره نسخه هر مهاجرت برابر جایگاه آن (از ۱) است
+    MIGRATIONS = (
+        "_migrate_course_status",
+        "_migrate_access_indexes",
+        "_migrate_change_log",
+        "_migrate_hash_passwords",
+        "_migrate_waitlist",
+        "_migrate_course_status_log",
+    )
+    
+    # جداول حساب کاربری: جدول و ستون کلید
+    ACCOUNT_TABLES = (("students", "sid"), ("professors", "pid"), ("admins", "username"))
+    # بیشترین تعداد رمز متن ساده‌ای که مهاجرت هنگام راه‌اندازی هش می‌کند؛
+    # پایگاه‌داده‌های بزرگ‌تر با «python unimastercoder.py hash-passwords» یا در ورود بعدی کاربر ارتقا می‌یابند
+    PASSWORD_MIGRATION_INLINE_LIMIT = 500
+    
+    # کوئری‌های پرتکرار سامانه با پارامترهای نمونه؛ هیچ‌کدام نباید کل جدول را پیمایش کنند
+    HOT_QUERIES = (
+        ("course_units", "SELECT units FROM courses WHERE course_code = ?", ("101",)),
+        ("enroll_insert", "INSERT INTO student_courses (student_id, course_code) VALUES (?, ?)", ("400123456", "101")),
+        ("enroll_reserve_seat", """
+            UPDATE courses SET current_students = current_students + 1
+            WHERE course_code = ? AND current_students < capacity AND COALESCE(status, 'approved') = 'approved'
+        """, ("101",)),
+        ("enroll_add_units", """
+            UPDATE students SET total_units = total_units + ?
+            WHERE sid = ? AND total_units + ? <= ?
+        """, (3, "400123456", 3, 20)),
+        ("drop_delete", "DELETE FROM student_courses WHERE student_id = ? AND course_code = ?", ("400123456", "101")),
+        ("drop_release_seat", "UPDATE courses SET current_students = MAX(current_students - 1, 0) WHERE course_code = ?", ("101",)),
+        ("course_students_units", """
+            UPDATE students SET total_units = MAX(total_units - ?, 0)
+            WHERE sid IN (SELECT student_id FROM student_courses WHERE course_code = ?)
+        """, (3, "101")),
+        ("course_delete_enrollments", "DELETE FROM student_courses WHERE course_code = ?", ("101",)),
+        ("course_status", "UPDATE courses SET status=? WHERE course_code=?", ("approved", "101")),
+        ("student_courses", "SELECT course_code FROM student_courses WHERE student_id = ?", ("400123456",)),
+        ("professor_courses", "SELECT course_code FROM courses WHERE professor_id = ?", ("1001",)),
+        ("pending_courses", "SELECT course_code FROM courses WHERE status = ?", ("pending",)),
+        ("professor_students", """
+            SELECT DISTINCT s.sid, s.name, s.major, s.entry_year, s.total_units
+            FROM courses c
+            JOIN student_courses sc ON sc.course_code = c.course_code
+            JOIN students s ON s.sid = sc.student_id
+            WHERE c.professor_id = ?
+        """, ("1001",)),
+        ("change_log_poll", "SELECT version, table_name, row_key FROM change_log WHERE version > ? ORDER BY version LIMIT ?", (0, 100)),
+        ("waitlist_head", "SELECT id, student_id FROM waitlist WHERE course_code = ? ORDER BY id", ("101",)),
+        ("waitlist_position", "SELECT COUNT(*) FROM waitlist WHERE course_code = ? AND id <= ?", ("101", 1)),
+        ("student_waitlists", "SELECT course_code, id FROM waitlist WHERE student_id = ?", ("400123456",)),
+    )
+    
+    def __init__(self, db_name="university.db", pool_size=5, busy_timeout=5000,
+                 cached_statements=256, pool_timeout=30, max_lifetime=3600, metrics=None):
         self.db_name = db_name
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout  # میلی‌ثانیه
+        self.cached_statements = cached_statements
+        self.pool_timeout = pool_timeout  # ثانیه
+        self.max_lifetime = max_lifetime  # ثانیه، None یعنی بدون محدودیت
+        
+        # استخر اتصال‌ها: هر عضو به صورت (اتصال، زمان ایجاد) است؛ آخرین اتصال آزادشده اول استفاده می‌شود
+        self._idle = []
+        # منتظران استخر پر به ترتیب ورود: [رویداد، اتصال تحویلی یا None برای اجازه باز کردن اتصال جدید]
+        self._waiters = deque()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._stats = {
+            "checkouts": 0,
+            "reused": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "opened": 0,
+            "closed": 0,
+            "lifetime_total": 0.0,
+            "lifetime_max": 0.0
+        }
+        self.metrics = metrics or Metrics()
+        self.metrics.sources["pool"] = self.pool_stats
+        # نسخه‌های change_log که تراکنش‌های همین نمونه نوشته‌اند؛ پس از اولین poll_changes پر می‌شود
+        self.track_changes = False
+        self._own_versions = set()
+        
         self.init_database()
     
-    def get_connection(self):
-        return sqlite3.connect(self.db_name)
+    def _open_connection(self):
+        """ایجاد یک اتصال پیکربندی‌شده (WAL، synchronous=NORMAL، busy timeout)"""
+        instrumented = self.metrics.enabled
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=self.busy_timeout / 1000,
+            isolation_level=None,  # تراکنش‌ها صریحاً با transaction() باز می‌شوند
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=InstrumentedConnection if instrumented else sqlite3.Connection
+        )
+        if instrumented:
+            conn.metrics = self.metrics
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+        return conn
+    
+    def _checkout(self):
+        waiter = None
+        waited = 0.0
+        with self._lock:
+            self._stats["checkouts"] += 1
+            if self._idle:
+                self._stats["reused"] += 1
+                entry = self._idle.pop()
+            elif self._open < self.pool_size:
+                self._open += 1
+                self._stats["opened"] += 1
+                entry = None
+            else:
+                # استخر پر است؛ اتصال آزادشده مستقیم و به ترتیب ورود به منتظران تحویل داده می‌شود
+                # تا نخ‌های تازه‌رسیده نتوانند یک منتظر را بارها پشت سر بگذارند
+                waiter = [threading.Event(), None]
+                self._waiters.append(waiter)
+        
+        if waiter is not None:
+            started = time.monotonic()
+            waiter[0].wait(self.pool_timeout)
+            waited = time.monotonic() - started
+            with self._lock:
+                self._stats["waits"] += 1
+                self._stats["wait_time"] += waited
+                if not waiter[0].is_set():
+                    self._waiters.remove(waiter)
+                    raise sqlite3.OperationalError("هیچ اتصال آزادی در استخر پایگاه داده موجود نیست")
+                entry = waiter[1]
+                self._stats["reused" if entry is not None else "opened"] += 1
+        
+        if self.metrics.enabled:
+            self.metrics.record_checkout(entry is None)
+            self.metrics.record_db_wait("pool_checkout", waited)
+        if entry is not None:
+            return entry
+        try:
+            return (self._open_connection(), time.monotonic())
+        except Exception:
+            with self._lock:
+                self._release_slot()
+            raise
+    
+    def _release_slot(self):
+        """آزاد کردن جای یک اتصال بسته‌شده؛ اگر منتظری باشد جای خالی به او می‌رسد (با قفل _lock)"""
+        if self._waiters:
+            waiter = self._waiters.popleft()
+            waiter[1] = None
+            waiter[0].set()
+        else:
+            self._open -= 1
+    
+    def _checkin(self, entry):
+        conn, created = entry
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            # اتصالی که تراکنشش برنمی‌گردد (یا بسته شده) قابل اعتماد نیست؛ بسته شدن آن باقی تغییرات را دور می‌ریزد
+            # و جای آن آزاد می‌شود تا منتظر بعدی در صف یک اتصال تازه باز کند
+            try:
+                self._discard(entry)
+            except Exception:
+                pass
+            return
+        
+        if self.max_lifetime is not None and time.monotonic() - created > self.max_lifetime:
+            self._discard(entry)
+        elif isinstance(conn, InstrumentedConnection) != self.metrics.enabled:
+            # اندازه‌گیری پس از باز شدن این اتصال روشن یا خاموش شده است
+            self._discard(entry)
+        else:
+            with self._lock:
+                if self._waiters:
+                    waiter = self._waiters.popleft()
+                    waiter[1] = entry
+                    waiter[0].set()
+                else:
+                    self._idle.append(entry)
+    
+    def _discard(self, entry):
+        conn, created = entry
+        lifetime = time.monotonic() - created
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._release_slot()
+                self._stats["closed"] += 1
+                self._stats["lifetime_total"] += lifetime
+                self._stats["lifetime_max"] = max(self._stats["lifetime_max"], lifetime)
+    
+    @contextmanager
+    def connection(self):
+        """گرفتن یک اتصال از استخر؛ فراخوانی‌های تو در تو در یک نخ از همان اتصال استفاده می‌کنند"""
+        local = self._local
+        if getattr(local, "entry", None) is not None:
+            local.depth += 1
+            try:
+                yield local.entry[0]
+            finally:
+                local.depth -= 1
+            return
+        
+        entry = self._checkout()
+        local.entry, local.depth = entry, 1
+        try:
+            yield entry[0]
+        finally:
+            local.entry = None
+            self._checkin(entry)
+    
+    @contextmanager
+    def transaction(self, immediate=True, track=True):
+        """اجرای دستورات در یک تراکنش؛ در صورت خطا همه تغییرات برگردانده می‌شوند
+        
+        به طور پیش‌فرض BEGIN IMMEDIATE استفاده می‌شود: ارتقای یک تراکنش خواندنی به نوشتنی
+        در حالت WAL بدون انتظار با خطای database is locked شکست می‌خورد.
+        با track_changes، نسخه‌های change_log این تراکنش ثبت می‌شوند تا poll_changes آن‌ها را دوباره
+        بازخوانی نکند؛ نویسنده‌ای که کش را خودش به روز نمی‌کند باید track=False بدهد.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                # تراکنش بیرونی در جریان است؛ به همان ملحق می‌شویم
+                yield conn
+                return
+            
+            if immediate and self.metrics.enabled:
+                # زمان BEGIN IMMEDIATE همان انتظار (busy timeout) برای قفل نوشتن پایگاه داده است
+                started = time.perf_counter()
+                conn.execute("BEGIN IMMEDIATE")
+                self.metrics.record_db_wait("sqlite_write", time.perf_counter() - started)
+            else:
+                conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            # قفل نوشتن از BEGIN IMMEDIATE تا commit در دست ماست، پس نسخه‌های بین دو خواندن مال همین تراکنش‌اند
+            track = track and immediate and self.track_changes
+            try:
+                if track:
+                    first = self._change_sequence(conn)
+                yield conn
+                if track:
+                    last = self._change_sequence(conn)
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+                # پس از commit ثبت می‌شود؛ نسخه‌های تراکنش برگشت‌خورده ممکن است دوباره به نمونه دیگری برسند
+                if track and last > first:
+                    with self._lock:
+                        self._own_versions.update(range(first + 1, last + 1))
+    
+    @staticmethod
+    def _change_sequence(conn):
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        return row[0] if row else 0
+    
+    def claim_own_changes(self, versions):
+        """جدا کردن نسخه‌هایی از versions که تراکنش‌های همین نمونه نوشته‌اند (و فراموش کردن آن‌ها)"""
+        with self._lock:
+            own = self._own_versions.intersection(versions)
+            self._own_versions -= own
+        return own
+    
+    def forget_own_changes(self, upto):
+        """فراموش کردن نسخه‌های خودی تا upto، مثلاً پس از بارگذاری کامل کش"""
+        with self._lock:
+            self._own_versions = {version for version in self._own_versions if version > upto}
+    
+    def explain_queries(self):
+        """اجرای EXPLAIN QUERY PLAN روی کوئری‌های پرتکرار؛ خروجی: نام کوئری -> سطرهای طرح اجرا"""
+        plans = {}
+        with self.connection() as conn:
+            for name, sql, params in self.HOT_QUERIES:
+                plans[name] = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        return plans
+    
+    @staticmethod
+    def is_full_scan(detail):
+        """آیا یک سطر EXPLAIN QUERY PLAN پیمایش کامل جدول بدون نمایه است؛ SCAN ... USING INTEGER PRIMARY KEY هم کل جدول را می‌خواند"""
+        return (detail.startswith("SCAN") and "USING INDEX" not in detail and "USING COVERING INDEX" not in detail
+                and "CONSTANT ROW" not in detail)
+    
+    def full_scan_queries(self):
+        """نام کوئری‌های پرتکراری که بدون نمایه کل یک جدول را پیمایش می‌کنند"""
+        return [name for name, plan in self.explain_queries().items() if any(map(self.is_full_scan, plan))]
+    
+    def pool_stats(self):
+        """آمار استخر اتصال‌ها: تعداد دریافت، انتظار و طول عمر اتصال‌ها"""
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open"] = self._open
+            idle = list(self._idle)
+        stats["idle"] = len(idle)
+        stats["oldest_idle_age"] = max((now - created for _, created in idle), default=0.0)
+        stats["avg_lifetime"] = stats["lifetime_total"] / stats["closed"] if stats["closed"] else 0.0
+        return stats
+    
+    def set_instrumentation(self, enabled):
+        """روشن یا خاموش کردن اندازه‌گیری؛ اتصال‌های آزاد بسته می‌شوند تا با نوع مناسب دوباره باز شوند"""
+        self.metrics.enabled = enabled
+        self.close()
+    
+    def close(self):
+        """بستن تمام اتصال‌های آزاد استخر"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._discard(entry)
     
     def init_database(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            self._create_schema(cursor)
+            self._migrate(cursor)
+            
+            # درج داده‌های اولیه
+            self._insert_sample_data(cursor)
+            
+            self.schema = self._detect_schema(cursor)
+    
+    def _migrate(self, cursor):
+        """ارتقای پایگاه داده تا آخرین نسخه بر اساس PRAGMA user_version"""
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for number, name in enumerate(self.MIGRATIONS[version:], start=version + 1):
+            getattr(self, name)(cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+    
+    def _migrate_course_status(self, cursor):
+        """افزودن ستون status به پایگاه‌داده‌های قدیمی"""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(courses)")}
+        if "status" not in columns:
+            cursor.execute("ALTER TABLE courses ADD COLUMN status TEXT DEFAULT 'approved'")
+    
+    def _migrate_access_indexes(self, cursor):
+        """نمایه‌های پوششی برای مسیرهای دسترسی بر اساس درس، استاد و وضعیت"""
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_student_courses_course ON student_courses (course_code, student_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_courses_professor ON courses (professor_id, status)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_courses_status ON courses (status)')
+    
+    def _migrate_change_log(self, cursor):
+        """جدول change_log با نسخه صعودی که تریگرها در هر تغییر دروس و دانشجویان پر می‌کنند
+        
+        نمونه‌های مختلف برنامه روی یک فایل پایگاه داده فقط سطرهای جدیدتر از آخرین نسخه دیده‌شده را می‌خوانند.
+        ثبت‌نام و حذف درس همیشه total_units دانشجو و current_students درس را به روز می‌کنند،
+        پس جدول student_courses تریگر جداگانه لازم ندارد.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_key TEXT NOT NULL,
+                changed_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+            )
+        ''')
+        for table, key in (("courses", "course_code"), ("students", "sid")):
+            for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_log AFTER {event} ON {table}
+                    BEGIN
+                        INSERT INTO change_log (table_name, row_key) VALUES ('{table}', {row}.{key});
+                    END
+                ''')
+    
+    def _migrate_hash_passwords(self, cursor):
+        """هش یک‌باره رمزهای متن ساده موجود، فقط اگر تعدادشان کم باشد
+        
+        هش هر رمز ده‌ها میلی‌ثانیه طول می‌کشد و مهاجرت داخل تراکنش راه‌اندازی اجرا می‌شود؛
+        برای ده‌ها هزار دانشجو این یعنی دقیقه‌ها قفل نوشتن، پس آن‌ها به hash_plaintext_passwords سپرده می‌شوند.
+        """
+        pending = sum(
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE NOT password GLOB '{PASSWORD_SCHEME}$*'").fetchone()[0]
+            for table, _ in self.ACCOUNT_TABLES
+        )
+        if pending <= self.PASSWORD_MIGRATION_INLINE_LIMIT:
+            for table, key_column in self.ACCOUNT_TABLES:
+                self._hash_plaintext_passwords(cursor, table, key_column)
+    
+    def hash_plaintext_passwords(self, batch_size=500):
+        """هش دسته‌ای رمزهای متن ساده باقی‌مانده؛ قابل توقف و ادامه
+        
+        هش‌ها بیرون از تراکنش محاسبه می‌شوند و هر دسته در تراکنش کوتاه جداگانه نوشته می‌شود،
+        پس برنامه‌های در حال اجرا فقط لحظه‌ای منتظر قفل نوشتن می‌مانند.
+        رمزی که در این فاصله تغییر کرده باشد بازنویسی نمی‌شود. خروجی: تعداد رمزهای هش‌شده
+        """
+        hashed = 0
+        for table, key_column in self.ACCOUNT_TABLES:
+            last_key = None
+            while True:
+                sql = f"SELECT {key_column}, password FROM {table} WHERE NOT password GLOB '{PASSWORD_SCHEME}$*'"
+                params = ()
+                if last_key is not None:
+                    sql += f" AND {key_column} > ?"
+                    params = (last_key,)
+                with self.connection() as conn:
+                    rows = conn.execute(sql + f" ORDER BY {key_column} LIMIT ?", params + (batch_size,)).fetchall()
+                if not rows:
+                    break
+                hashes = hash_passwords(password for _, password in rows)
+                # کش هیچ نمونه‌ای اینجا به روز نمی‌شود؛ نمونه‌ها باید این تغییرات را در poll ببینند
+                with self.transaction(track=False) as conn:
+                    cursor = conn.executemany(
+                        f'UPDATE {table} SET password = ? WHERE {key_column} = ? AND password = ?',
+                        [(password_hash, key, password) for password_hash, (key, password) in zip(hashes, rows)])
+                    hashed += cursor.rowcount
+                last_key = rows[-1][0]
+        return hashed
+    
+    def _migrate_waitlist(self, cursor):
+        """صف انتظار دروس تکمیل؛ ترتیب صف همان id صعودی است"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS waitlist (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_code TEXT NOT NULL,
+                student_id TEXT NOT NULL,
+                joined_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                FOREIGN KEY (student_id) REFERENCES students (sid),
+                FOREIGN KEY (course_code) REFERENCES courses (course_code),
+                UNIQUE(course_code, student_id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_waitlist_course ON waitlist (course_code, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_waitlist_student ON waitlist (student_id)')
+    
+    def _migrate_course_status_log(self, cursor):
+        """سابقه تغییر وضعیت دروس (تأیید و رد)؛ هر تغییر یک سطر با وضعیت قبلی و کاربر تغییردهنده"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS course_status_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_code TEXT NOT NULL,
+                old_status TEXT,
+                new_status TEXT NOT NULL,
+                changed_by TEXT,
+                changed_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_course_status_log_course ON course_status_log (course_code, id)')
+    
+    def _hash_plaintext_passwords(self, cursor, table, key_column, keys=None):
+        """جایگزینی رمزهای متن ساده جدول (یا فقط کلیدهای keys) با هش؛ هش‌ها به صورت موازی محاسبه می‌شوند"""
+        sql = f"SELECT {key_column}, password FROM {table} WHERE NOT password GLOB '{PASSWORD_SCHEME}$*'"
+        params = ()
+        if keys is not None:
+            sql += f" AND {key_column} IN ({', '.join('?' * len(keys))})"
+            params = tuple(keys)
+        rows = cursor.execute(sql, params).fetchall()
+        if rows:
+            hashes = hash_passwords(password for _, password in rows)
+            cursor.executemany(f'UPDATE {table} SET password = ? WHERE {key_column} = ?',
+                               [(password_hash, key) for password_hash, (key, _) in zip(hashes, rows)])
+    
+    def _detect_schema(self, cursor):
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        tables = [row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        columns = {
+            table: frozenset(row[1] for row in cursor.execute(f"PRAGMA table_info({table})"))
+            for table in tables
+        }
+        return SchemaInfo(version, columns)
+    
+    def _create_schema(self, cursor):
         
         # ایجاد جدول دانشجویان
         cursor.execute('''
@@ -76,12 +903,6 @@ class DatabaseManager:
                 UNIQUE(student_id, course_code)
             )
         ''')
-        
-        # درج داده‌های اولیه
-        self._insert_sample_data(cursor)
-        
-        conn.commit()
-        conn.close()
     
     def _insert_sample_data(self, cursor):
         # درج اساتید نمونه
@@ -137,145 +958,774 @@ class DatabaseManager:
             INSERT OR IGNORE INTO students (sid, name, password, major, email, entry_year, total_units)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', students)
+        
+        # رمز حساب‌های نمونه تازه درج‌شده هش می‌شود؛ حساب‌های موجود دست نمی‌خورند
+        for (table, key_column), rows in zip(self.ACCOUNT_TABLES, (students, professors, admins)):
+            self._hash_plaintext_passwords(cursor, table, key_column, [row[0] for row in rows])
 
 
-class UniversitySystem:
+# یکسان‌سازی نویسه‌های عربی و فارسی، حذف اعراب و کشیده و تبدیل ارقام فارسی/عربی به لاتین
+_SEARCH_TRANSLATION = str.maketrans({
+    **{ch: "ی" for ch in "يى"},
+    **{ch: "ا" for ch in "أإآٱ"},
+    "ك": "ک", "ة": "ه", "ۀ": "ه", "ؤ": "و", "ئ": "ی",
+    "\u200c": " ", "\u200d": "", "ـ": "",
+    **{chr(code): "" for code in range(0x064B, 0x0660)},
+    "\u0670": "",
+    **{persian: str(digit) for digit, persian in enumerate("۰۱۲۳۴۵۶۷۸۹")},
+    **{arabic: str(digit) for digit, arabic in enumerate("٠١٢٣٤٥٦٧٨٩")},
+})
+
+
+def normalize_search_text(text):
+    """متن یکسان‌شده برای جستجو (حروف کوچک، فاصله‌های یکتا)"""
+    return " ".join(str(text).translate(_SEARCH_TRANSLATION).lower().split())
+
+
+# روزهای هفته به ترتیب بیت‌مپ؛ در الگو، نام‌های چندبخشی قبل از «شنبه» بررسی می‌شوند
+SCHEDULE_DAYS = ("شنبه", "یکشنبه", "دوشنبه", "سه شنبه", "چهارشنبه", "پنجشنبه", "جمعه")
+SLOTS_PER_DAY = 48  # نیم‌ساعت‌های یک روز
+_DAY_INDEX = {day.replace(" ", ""): index for index, day in enumerate(SCHEDULE_DAYS)}
+_SCHEDULE_PATTERN = re.compile(
+    r"(?P<day>یک ?شنبه|دو ?شنبه|سه ?شنبه|چهار ?شنبه|پنج ?شنبه|شنبه|جمعه)"
+    r"|(?P<start>\d{1,2})(?:[:.](?P<start_min>\d{2}))?\s*(?:-|–|تا)\s*(?P<end>\d{1,2})(?:[:.](?P<end_min>\d{2}))?"
+)
+
+
+def parse_schedule(text):
+    """تبدیل زمان برگزاری متنی مانند «شنبه و دوشنبه ۱۰-۱۲» به بیت‌مپ هفتگی
+    
+    هر روز ۴۸ بیت (نیم‌ساعت) دارد و بیت day * 48 + slot نشان‌دهنده اشغال آن نیم‌ساعت است.
+    هر بازه زمانی به روزهای قبل از خودش اعمال می‌شود؛ متن نامفهوم بیت‌مپ صفر می‌دهد.
+    """
+    mask = 0
+    days, last_days = [], []
+    for match in _SCHEDULE_PATTERN.finditer(normalize_search_text(text)):
+        if match.group("day"):
+            days.append(_DAY_INDEX[match.group("day").replace(" ", "")])
+            continue
+        
+        start = int(match.group("start")) * 2 + (int(match.group("start_min") or 0) >= 30)
+        end = int(match.group("end")) * 2 + (int(match.group("end_min") or 0) > 0)
+        if not 0 <= start < end <= SLOTS_PER_DAY:
+            continue
+        
+        days, last_days = [], days or last_days
+        slots = ((1 << (end - start)) - 1) << start
+        for day in last_days:
+            mask |= slots << (day * SLOTS_PER_DAY)
+    return mask
+
+
+_EXAM_DATE_PATTERN = re.compile(r"(\d{4})\s*[/-]\s*(\d{1,2})\s*[/-]\s*(\d{1,2})")
+
+
+def parse_exam_date(text):
+    """تبدیل تاریخ شمسی امتحان مانند «۱۴۰۴/۰۳/۲۰» به عدد ترتیبی روز؛ برای متن نامعتبر None
+    
+    عدد حاصل برای هر روز تقویم یکتا و با ترتیب تاریخ‌ها هم‌جهت است (سال × ۳۷۲ + ماه × ۳۱ + روز).
+    """
+    match = _EXAM_DATE_PATTERN.search(normalize_search_text(text or ""))
+    if not match:
+        return None
+    year, month, day = (int(part) for part in match.groups())
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return year * 372 + (month - 1) * 31 + (day - 1)
+
+
+class SearchIndex:
+    """نمایه سه‌حرفی (trigram) برای جستجوی زیررشته‌ای
+    
+    پرس‌وجوهای کوتاه‌تر از سه حرف سه‌حرفی ندارند و مانند قبل با پیمایش متن‌ها به صورت زیررشته جستجو می‌شوند.
+    قفل داخلی فقط در طول کار روی همین ساختارهای حافظه گرفته می‌شود، پس نخ رابط کاربری می‌تواند هم‌زمان
+    با نخ‌های نویسنده (که قفل کش را در طول کار با پایگاه داده نگه می‌دارند) جستجو کند.
+    """
+    GRAM = 3
+    
     def __init__(self):
-        self.db = DatabaseManager()
-        self._cache_data()
+        self._texts = {}  # کلید -> متن یکسان‌شده
+        self._grams = {}  # سه‌حرفی -> مجموعه کلیدها
+        self._lock = threading.Lock()
     
-    def _cache_data(self):
-        """کش کردن داده‌ها برای عملکرد بهتر"""
-        self.students = self._get_all_students()
-        self.professors = self._get_all_professors()
-        self.admins = self._get_all_admins()
-        self.courses = self._get_all_courses()
+    def __len__(self):
+        return len(self._texts)
     
-    def _get_all_students(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM students')
-        students = {}
-        for row in cursor.fetchall():
-            sid, name, password, major, email, entry_year, total_units = row
-            students[sid] = {
-                "name": name,
-                "password": password,
-                "major": major,
-                "email": email,
-                "entry_year": entry_year,
-                "total_units": total_units,
-                "courses": self._get_student_courses(sid)
-            }
-        conn.close()
-        return students
+    def _grams_of(self, text):
+        return {
+            text[i:i + self.GRAM] for i in range(len(text) - self.GRAM + 1)
+            if "\n" not in text[i:i + self.GRAM]
+        }
     
-    def _get_all_professors(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM professors')
-        professors = {}
-        for row in cursor.fetchall():
-            pid, name, password, department = row
-            professors[pid] = {
-                "name": name,
-                "password": password,
-                "department": department
-            }
-        conn.close()
-        return professors
+    def add(self, key, *fields):
+        # جداکننده خط جدید مانع ساخته شدن سه‌حرفی بین دو فیلد می‌شود
+        text = "\n".join(normalize_search_text(field) for field in fields if field)
+        grams = self._grams_of(text)
+        with self._lock:
+            self._remove(key)
+            self._texts[key] = text
+            for gram in grams:
+                self._grams.setdefault(gram, set()).add(key)
     
-    def _get_all_admins(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM admins')
-        admins = {}
-        for row in cursor.fetchall():
-            username, name, password = row
-            admins[username] = {
-                "name": name,
-                "password": password
-            }
-        conn.close()
-        return admins
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
     
-    def _get_all_courses(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM courses')
-        courses = {}
-        for row in cursor.fetchall():
-            if len(row) == 12:  # اگر ستون status وجود دارد
-                course_code, course_name, professor, professor_id, units, capacity, current_students, schedule, department, classroom, exam_date, status = row
-            else:  # اگر ستون status وجود ندارد
-                course_code, course_name, professor, professor_id, units, capacity, current_students, schedule, department, classroom, exam_date = row
-                status = "approved"  # مقدار پیش‌فرض
+    def _remove(self, key):
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        for gram in self._grams_of(text):
+            keys = self._grams.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._grams[gram]
+    
+    def search(self, query):
+        """مجموعه کلیدهای منطبق؛ برای پرس‌وجوی خالی None برمی‌گرداند"""
+        query = normalize_search_text(query)
+        if not query:
+            return None
+        
+        with self._lock:
+            if len(query) < self.GRAM:
+                # پیمایش خطی برای یک یا دو حرف؛ خط جدید بین فیلدها در پرس‌وجو نمی‌آید پس تطابق از مرز فیلد نمی‌گذرد
+                return {key for key, text in self._texts.items() if query in text}
             
-            courses[course_code] = {
-                "name": course_name,
-                "professor": professor,
-                "professor_id": professor_id,
-                "units": units,
-                "capacity": capacity,
-                "current_students": current_students,
-                "schedule": schedule,
-                "department": department,
-                "classroom": classroom,
-                "exam_date": exam_date,
-                "status": status
-            }
-        conn.close()
-        return courses
+            grams = {query[i:i + self.GRAM] for i in range(len(query) - self.GRAM + 1)}
+            postings = sorted((self._grams.get(gram, ()) for gram in grams), key=len)
+            if not postings[0]:
+                return set()
+            candidates = set(postings[0])
+            for keys in postings[1:]:
+                candidates &= keys
+                if not candidates:
+                    return candidates
+            
+            # سه‌حرفی‌ها شرط لازم‌اند؛ تطابق نهایی روی متن کامل بررسی می‌شود
+            if len(query) == self.GRAM:
+                return candidates
+            return {key for key in candidates if query in self._texts[key]}
+
+
+# ستون‌های فایل ورود دانشجویان؛ year هم به جای entry_year پذیرفته می‌شود
+STUDENT_IMPORT_FIELDS = ("sid", "name", "password", "major", "email", "entry_year")
+_DIGIT_TRANSLATION = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "0123456789" * 2)
+
+
+# نگاشت فیلدهای courses.json رابط وب به ستون‌های جدول courses
+# enrolled عمداً در این نگاشت نیست: شمار ثبت‌نام‌های وب مال رابط وب است و ثبت‌نام‌های این سامانه
+# در student_courses نگه داشته می‌شوند، پس خروجی مقدار enrolled فایل موجود را دست نمی‌زند
+CATALOG_FIELDS = (
+    ("name", "course_name"), ("code", "course_code"), ("units", "units"), ("instructor", "professor"),
+    ("professorId", "professor_id"), ("time", "schedule"), ("location", "classroom"), ("capacity", "capacity"),
+    ("department", "department"), ("examDate", "exam_date"),
+)
+# مقادیر پیش‌فرض فیلدهای مخصوص رابط وب برای دروسی که در courses.json نبوده‌اند
+CATALOG_WEB_DEFAULTS = {"description": "", "prerequisites": [], "color": "#4361ee", "enrolled": 0}
+
+
+def read_import_rows(path):
+    """خواندن فایل ورود: CSV با سطر عنوان، آرایه JSON یا JSON Lines (جریانی)
     
-    def _get_student_courses(self, student_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT course_code FROM student_courses WHERE student_id = ?', (student_id,))
-        courses = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return courses
+    خروجی (شماره خط یا ردیف، دیکشنری یا None برای سطر خراب).
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        
+        # آرایه JSON (مانند courses.json) یک‌جا خوانده می‌شود؛ JSON Lines سطر به سطر
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if head == "[":
+            f.seek(0)
+            for number, row in enumerate(json.load(f), start=1):
+                yield number, row if isinstance(row, dict) else None
+            return
+        f.seek(0)
+        
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+
+
+def write_rows(cursor, path, fmt=None, batch_size=1000):
+    """نوشتن جریانی نتیجه یک کوئری در CSV یا JSON Lines با fetchmany؛ حافظه مستقل از تعداد سطرها
+    
+    قالب از پسوند فایل (.csv یا .jsonl) یا پارامتر fmt تعیین می‌شود. خروجی: تعداد سطرها.
+    """
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    columns = [description[0] for description in cursor.description]
+    count = 0
+    temp_path = path + ".tmp"
+    # utf-8-sig تا اکسل حروف فارسی CSV را درست نمایش دهد
+    with open(temp_path, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            if writer:
+                writer.writerows(batch)
+            else:
+                f.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in batch)
+            count += len(batch)
+    os.replace(temp_path, path)
+    return count
+
+
+class EnrollmentError(Exception):
+    """خطای قابل نمایش به کاربر که تراکنش ثبت‌نام را برمی‌گرداند"""
+
+
+class Record:
+    """رکورد فشرده با __slots__ به جای دیکشنری؛ دسترسی record["name"] و record.get() همچنان برقرار است"""
+    __slots__ = ()
+    
+    def __init__(self, *values, **fields):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+        for name in self.__slots__[len(values):]:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError(f"فیلد ناشناخته: {', '.join(fields)}")
+    
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+    
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+    
+    def __contains__(self, key):
+        return key in self.__slots__
+    
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+    
+    def update(self, fields=(), **more):
+        for key, value in dict(fields, **more).items():
+            self[key] = value
+    
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class StudentRecord(Record):
+    # courses یک تاپل از کدهای درس (رشته‌های intern شده مشترک با کلیدهای self.courses) است
+    __slots__ = ("name", "password", "major", "email", "entry_year", "total_units", "courses",
+                 "schedule_mask", "exams")
+    
+    def add_course(self, code):
+        self.courses = self.courses + (code,)
+    
+    def remove_course(self, code):
+        courses = list(self.courses)
+        courses.remove(code)
+        self.courses = tuple(courses)
+
+
+class CourseRecord(Record):
+    __slots__ = ("name", "professor", "professor_id", "units", "capacity", "current_students", "schedule",
+                 "department", "classroom", "exam_date", "status", "schedule_mask", "exam_day")
+
+
+class ProfessorRecord(Record):
+    __slots__ = ("name", "password", "department")
+
+
+class AdminRecord(Record):
+    __slots__ = ("name", "password")
+
+
+class LazyTable(MutableMapping):
+    """نگاشت کلید -> رکورد که رکوردها را در اولین دسترسی از پایگاه داده می‌خواند و در یک کش LRU محدود نگه می‌دارد
+    
+    load(key) رکورد یا None برمی‌گرداند؛ keys() و count() فهرست و تعداد کلیدها را از پایگاه داده می‌دهند.
+    """
+    
+    def __init__(self, load, keys, count, maxsize=1000):
+        self._load = load
+        self._keys = keys
+        self._count = count
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
     
-    def _update_student_units(self, student_id):
-        """به روزرسانی مجموع واحدهای دانشجو"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+    def __getitem__(self, key):
+        with self._lock:
+            record = self._cache.get(key)
+            if record is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return record
+            self.misses += 1
         
-        # محاسبه مجموع واحدها
-        cursor.execute('''
-            SELECT SUM(c.units) 
-            FROM student_courses sc 
-            JOIN courses c ON sc.course_code = c.course_code 
-            WHERE sc.student_id = ?
-        ''', (student_id,))
+        record = self._load(key)
+        if record is None:
+            raise KeyError(key)
+        with self._lock:
+            # اگر نخ دیگری همزمان همین رکورد را بارگذاری کرده باشد، همان نسخه حفظ می‌شود
+            record = self._cache.setdefault(key, record)
+            self._cache.move_to_end(key)
+            self._evict()
+        return record
+    
+    def __setitem__(self, key, record):
+        with self._lock:
+            self._cache[key] = record
+            self._cache.move_to_end(key)
+            self._evict()
+    
+    def __delitem__(self, key):
+        # فقط از کش حذف می‌شود؛ حذف سطر پایگاه داده با فراخواننده است
+        with self._lock:
+            self._cache.pop(key, None)
+    
+    def __iter__(self):
+        return iter(self._keys())
+    
+    def __len__(self):
+        return self._count()
+    
+    def _evict(self):
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+    
+    def peek(self, key):
+        """رکورد در صورت حضور در کش، بدون بارگذاری و بدون تغییر آمار"""
+        with self._lock:
+            return self._cache.get(key)
+    
+    def cached_items(self):
+        with self._lock:
+            return list(self._cache.items())
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# علت رد ثبت‌نام برای وضعیت‌های غیرقابل ثبت‌نام درس
+_STATUS_ERRORS = {"rejected": "این درس رد شده است!", "pending": "این درس هنوز تأیید نشده است!"}
+
+
+def _intern(value):
+    """رشته‌های پرتکرار (رشته، دانشکده، وضعیت، کد درس) فقط یک بار در حافظه نگه داشته می‌شوند"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class UniversitySystem:
+    MAX_UNITS = 20
+    # رفتار در تداخل تاریخ امتحان: "reject" رد ثبت‌نام، "warn" ثبت‌نام همراه با هشدار
+    EXAM_CLASH_POLICY = "reject"
+    # وضعیت‌های مجاز درس و عنوان نمایشی آن‌ها
+    COURSE_STATUSES = {"pending": "در انتظار تأیید", "approved": "تأیید شده", "rejected": "رد شده"}
+    # اندازه کش میان‌بر بررسی رمز (تعداد رمزهای تازه تأییدشده)
+    VERIFY_CACHE_SIZE = 4096
+    # گزارش‌های قابل خروجی: (کوئری، نیاز به کلید درس یا استاد)
+    EXPORT_QUERIES = {
+        "roster": ('''
+            SELECT sc.student_id AS sid, s.name, s.major, s.entry_year, sc.course_code,
+                   c.course_name, c.professor, c.units
+            FROM student_courses sc
+            JOIN students s ON s.sid = sc.student_id
+            JOIN courses c ON c.course_code = sc.course_code
+            ORDER BY sc.student_id, sc.course_code
+        ''', False),
+        "course": ('''
+            SELECT s.sid, s.name, s.major, s.entry_year, s.email
+            FROM student_courses sc
+            JOIN students s ON s.sid = sc.student_id
+            WHERE sc.course_code = ?
+            ORDER BY sc.student_id
+        ''', True),
+        "professor": ('''
+            SELECT c.course_code, c.course_name, s.sid, s.name, s.major, s.entry_year, s.total_units
+            FROM courses c
+            JOIN student_courses sc ON sc.course_code = c.course_code
+            JOIN students s ON s.sid = sc.student_id
+            WHERE c.professor_id = ?
+            ORDER BY c.course_code, sc.student_id
+        ''', True),
+    }
+    # بیش از این تعداد تغییر معوق، بارگذاری کامل کش از اعمال تک‌تک تغییرات ارزان‌تر است
+    CHANGE_LOG_RELOAD_THRESHOLD = 5000
+    # عمر سطرهای change_log پیش از پاک‌سازی (ثانیه)
+    CHANGE_LOG_MAX_AGE = 24 * 3600
+
+    def __init__(self, db_name="university.db", lazy=False, cache_size=1000, metrics=None):
+        # اندازه‌گیری عملیات (پیش‌فرض خاموش)؛ با set_instrumentation روشن می‌شود
+        self.metrics = metrics or Metrics()
+        self.metrics.sources["caches"] = self.cache_stats
+        self.db = DatabaseManager(db_name, metrics=self.metrics)
+        # در حالت تنبل دانشجویان، اساتید و مدیران در اولین دسترسی و در کش LRU با اندازه cache_size بارگذاری می‌شوند
+        self.lazy = lazy
+        self.cache_size = cache_size
+        # میان‌بر بررسی رمز: هش ذخیره‌شده -> HMAC رمز با کلید تصادفی همین پردازه
+        self._verified = OrderedDict()
+        self._verify_key = os.urandom(32)
+        self._verify_lock = threading.Lock()
+        # قفل تغییر کش؛ بررسی‌های پیش از نوشتن و به روزرسانی کش پس از آن باید با هم اتمی باشند
+        # (مثلاً دو ثبت‌نام هم‌زمان یک دانشجو در دو درس با زمان یکسان)
+        self._lock = threading.RLock()
+        # قفل کوتاه افزودن و حذف کلیدهای self.courses و self.students؛ فقط دور تغییر حافظه گرفته می‌شود و نه
+        # در طول کار با پایگاه داده، تا نخ رابط کاربری برای کپی گرفتن منتظر نویسنده‌ها نماند
+        self._cache_lock = threading.Lock()
+        self._cache_data()
+    
+    @instrumented
+    def _cache_data(self):
+        """کش کردن داده‌ها برای عملکرد بهتر"""
+        # نسخه تغییرات پیش از خواندن داده‌ها ثبت می‌شود؛ تغییرات همزمان در poll بعدی دوباره (و بی‌خطر) اعمال می‌شوند
+        self.change_version = self._latest_change_version()
+        if self.lazy:
+            self._cache_lazy()
+            return
         
-        total_units = cursor.fetchone()[0] or 0
+        # همه جداول با یک اتصال و چند کوئری مجموعه‌ای خوانده می‌شوند
+        with self.db.connection():
+            self.students = self._get_all_students()
+            self.professors = self._get_all_professors()
+            self.admins = self._get_all_admins()
+            self.courses = self._get_all_courses()
+        self.course_students = self._index_course_students()
         
-        # به روزرسانی واحدها در دیتابیس
-        cursor.execute('UPDATE students SET total_units = ? WHERE sid = ?', (total_units, student_id))
-        conn.commit()
-        conn.close()
+        # نمایه جستجوی دروس؛ نمایه دانشجویان فقط در اولین جستجو ساخته می‌شود
+        self.course_index = self._build_course_index()
+        self.student_index = None
         
-        # به روزرسانی کش
-        if student_id in self.students:
-            self.students[student_id]["total_units"] = total_units
+        # بیت‌مپ زمانی تجمعی و تقویم مرتب امتحانات هر دانشجو
+        for student in self.students.values():
+            self._refresh_student_schedule(student)
     
-    def _update_course_students(self, course_code):
-        """به روزرسانی تعداد دانشجویان ثبت‌نام شده در درس"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+    def _cache_lazy(self):
+        """حالت تنبل: فقط کاتالوگ دروس کامل خوانده می‌شود؛ بقیه جداول در اولین دسترسی"""
+        with self.db.connection():
+            self.courses = self._get_all_courses()
+        self.course_students = None
+        self.course_index = self._build_course_index()
+        self.student_index = None
         
-        cursor.execute('SELECT COUNT(*) FROM student_courses WHERE course_code = ?', (course_code,))
-        current_students = cursor.fetchone()[0]
+        self.students = self._lazy_table("students", "sid", self._load_student)
+        self.professors = self._lazy_table("professors", "pid", self._load_professor)
+        self.admins = self._lazy_table("admins", "username", self._load_admin)
+    
+    def _lazy_table(self, table, key_column, load):
+        def keys():
+            with self.db.connection() as conn:
+                return [key for key, in conn.execute(f'SELECT {key_column} FROM {table} ORDER BY {key_column}')]
         
-        cursor.execute('UPDATE courses SET current_students = ? WHERE course_code = ?', (current_students, course_code))
-        conn.commit()
-        conn.close()
+        def count():
+            with self.db.connection() as conn:
+                return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
         
-        # به روزرسانی کش
-        if course_code in self.courses:
-            self.courses[course_code]["current_students"] = current_students
-
-    def add_student(self, sid, name, password, major, email="", year=""):
+        return LazyTable(load, keys, count, self.cache_size)
+    
+    def _load_student(self, sid):
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT name, password, major, email, entry_year, total_units FROM students WHERE sid = ?', (sid,)).fetchone()
+            if row is None:
+                return None
+            name, password, major, email, entry_year, total_units = row
+            cursor = conn.execute('SELECT course_code FROM student_courses WHERE student_id = ? ORDER BY course_code', (sid,))
+            courses = tuple(_intern(code) for code, in cursor)
+        student = StudentRecord(name, password, _intern(major), email, entry_year, total_units, courses)
+        self._refresh_student_schedule(student)
+        return student
+    
+    def _load_professor(self, pid):
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT name, password, department FROM professors WHERE pid = ?', (pid,)).fetchone()
+        if row is None:
+            return None
+        name, password, department = row
+        return ProfessorRecord(name, password, _intern(department))
+    
+    def _load_admin(self, username):
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT name, password FROM admins WHERE username = ?', (username,)).fetchone()
+        return AdminRecord(*row) if row else None
+    
+    def set_instrumentation(self, enabled):
+        self.db.set_instrumentation(enabled)
+    
+    def cache_stats(self):
+        """آمار hit/miss/eviction کش تنبل برای هر جدول؛ در حالت عادی همه داده‌ها در حافظه‌اند و خروجی خالی است"""
+        if not self.lazy:
+            return {}
+        return {name: getattr(self, name).stats() for name in ("students", "professors", "admins")}
+    
+    def _cached_student(self, sid):
+        """رکورد دانشجو اگر در حافظه باشد؛ در حالت تنبل بدون بارگذاری از پایگاه داده"""
+        return self.students.peek(sid) if self.lazy else self.students.get(sid)
+    
+    def _enrolled_students(self, code, forget=False):
+        """رکورد دانشجویان ثبت‌نامی درس که در حافظه هستند؛ با forget نمایه معکوس درس هم حذف می‌شود"""
+        if self.lazy:
+            return [student for _, student in self.students.cached_items() if code in student.courses]
+        sids = self.course_students.pop(code, ()) if forget else self.course_students.get(code, ())
+        return [self.students[sid] for sid in sids if sid in self.students]
+    
+    def _get_all_students(self):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT sid, name, password, major, email, entry_year, total_units FROM students')
+            students = {}
+            for row in cursor.fetchall():
+                sid, name, password, major, email, entry_year, total_units = row
+                students[sid] = StudentRecord(name, password, _intern(major), email, entry_year, total_units, ())
+            
+            # یک گذر روی جدول ارتباطی (گروه‌بندی شده بر اساس دانشجو) به جای یک کوئری برای هر دانشجو
+            cursor.execute('SELECT student_id, course_code FROM student_courses ORDER BY student_id, course_code')
+            for student_id, rows in groupby(cursor, key=itemgetter(0)):
+                if student_id in students:
+                    students[student_id].courses = tuple(_intern(course_code) for _, course_code in rows)
+        return students
+    
+    def _index_course_students(self):
+        """نمایه معکوس درس -> مجموعه دانشجویان ثبت‌نامی"""
+        course_students = {code: set() for code in self.courses}
+        for sid, student in self.students.items():
+            for code in student["courses"]:
+                course_students.setdefault(code, set()).add(sid)
+        return course_students
+    
+    def _index_course(self, code, index=None):
+        """به روزرسانی نمایه جستجو و بیت‌مپ زمانی درس"""
+        course = self.courses[code]
+        course["schedule_mask"] = parse_schedule(course["schedule"])
+        course["exam_day"] = parse_exam_date(course.get("exam_date"))
+        if index is None:
+            index = self.course_index
+        index.add(code, code, course["name"], course["professor"])
+    
+    def _build_course_index(self):
+        """نمایه کامل دروس؛ پس از ساخته شدن منتشر می‌شود تا جستجوی هم‌زمان نمایه نیمه‌کاره نبیند"""
+        index = SearchIndex()
+        for code in self.courses:
+            self._index_course(code, index)
+        return index
+    
+    def _refresh_student_schedule(self, student):
+        """بیت‌مپ زمانی تجمعی و تقویم امتحانات (مرتب بر اساس روز) دانشجو از روی دروس فعلی او"""
+        mask = 0
+        exams = []
+        for code in student.courses:
+            if code in self.courses:
+                course = self.courses[code]
+                mask |= course["schedule_mask"]
+                if course["exam_day"] is not None:
+                    exams.append((course["exam_day"], code))
+        exams.sort()
+        student.schedule_mask = mask
+        student.exams = exams
+    
+    def _exam_clash(self, student, course_code):
+        """کد درسی از دانشجو که امتحانش هم‌روز با این درس است، با جستجوی دودویی؛ در غیر این صورت None"""
+        day = self.courses[course_code]["exam_day"]
+        if day is None:
+            return None
+        exams = student.exams
+        index = bisect_left(exams, (day,))
+        if index < len(exams) and exams[index][0] == day:
+            return exams[index][1]
+        return None
+    
+    def _index_student(self, sid):
+        self.student_index.add(sid, sid, self.students[sid]["name"])
+    
+    @instrumented
+    def search_courses(self, query):
+        """کدهای درس منطبق با نام، کد یا استاد؛ برای پرس‌وجوی خالی None (نمایه قفل داخلی خود را دارد)"""
+        return self.course_index.search(query)
+    
+    @instrumented
+    def search_students(self, query):
+        """شماره‌های دانشجویی منطبق با نام یا شماره؛ برای پرس‌وجوی خالی None"""
+        if not self.lazy:
+            if self.student_index is None:
+                # ساخت یک‌باره زیر قفل نویسنده‌ها تا دانشجوی افزوده‌شده در حین ساخت جا نماند؛ این مسیر فقط
+                # در نخ‌های پس‌زمینه اجرا می‌شود. نمایه کامل ساخته و سپس منتشر می‌شود
+                with self._lock:
+                    if self.student_index is None:
+                        index = SearchIndex()
+                        for sid, student in self.students.items():
+                            index.add(sid, sid, student["name"])
+                        self.student_index = index
+            return self.student_index.search(query)
+        
+        # حالت تنبل: جستجوی مستقیم در پایگاه داده
+        query = query.strip()
+        if not query:
+            return None
+        pattern = f"%{query}%"
+        with self.db.connection() as conn:
+            cursor = conn.execute('SELECT sid FROM students WHERE sid LIKE ? OR name LIKE ?', (pattern, pattern))
+            return {sid for sid, in cursor}
+    
+    def snapshot_courses(self):
+        """کپی سطحی نگاشت دروس زیر قفل کوتاه _cache_lock؛ نخ رابط کاربری به جای پیمایش مستقیم self.courses از آن استفاده می‌کند"""
+        with self._cache_lock:
+            return dict(self.courses)
+    
+    def student_rows(self, query=""):
+        """ردیف‌های فهرست دانشجویان منطبق با پرس‌وجو، مرتب بر اساس شماره:
+        (شماره، نام، رشته، سال ورود، ایمیل، واحدها، تعداد دروس)
+        
+        برای نخ پس‌زمینه؛ در حالت تنبل با یک کوئری و بدون پر کردن کش LRU خوانده می‌شوند.
+        """
+        if self.lazy:
+            sql = '''
+                SELECT s.sid, s.name, s.major, s.entry_year, COALESCE(s.email, ''), s.total_units,
+                       (SELECT COUNT(*) FROM student_courses sc WHERE sc.student_id = s.sid)
+                FROM students s
+            '''
+            params = ()
+            query = query.strip()
+            if query:
+                sql += ' WHERE s.sid LIKE ? OR s.name LIKE ?'
+                params = (f"%{query}%",) * 2
+            with self.db.connection() as conn:
+                return conn.execute(sql + ' ORDER BY s.sid', params).fetchall()
+        
+        matches = self.search_students(query)
+        with self._cache_lock:
+            if matches is None:
+                students = list(self.students.items())
+            else:
+                students = [(sid, self.students.get(sid)) for sid in matches]
+        return [
+            (sid, student["name"], student["major"], student["entry_year"], student.get("email", ""),
+             student["total_units"], len(student["courses"]))
+            for sid, student in sorted(students, key=itemgetter(0)) if student is not None
+        ]
+    
+    def _get_all_professors(self):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT pid, name, password, department FROM professors')
+            professors = {}
+            for row in cursor.fetchall():
+                pid, name, password, department = row
+                professors[pid] = ProfessorRecord(name, password, _intern(department))
+        return professors
+    
+    def _get_all_admins(self):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT username, name, password FROM admins')
+            admins = {}
+            for row in cursor.fetchall():
+                username, name, password = row
+                admins[username] = AdminRecord(name, password)
+        return admins
+    
+    def _get_all_courses(self):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT course_code, course_name, professor, professor_id, units, capacity, current_students,
+                       schedule, department, classroom, exam_date, status
+                FROM courses
+            ''')
+            courses = dict(self._course_record(row) for row in cursor.fetchall())
+        return courses
+    
+    def _course_record(self, row):
+        """(کد درس، رکورد) از یک سطر کامل جدول courses"""
+        course_code, course_name, professor, professor_id, units, capacity, current_students, schedule, department, classroom, exam_date, status = row
+        return _intern(course_code), CourseRecord(
+            course_name, _intern(professor), _intern(professor_id), units, capacity, current_students,
+            schedule, _intern(department), classroom, exam_date, _intern(status)
+        )
+    
+    @instrumented
+    def get_professor_students(self, professor_id):
+        """دانشجویان ثبت‌نام‌شده در دروس یک استاد: (شماره، نام، رشته، سال ورود، واحدها)"""
+        with self.db.connection() as conn:
+            return conn.execute('''
+                SELECT DISTINCT s.sid, s.name, s.major, s.entry_year, s.total_units
+                FROM courses c
+                JOIN student_courses sc ON sc.course_code = c.course_code
+                JOIN students s ON s.sid = sc.student_id
+                WHERE c.professor_id = ?
+            ''', (professor_id,)).fetchall()
+    
+    def _check_password(self, stored, password):
+        """بررسی رمز؛ رمزی که اخیراً با همین هش تأیید شده با یک HMAC سریع دوباره بررسی می‌شود"""
+        token = hmac.new(self._verify_key, password.encode("utf-8"), "sha256").digest()
+        with self._verify_lock:
+            cached = self._verified.get(stored)
+        if cached is not None and hmac.compare_digest(cached, token):
+            return True
+        if not verify_password(password, stored):
+            return False
+        with self._verify_lock:
+            self._verified[stored] = token
+            if len(self._verified) > self.VERIFY_CACHE_SIZE:
+                self._verified.popitem(last=False)
+        return True
+    
+    @instrumented
+    def authenticate(self, user_type, username, password):
+        """ورود کاربر (student، professor یا admin)؛ خروجی (موفقیت، پیام)
+        
+        رمزهای متن ساده یا با هزینه قدیمی پس از ورود موفق با هزینه فعلی هش می‌شوند.
+        """
+        accounts = dict(zip(("student", "professor", "admin"), self.db.ACCOUNT_TABLES))
+        if user_type not in accounts:
+            return False, "نوع کاربر نامعتبر است!"
+        record = getattr(self, f"{user_type}s").get(username) if username else None
+        if record is None:
+            # زمان پاسخ برای نام کاربری ناموجود هم برابر باشد
+            verify_password(password, _dummy_password_hash())
+            return False, "نام کاربری یا رمز عبور اشتباه است!"
+        if not self._check_password(record.password, password):
+            return False, "نام کاربری یا رمز عبور اشتباه است!"
+        
+        if password_needs_rehash(record.password):
+            table, key_column = accounts[user_type]
+            password_hash = hash_password(password)
+            try:
+                with self.db.transaction() as conn:
+                    conn.execute(f'UPDATE {table} SET password = ? WHERE {key_column} = ? AND password = ?',
+                                 (password_hash, username, record.password))
+                record.password = password_hash
+            except sqlite3.Error:
+                pass  # هش دوباره در ورود بعدی تکرار می‌شود؛ ورود نباید شکست بخورد
+        return True, "ورود موفق"
+    
+    @instrumented
+    def add_student(self, sid, name, password, major, email="", year=""):
+        """اعتبارسنجی و هش کند رمز بیرون از قفل کش؛ فقط درج کوتاه در _insert_student قفل را می‌گیرد"""
         if sid in self.students:
             return False, "شماره دانشجویی تکراری است!"
         
@@ -283,30 +1733,335 @@ class UniversitySystem:
             return False, "لطفا تمام فیلدهای ضروری را پر کنید!"
         
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO students (sid, name, password, major, email, entry_year, total_units)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (sid, name, password, major, email, year or "نامشخص", 0))
-            conn.commit()
-            conn.close()
+            password_hash = hash_password(password)
+        except Exception as e:
+            return False, f"خطا در ثبت دانشجو: {str(e)}"
+        return self._insert_student(sid, name, password_hash, major, email, year)
+    
+    @synchronized
+    def _insert_student(self, sid, name, password_hash, major, email, year):
+        # ممکن است نخ یا نمونه دیگری در فاصله هش همین شماره را ثبت کرده باشد
+        if sid in self.students:
+            return False, "شماره دانشجویی تکراری است!"
+        
+        try:
+            with self.db.transaction() as conn:
+                conn.execute('''
+                    INSERT INTO students (sid, name, password, major, email, entry_year, total_units)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (sid, name, password_hash, major, email, year or "نامشخص", 0))
             
             # به روزرسانی کش
-            self.students[sid] = {
-                "name": name,
-                "password": password,
-                "major": major,
-                "email": email,
-                "entry_year": year or "نامشخص",
-                "total_units": 0,
-                "courses": []
-            }
+            with self._cache_lock:
+                self.students[sid] = StudentRecord(name, password_hash, _intern(major), email, year or "نامشخص", 0, (),
+                                                  schedule_mask=0, exams=[])
+            if self.student_index is not None:
+                self._index_student(sid)
             
             return True, "ثبت‌نام با موفقیت انجام شد!"
+        except sqlite3.IntegrityError:
+            return False, "شماره دانشجویی تکراری است!"
         except Exception as e:
             return False, f"خطا در ثبت دانشجو: {str(e)}"
 
+    def _validate_student_row(self, row):
+        """(سطر آماده درج، None) یا (None، علت رد) برای یک سطر فایل ورود"""
+        if row is None:
+            return None, "سطر نامعتبر"
+        values = {field: str(row.get(field) or "").strip() for field in STUDENT_IMPORT_FIELDS}
+        values["entry_year"] = values["entry_year"] or str(row.get("year") or "").strip()
+        sid = values["sid"].translate(_DIGIT_TRANSLATION)
+        year = values["entry_year"].translate(_DIGIT_TRANSLATION)
+        
+        if not all([sid, values["name"], values["password"], values["major"]]):
+            return None, "فیلدهای ضروری خالی است"
+        if not sid.isdigit():
+            return None, "شماره دانشجویی باید فقط شامل رقم باشد"
+        if year and not year.isdigit():
+            return None, "سال ورود نامعتبر است"
+        return (sid, values["name"], values["password"], _intern(values["major"]), values["email"], year or "نامشخص"), None
+    
+    def _select_in(self, conn, sql, keys, chunk=500):
+        """اجرای کوئری با فهرست IN به صورت تکه‌تکه (سقف تعداد پارامترهای SQLite)؛ sql شامل {placeholders} است"""
+        for start in range(0, len(keys), chunk):
+            part = keys[start:start + chunk]
+            yield from conn.execute(sql.format(placeholders=", ".join("?" * len(part))), part)
+    
+    @instrumented
+    def import_students(self, rows, batch_size=1000):
+        """ورود انبوه دانشجویان از جریان (شماره خط، سطر) مانند خروجی read_import_rows
+        
+        در هر دسته پس از اعتبارسنجی، شماره‌های موجود در پایگاه داده کنار گذاشته می‌شوند و فقط رمز سطرهای تازه
+        بیرون از قفل کش و تراکنش به صورت موازی هش می‌شود؛ سپس دسته با یک executemany در یک تراکنش درج می‌شود.
+        خروجی: rows، imported، rejected (فهرست (شماره خط، شماره دانشجویی، علت))، seconds و rows_per_sec.
+        """
+        started = time.perf_counter()
+        rows = iter(rows)
+        total = 0
+        seen = set()
+        imported = []
+        rejected = []
+        
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            total += len(batch)
+            
+            valid = []
+            for line_number, row in batch:
+                student, reason = self._validate_student_row(row)
+                if reason is None and student[0] in seen:
+                    reason = "شماره دانشجویی در فایل تکراری است"
+                if reason is not None:
+                    rejected.append((line_number, str((row or {}).get("sid") or ""), reason))
+                    continue
+                seen.add(student[0])
+                valid.append((line_number, student))
+            if not valid:
+                continue
+            
+            # شماره‌های موجود پیش از هش کنار گذاشته می‌شوند؛ هش پرهزینه‌ترین مرحله است
+            with self.db.connection() as conn:
+                existing = {sid for sid, in self._select_in(
+                    conn, 'SELECT sid FROM students WHERE sid IN ({placeholders})', [student[0] for _, student in valid]
+                )}
+            fresh = []
+            for line_number, student in valid:
+                if student[0] in existing:
+                    rejected.append((line_number, student[0], "شماره دانشجویی تکراری است!"))
+                else:
+                    fresh.append((line_number, student))
+            if not fresh:
+                continue
+            
+            # هش موازی بیرون از قفل کش و تراکنش تا سایر فراخوانی‌ها در این مدت منتظر نمانند
+            hashes = hash_passwords(student[2] for _, student in fresh)
+            fresh = [(line_number, student[:2] + (password_hash,) + student[3:])
+                     for (line_number, student), password_hash in zip(fresh, hashes)]
+            
+            inserted, duplicates = self._insert_imported_students(fresh)
+            imported.extend(inserted)
+            rejected.extend(duplicates)
+        
+        rejected.sort()
+        elapsed = time.perf_counter() - started
+        return {
+            "rows": total,
+            "imported": len(imported),
+            "rejected": rejected,
+            "seconds": elapsed,
+            "rows_per_sec": total / elapsed if elapsed else 0.0,
+        }
+
+    @synchronized
+    def _insert_imported_students(self, students):
+        """درج یک دسته دانشجوی اعتبارسنجی‌شده (با رمز هش‌شده) در یک تراکنش و در کش
+        
+        شماره‌هایی که از زمان بررسی اولیه ثبت شده‌اند دوباره بررسی و رد می‌شوند. خروجی: (سطرهای درج‌شده، ردشده‌ها)
+        """
+        with self.db.transaction() as conn:
+            existing = {sid for sid, in self._select_in(
+                conn, 'SELECT sid FROM students WHERE sid IN ({placeholders})', [student[0] for _, student in students]
+            )}
+            inserted = [student for _, student in students if student[0] not in existing]
+            conn.executemany('''
+                INSERT INTO students (sid, name, password, major, email, entry_year, total_units)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+            ''', inserted)
+        
+        # در حالت تنبل دانشجویان در اولین دسترسی خوانده می‌شوند
+        if not self.lazy:
+            with self._cache_lock:
+                for sid, name, password, major, email, entry_year in inserted:
+                    self.students[sid] = StudentRecord(name, password, major, email, entry_year, 0, (),
+                                                      schedule_mask=0, exams=[])
+            if self.student_index is not None:
+                for sid, *_ in inserted:
+                    self._index_student(sid)
+        return inserted, [(line_number, student[0], "شماره دانشجویی تکراری است!")
+                          for line_number, student in students if student[0] in existing]
+    
+    def _validate_catalog_course(self, item):
+        """(سطر آماده درج، None) یا (None، علت رد) برای یک درس courses.json"""
+        if item is None:
+            return None, "سطر نامعتبر"
+        values = {column: item.get(field) for field, column in CATALOG_FIELDS}
+        text = {column: str(value if value is not None else "").strip() for column, value in values.items()}
+        if not all(text[column] for column in ("course_code", "course_name", "professor", "schedule", "department")):
+            return None, "فیلدهای ضروری خالی است"
+        try:
+            units = int(str(values["units"]).translate(_DIGIT_TRANSLATION))
+            capacity = int(str(values["capacity"]).translate(_DIGIT_TRANSLATION))
+        except (TypeError, ValueError):
+            return None, "واحد یا ظرفیت نامعتبر است"
+        if units <= 0 or capacity < 0:
+            return None, "واحد یا ظرفیت نامعتبر است"
+        return (text["course_code"], text["course_name"], text["professor"], units, capacity,
+                text["schedule"], text["department"], text["classroom"], text["exam_date"], text["professor_id"]), None
+    
+    @staticmethod
+    def _resolve_catalog_professor(course, known, by_title, by_name):
+        """شماره استاد یک درس courses.json؛ رشته خالی یعنی هیچ استادی پیدا نشد
+        
+        ترتیب: فیلد professorId (اگر در جدول professors باشد)، سپس عنوان instructor مانند «دکتر احمدی»
+        که در ستون professor دروس موجود به یک شماره استاد وصل شده، و در آخر نام کامل در جدول professors.
+        """
+        if course[9] in known:
+            return course[9]
+        return by_title.get(course[2]) or by_name.get(course[2], "")
+    
+    @instrumented
+    @synchronized
+    def import_course_catalog(self, rows, batch_size=1000):
+        """همگام‌سازی جدول courses با دروس قالب courses.json رابط وب، در یک تراکنش
+        
+        ورودی جریان (شماره، دیکشنری) مانند خروجی read_import_rows است. هر دسته با سطرهای موجود
+        مقایسه می‌شود و فقط دروس جدید یا تغییرکرده با upsert نوشته می‌شوند. current_students از
+        student_courses به دست می‌آید و فیلد enrolled فایل نادیده گرفته می‌شود؛ status دروس موجود حفظ می‌شود.
+        professor_id با _resolve_catalog_professor پیدا می‌شود؛ دروسی که استادشان پیدا نشود با شماره خالی
+        (یا شماره قبلی، اگر نام استاد عوض نشده باشد) نوشته و در unassigned گزارش می‌شوند.
+        افزایش ظرفیت پس از تراکنش با promote_waitlist به صف انتظار دروس اعمال می‌شود.
+        خروجی: rows، inserted، updated، unchanged، rejected، unassigned، promoted و seconds.
+        """
+        started = time.perf_counter()
+        rows = iter(rows)
+        total = 0
+        seen = set()
+        inserted, updated, rejected, unassigned = [], [], [], []
+        unit_deltas = {}
+        capacity_increased = []
+        
+        with self.db.transaction() as conn:
+            by_name = {name: pid for pid, name in conn.execute('SELECT pid, name FROM professors')}
+            known = set(by_name.values())
+            by_title = {title: pid for title, pid in conn.execute(
+                "SELECT professor, professor_id FROM courses WHERE professor_id != ''") if pid in known}
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                total += len(batch)
+                
+                valid = []
+                for number, item in batch:
+                    course, reason = self._validate_catalog_course(item)
+                    if reason is None and course[0] in seen:
+                        reason = "کد درس در فایل تکراری است"
+                    if reason is not None:
+                        rejected.append((number, str((item or {}).get("code") or ""), reason))
+                        continue
+                    seen.add(course[0])
+                    valid.append(course)
+                
+                # مقایسه با سطرهای فعلی همین دسته
+                current = {row[0]: row for row in self._select_in(conn, '''
+                    SELECT course_code, course_name, professor, units, capacity, schedule, department,
+                           COALESCE(classroom, ''), COALESCE(exam_date, ''), COALESCE(professor_id, '')
+                    FROM courses WHERE course_code IN ({placeholders})
+                ''', [course[0] for course in valid])}
+                changed = []
+                for course in valid:
+                    old = current.get(course[0])
+                    professor_id = self._resolve_catalog_professor(course, known, by_title, by_name)
+                    if not professor_id:
+                        unassigned.append(course[0])
+                        if old is not None and old[2] == course[2]:
+                            professor_id = old[9]
+                    course = course[:9] + (professor_id,)
+                    if old is None:
+                        inserted.append(course[0])
+                    elif old != course:
+                        updated.append(course[0])
+                        if old[3] != course[3]:
+                            unit_deltas[course[0]] = course[3] - old[3]
+                        if course[4] > old[4]:
+                            capacity_increased.append(course[0])
+                    else:
+                        continue
+                    changed.append(course)
+                
+                conn.executemany('''
+                    INSERT INTO courses (course_code, course_name, professor, units, capacity, schedule, department,
+                                         classroom, exam_date, professor_id, status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'approved')
+                    ON CONFLICT (course_code) DO UPDATE SET
+                        course_name = excluded.course_name, professor = excluded.professor, units = excluded.units,
+                        capacity = excluded.capacity, schedule = excluded.schedule, department = excluded.department,
+                        classroom = excluded.classroom, exam_date = excluded.exam_date,
+                        professor_id = excluded.professor_id
+                ''', changed)
+            
+            # تغییر تعداد واحد، مانند update_course، به واحدهای دانشجویان ثبت‌نامی اعمال می‌شود
+            conn.executemany('''
+                UPDATE students SET total_units = MAX(total_units + ?, 0)
+                WHERE sid IN (SELECT student_id FROM student_courses WHERE course_code = ?)
+            ''', [(delta, code) for code, delta in unit_deltas.items()])
+        
+        # به روزرسانی کش فقط برای دروس تغییرکرده
+        if len(inserted) + len(updated) > self.CHANGE_LOG_RELOAD_THRESHOLD:
+            self._cache_data()
+        else:
+            for code in inserted + updated:
+                self._reload_course(code)
+            for code, delta in unit_deltas.items():
+                for student in self._enrolled_students(code):
+                    student["total_units"] = max(student["total_units"] + delta, 0)
+        
+        # صندلی‌های جدید پس از به روز شدن کش (زمان و واحد جدید دروس) به صف انتظار می‌رسند
+        promoted = sum(self.promote_waitlist(code) for code in capacity_increased)
+        
+        rejected.sort()
+        return {
+            "rows": total,
+            "inserted": len(inserted),
+            "updated": len(updated),
+            "unchanged": total - len(inserted) - len(updated) - len(rejected),
+            "rejected": rejected,
+            "unassigned": unassigned,
+            "promoted": promoted,
+            "seconds": time.perf_counter() - started,
+        }
+    
+    @instrumented
+    def export_course_catalog(self, path, batch_size=1000):
+        """نوشتن دروس تأییدشده در قالب courses.json رابط وب به صورت جریانی؛ خروجی: تعداد دروس
+        
+        فیلدهای مخصوص رابط وب (id، enrolled، توضیحات، پیش‌نیازها، رنگ و ...) از فایل موجود در همان مسیر حفظ می‌شوند.
+        """
+        extras = {}
+        if os.path.exists(path):
+            for _, item in read_import_rows(path):
+                if item and item.get("code"):
+                    extras[str(item["code"])] = {k: v for k, v in item.items() if k not in dict(CATALOG_FIELDS)}
+        next_id = max((e["id"] for e in extras.values() if isinstance(e.get("id"), int)), default=0) + 1
+        
+        count = 0
+        temp_path = path + ".tmp"
+        columns = ", ".join(column for _, column in CATALOG_FIELDS)
+        with self.db.connection() as conn, open(temp_path, "w", encoding="utf-8") as f:
+            cursor = conn.execute(f"SELECT {columns} FROM courses WHERE status = 'approved' ORDER BY course_code")
+            f.write("[")
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                for row in batch:
+                    item = dict(zip((field for field, _ in CATALOG_FIELDS), row))
+                    extra = extras.get(item["code"])
+                    if extra is None:
+                        extra = {"id": next_id, **CATALOG_WEB_DEFAULTS}
+                        next_id += 1
+                    item = {"id": extra.get("id"), **item, **{k: v for k, v in extra.items() if k != "id"}}
+                    f.write(",\n" if count else "\n")
+                    f.write(textwrap.indent(json.dumps(item, ensure_ascii=False, indent=4), "    "))
+                    count += 1
+            f.write("\n]\n")
+        os.replace(temp_path, path)
+        return count
+
+    @instrumented
+    @synchronized
     def add_course(self, data):
         code = data["course_code"]
         if code in self.courses:
@@ -316,204 +2071,229 @@ class UniversitySystem:
         if not all(data.get(f) for f in required):
             return False, "لطفا تمام فیلدهای ضروری را پر کنید!"
         
+        # بررسی وجود ستون status از روی طرح کش‌شده
+        has_status = self.db.schema.course_status
+        
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # بررسی وجود ستون status
-            cursor.execute("PRAGMA table_info(courses)")
-            columns = [column[1] for column in cursor.fetchall()]
-            has_status = 'status' in columns
-            
-            if has_status:
-                cursor.execute('''
-                    INSERT INTO courses (course_code, course_name, professor, professor_id, units, capacity, schedule, department, classroom, exam_date, status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    code,
-                    data["course_name"],
-                    data["professor"],
-                    data.get("professor_id", ""),
-                    int(data["units"]),
-                    int(data["capacity"]),
-                    data["schedule"],
-                    data["department"],
-                    data.get("classroom", ""),
-                    data.get("exam_date", ""),
-                    "pending"
-                ))
-            else:
-                cursor.execute('''
-                    INSERT INTO courses (course_code, course_name, professor, professor_id, units, capacity, schedule, department, classroom, exam_date)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    code,
-                    data["course_name"],
-                    data["professor"],
-                    data.get("professor_id", ""),
-                    int(data["units"]),
-                    int(data["capacity"]),
-                    data["schedule"],
-                    data["department"],
-                    data.get("classroom", ""),
-                    data.get("exam_date", "")
-                ))
-            
-            conn.commit()
-            conn.close()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+                
+                if has_status:
+                    cursor.execute('''
+                        INSERT INTO courses (course_code, course_name, professor, professor_id, units, capacity, schedule, department, classroom, exam_date, status)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (
+                        code,
+                        data["course_name"],
+                        data["professor"],
+                        data.get("professor_id", ""),
+                        int(data["units"]),
+                        int(data["capacity"]),
+                        data["schedule"],
+                        data["department"],
+                        data.get("classroom", ""),
+                        data.get("exam_date", ""),
+                        "pending"
+                    ))
+                else:
+                    cursor.execute('''
+                        INSERT INTO courses (course_code, course_name, professor, professor_id, units, capacity, schedule, department, classroom, exam_date)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (
+                        code,
+                        data["course_name"],
+                        data["professor"],
+                        data.get("professor_id", ""),
+                        int(data["units"]),
+                        int(data["capacity"]),
+                        data["schedule"],
+                        data["department"],
+                        data.get("classroom", ""),
+                        data.get("exam_date", "")
+                    ))
             
             # به روزرسانی کش
-            self.courses[code] = {
-                "name": data["course_name"],
-                "professor": data["professor"],
-                "professor_id": data.get("professor_id", ""),
-                "units": int(data["units"]),
-                "capacity": int(data["capacity"]),
-                "current_students": 0,
-                "schedule": data["schedule"],
-                "department": data["department"],
-                "classroom": data.get("classroom", ""),
-                "exam_date": data.get("exam_date", ""),
-                "status": "pending" if has_status else "approved"
-            }
+            code = _intern(code)
+            course = CourseRecord(
+                data["course_name"], _intern(data["professor"]), _intern(data.get("professor_id", "")),
+                int(data["units"]), int(data["capacity"]), 0, data["schedule"], _intern(data["department"]),
+                data.get("classroom", ""), data.get("exam_date", ""), "pending" if has_status else "approved"
+            )
+            with self._cache_lock:
+                self.courses[code] = course
+            if self.course_students is not None:
+                self.course_students[code] = set()
+            self._index_course(code)
             
             return True, "درس با موفقیت اضافه شد!" + (" و در انتظار تأیید است!" if has_status else "")
         except Exception as e:
             return False, f"خطا در اضافه کردن درس: {str(e)}"
 
+    @instrumented
+    @synchronized
     def update_course(self, code, data):
         """ویرایش اطلاعات درس"""
         if code not in self.courses:
             return False, "درس یافت نشد!"
         
+        enrolled = self._enrolled_students(code)
+        cache_changed = False
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE courses 
-                SET course_name=?, professor=?, professor_id=?, units=?, capacity=?, 
-                    schedule=?, department=?, classroom=?, exam_date=?
-                WHERE course_code=?
-            ''', (
-                data["course_name"],
-                data["professor"],
-                data.get("professor_id", ""),
-                int(data["units"]),
-                int(data["capacity"]),
-                data["schedule"],
-                data["department"],
-                data.get("classroom", ""),
-                data.get("exam_date", ""),
-                code
-            ))
-            
-            conn.commit()
-            conn.close()
-            
-            # به روزرسانی کش
-            self.courses[code].update({
-                "name": data["course_name"],
-                "professor": data["professor"],
-                "professor_id": data.get("professor_id", ""),
-                "units": int(data["units"]),
-                "capacity": int(data["capacity"]),
-                "schedule": data["schedule"],
-                "department": data["department"],
-                "classroom": data.get("classroom", ""),
-                "exam_date": data.get("exam_date", "")
-            })
-            
-            return True, "اطلاعات درس با موفقیت به روزرسانی شد!"
+            with self.db.transaction() as conn:
+                old_units = conn.execute('SELECT units FROM courses WHERE course_code = ?', (code,)).fetchone()[0]
+                conn.execute('''
+                    UPDATE courses 
+                    SET course_name=?, professor=?, professor_id=?, units=?, capacity=?, 
+                        schedule=?, department=?, classroom=?, exam_date=?
+                    WHERE course_code=?
+                ''', (
+                    data["course_name"],
+                    data["professor"],
+                    data.get("professor_id", ""),
+                    int(data["units"]),
+                    int(data["capacity"]),
+                    data["schedule"],
+                    data["department"],
+                    data.get("classroom", ""),
+                    data.get("exam_date", ""),
+                    code
+                ))
+                
+                # تغییر تعداد واحد به صورت افزایشی به واحدهای دانشجویان ثبت‌نامی اعمال می‌شود
+                units_delta = int(data["units"]) - old_units
+                if units_delta:
+                    conn.execute('''
+                        UPDATE students SET total_units = total_units + ?
+                        WHERE sid IN (SELECT student_id FROM student_courses WHERE course_code = ?)
+                    ''', (units_delta, code))
+                
+                # کش پیش از ارتقای صف انتظار به روز می‌شود تا شرایط ثبت‌نام با زمان و واحد جدید بررسی شود
+                cache_changed = True
+                if units_delta:
+                    for student in enrolled:
+                        student["total_units"] += units_delta
+                old_capacity = self.courses[code]["capacity"]
+                self.courses[code].update({
+                    "name": data["course_name"],
+                    "professor": data["professor"],
+                    "professor_id": data.get("professor_id", ""),
+                    "units": int(data["units"]),
+                    "capacity": int(data["capacity"]),
+                    "schedule": data["schedule"],
+                    "department": data["department"],
+                    "classroom": data.get("classroom", ""),
+                    "exam_date": data.get("exam_date", "")
+                })
+                old_mask, old_exam = self.courses[code]["schedule_mask"], self.courses[code]["exam_day"]
+                self._index_course(code)
+                if (self.courses[code]["schedule_mask"], self.courses[code]["exam_day"]) != (old_mask, old_exam):
+                    for student in enrolled:
+                        self._refresh_student_schedule(student)
+                
+                # افزایش ظرفیت: صندلی‌های جدید در همین تراکنش به صف انتظار می‌رسند
+                promoted = self._promote_waitlist(conn, code) if int(data["capacity"]) > old_capacity else []
         except Exception as e:
+            if cache_changed:
+                # تراکنش برگشت خورده است؛ درس از پایگاه داده بازیابی و تغییر واحدها برگردانده می‌شود
+                for student in enrolled:
+                    student["total_units"] -= units_delta
+                self._reload_course(code)
             return False, f"خطا در به روزرسانی درس: {str(e)}"
+        
+        for student_id, total_units, current_students in promoted:
+            self._cache_enrollment(student_id, code, total_units, current_students)
+        if promoted:
+            return True, f"اطلاعات درس با موفقیت به روزرسانی شد و {len(promoted)} دانشجو از صف انتظار ثبت نام شدند!"
+        return True, "اطلاعات درس با موفقیت به روزرسانی شد!"
 
-    def approve_course(self, code):
+    @instrumented
+    def approve_course(self, code, changed_by=None):
         """تأیید درس"""
-        if code not in self.courses:
-            return False, "درس یافت نشد!"
-        
-        try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # بررسی وجود ستون status
-            cursor.execute("PRAGMA table_info(courses)")
-            columns = [column[1] for column in cursor.fetchall()]
-            
-            if 'status' in columns:
-                cursor.execute('UPDATE courses SET status=? WHERE course_code=?', ("approved", code))
-                conn.commit()
-                conn.close()
-                
-                # به روزرسانی کش
-                self.courses[code]["status"] = "approved"
-                return True, "درس با موفقیت تأیید شد!"
-            else:
-                conn.close()
-                return False, "سیستم وضعیت دروس فعال نیست!"
-                
-        except Exception as e:
-            return False, f"خطا در تأیید درس: {str(e)}"
+        success, msg = self.set_course_status_bulk([code], "approved", changed_by)
+        return (True, "درس با موفقیت تأیید شد!") if success else (False, msg)
 
-    def reject_course(self, code):
+    @instrumented
+    def reject_course(self, code, changed_by=None):
         """رد درس"""
-        if code not in self.courses:
-            return False, "درس یافت نشد!"
+        success, msg = self.set_course_status_bulk([code], "rejected", changed_by)
+        return (True, "درس با موفقیت رد شد!") if success else (False, msg)
+
+    @instrumented
+    @synchronized
+    def set_course_status_bulk(self, codes, status, changed_by=None):
+        """تغییر وضعیت چند درس در یک تراکنش با ثبت یک سطر سابقه برای هر تغییر؛ یا همه اعمال می‌شوند یا هیچ‌کدام"""
+        if status not in self.COURSE_STATUSES:
+            return False, "وضعیت درس نامعتبر است!"
+        
+        codes = list(dict.fromkeys(codes))
+        if not codes:
+            return False, "هیچ درسی انتخاب نشده است!"
+        for code in codes:
+            if code not in self.courses:
+                return False, f"درس {code} یافت نشد!"
+        
+        # بررسی وجود ستون status از روی طرح کش‌شده
+        if not self.db.schema.course_status:
+            return False, "سیستم وضعیت دروس فعال نیست!"
         
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # بررسی وجود ستون status
-            cursor.execute("PRAGMA table_info(courses)")
-            columns = [column[1] for column in cursor.fetchall()]
-            
-            if 'status' in columns:
-                cursor.execute('UPDATE courses SET status=? WHERE course_code=?', ("rejected", code))
-                conn.commit()
-                conn.close()
-                
-                # به روزرسانی کش
-                self.courses[code]["status"] = "rejected"
-                return True, "درس با موفقیت رد شد!"
-            else:
-                conn.close()
-                return False, "سیستم وضعیت دروس فعال نیست!"
-                
+            with self.db.transaction() as conn:
+                # وضعیت قبلی از خود پایگاه داده خوانده می‌شود تا سابقه با تغییرات سایر نمونه‌ها هم درست باشد
+                old_statuses = dict(self._select_in(
+                    conn, 'SELECT course_code, status FROM courses WHERE course_code IN ({placeholders})', codes))
+                changed = [code for code in codes if code in old_statuses and old_statuses[code] != status]
+                conn.executemany('UPDATE courses SET status=? WHERE course_code=?', [(status, code) for code in changed])
+                conn.executemany(
+                    'INSERT INTO course_status_log (course_code, old_status, new_status, changed_by) VALUES (?, ?, ?, ?)',
+                    [(code, old_statuses[code], status, changed_by) for code in changed])
         except Exception as e:
-            return False, f"خطا در رد درس: {str(e)}"
+            return False, f"خطا در تغییر وضعیت دروس: {str(e)}"
+        
+        # به روزرسانی کش در یک گذر، فقط برای سطرهایی که UPDATE واقعاً تغییر داده و در سابقه ثبت شده‌اند
+        for code in changed:
+            course = self.courses.get(code)
+            if course is not None:
+                course["status"] = status
+        return True, f"وضعیت {len(changed)} درس به «{self.COURSE_STATUSES[status]}» تغییر کرد!"
 
+    @instrumented
+    @synchronized
     def delete_course(self, code):
         if code not in self.courses:
             return False, "درس یافت نشد!"
         
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # حذف ارتباطات دانشجویان با این درس
-            cursor.execute('DELETE FROM student_courses WHERE course_code = ?', (code,))
-            
-            # حذف درس
-            cursor.execute('DELETE FROM courses WHERE course_code = ?', (code,))
-            
-            conn.commit()
-            conn.close()
-            
-            # به روزرسانی کش
-            del self.courses[code]
+            with self.db.transaction() as conn:
+                units = conn.execute('SELECT units FROM courses WHERE course_code = ?', (code,)).fetchone()[0]
+                
+                # کسر واحد فقط از دانشجویانی که این درس را گرفته‌اند، با یک دستور
+                conn.execute('''
+                    UPDATE students SET total_units = MAX(total_units - ?, 0)
+                    WHERE sid IN (SELECT student_id FROM student_courses WHERE course_code = ?)
+                ''', (units, code))
+                
+                # حذف ارتباطات دانشجویان و صف انتظار این درس
+                conn.execute('DELETE FROM student_courses WHERE course_code = ?', (code,))
+                conn.execute('DELETE FROM waitlist WHERE course_code = ?', (code,))
+                
+                # حذف درس
+                conn.execute('DELETE FROM courses WHERE course_code = ?', (code,))
             
-            # به روزرسانی واحدهای تمام دانشجویان
-            for student_id in self.students:
-                if code in self.students[student_id]["courses"]:
-                    self.students[student_id]["courses"].remove(code)
-                self._update_student_units(student_id)
+            # به روزرسانی کش فقط برای دانشجویان همین درس
+            with self._cache_lock:
+                del self.courses[code]
+            self.course_index.remove(code)
+            for student in self._enrolled_students(code, forget=True):
+                student.remove_course(code)
+                student["total_units"] = max(student["total_units"] - units, 0)
+                self._refresh_student_schedule(student)
             
             return True, "درس با موفقیت حذف شد!"
         except Exception as e:
             return False, f"خطا در حذف درس: {str(e)}"
 
+    @instrumented
+    @synchronized
     def enroll_student(self, student_id, course_code):
         """ثبت نام دانشجو در درس"""
         if course_code not in self.courses:
@@ -526,40 +2306,210 @@ class UniversitySystem:
         student = self.students[student_id]
         
         # بررسی شرایط
-        if course.get("status") == "rejected":
-            return False, "این درس رد شده است!"
+        error = self._enrollment_error(student, course_code)
+        if error:
+            return False, error
+        exam_clash = self._exam_clash(student, course_code)
         
-        if course.get("status") == "pending":
-            return False, "این درس هنوز تأیید نشده است!"
+        try:
+            # قفل نوشتن از ابتدای تراکنش گرفته می‌شود تا بین نخ‌ها و پردازه‌ها امن باشد
+            with self.db.transaction(immediate=True) as conn:
+                total_units, current_students = self._apply_enrollment(conn, student_id, course_code)
+                # ثبت‌نام مستقیم جای دانشجو در صف انتظار همین درس را آزاد می‌کند
+                conn.execute('DELETE FROM waitlist WHERE course_code = ? AND student_id = ?', (course_code, student_id))
+        except EnrollmentError as e:
+            return False, str(e)
+        except Exception as e:
+            return False, f"خطا در ثبت نام: {str(e)}"
+        
+        # به روزرسانی کش با مقادیر قطعی پایگاه داده
+        self._cache_enrollment(student_id, course_code, total_units, current_students)
+        
+        if exam_clash:
+            return True, (f"ثبت نام در درس {course['name']} با موفقیت انجام شد"
+                          f"\n⚠️ امتحان این درس با امتحان درس {self.courses[exam_clash]['name']} در یک روز است")
+        return True, f"ثبت نام در درس {course['name']} با موفقیت انجام شد"
+
+    def _enrollment_error(self, student, course_code, check_capacity=True):
+        """دلیل رد ثبت‌نام بر اساس کش (وضعیت درس، تکراری بودن، ظرفیت، سقف واحد و تداخل‌ها) یا None"""
+        course = self.courses[course_code]
+        if course.get("status") in _STATUS_ERRORS:
+            return _STATUS_ERRORS[course.get("status")]
         
         if course_code in student["courses"]:
-            return False, "این درس قبلاً انتخاب شده است!"
+            return "این درس قبلاً انتخاب شده است!"
+        
+        if check_capacity and course["current_students"] >= course["capacity"]:
+            return "ظرفیت این درس تکمیل است!"
         
-        if course["current_students"] >= course["capacity"]:
-            return False, "ظرفیت این درس تکمیل است!"
+        if student["total_units"] + course["units"] > self.MAX_UNITS:
+            return "مجموع واحدهای شما نمی‌تواند از ۲۰ واحد بیشتر شود!"
         
-        if student["total_units"] + course["units"] > 20:
-            return False, "مجموع واحدهای شما نمی‌تواند از ۲۰ واحد بیشتر شود!"
+        # بررسی تداخل زمانی با یک AND روی بیت‌مپ‌ها
+        if course["schedule_mask"] & student.schedule_mask:
+            clash = next((self.courses[c]["name"] for c in student["courses"]
+                          if c in self.courses and self.courses[c]["schedule_mask"] & course["schedule_mask"]), "")
+            return f"زمان این درس با درس {clash} تداخل دارد!"
+        
+        exam_clash = self._exam_clash(student, course_code)
+        if exam_clash and self.EXAM_CLASH_POLICY == "reject":
+            return f"امتحان این درس با امتحان درس {self.courses[exam_clash]['name']} در یک روز است!"
+        return None
+    
+    def _cache_enrollment(self, student_id, course_code, total_units, current_students):
+        """اعمال یک ثبت‌نام قطعی‌شده روی کش با مقادیر پایگاه داده"""
+        course = self.courses[course_code]
+        course["current_students"] = current_students
+        if self.course_students is not None:
+            self.course_students.setdefault(course_code, set()).add(student_id)
+        student = self._cached_student(student_id)
+        if student is None:
+            return
+        student.add_course(_intern(course_code))
+        student["total_units"] = total_units
+        student.schedule_mask |= course["schedule_mask"]
+        if course["exam_day"] is not None:
+            insort(student.exams, (course["exam_day"], course_code))
+    
+    def _apply_enrollment(self, conn, student_id, course_code):
+        """ثبت‌نام در تراکنش جاری؛ شرط‌های وضعیت، ظرفیت و سقف واحد در خود دستورات UPDATE بررسی می‌شوند"""
+        row = conn.execute('SELECT units, status FROM courses WHERE course_code = ?', (course_code,)).fetchone()
+        if row is None:
+            raise EnrollmentError("درس یافت نشد!")
+        units, status = row
+        # کش ممکن است از رد یا تعلیق درس توسط نمونه دیگری خبر نداشته باشد
+        if status not in (None, "approved"):
+            raise EnrollmentError(_STATUS_ERRORS.get(status, "این درس قابل ثبت‌نام نیست!"))
         
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # اضافه کردن به جدول ارتباطی
-            cursor.execute('INSERT INTO student_courses (student_id, course_code) VALUES (?, ?)', (student_id, course_code))
+            conn.execute('INSERT INTO student_courses (student_id, course_code) VALUES (?, ?)', (student_id, course_code))
+        except sqlite3.IntegrityError:
+            raise EnrollmentError("این درس قبلاً انتخاب شده است!")
+        
+        # رزرو صندلی فقط در صورت وجود ظرفیت خالی و تأیید بودن درس در لحظه نوشتن
+        cursor = conn.execute('''
+            UPDATE courses SET current_students = current_students + 1
+            WHERE course_code = ? AND current_students < capacity AND COALESCE(status, 'approved') = 'approved'
+        ''', (course_code,))
+        if cursor.rowcount == 0:
+            raise EnrollmentError("ظرفیت این درس تکمیل است!")
+        
+        # افزایش واحدها فقط اگر از سقف مجاز بیشتر نشود
+        cursor = conn.execute('''
+            UPDATE students SET total_units = total_units + ?
+            WHERE sid = ? AND total_units + ? <= ?
+        ''', (units, student_id, units, self.MAX_UNITS))
+        if cursor.rowcount == 0:
+            raise EnrollmentError("مجموع واحدهای شما نمی‌تواند از ۲۰ واحد بیشتر شود!")
+        
+        total_units = conn.execute('SELECT total_units FROM students WHERE sid = ?', (student_id,)).fetchone()[0]
+        current_students = conn.execute('SELECT current_students FROM courses WHERE course_code = ?', (course_code,)).fetchone()[0]
+        return total_units, current_students
+
+    @instrumented
+    @synchronized
+    def enroll_many(self, student_id, course_codes):
+        """ثبت‌نام یکجای سبد دروس در یک تراکنش؛ یا همه دروس ثبت می‌شوند یا هیچ‌کدام"""
+        if student_id not in self.students:
+            return False, "دانشجو یافت نشد!"
+        
+        codes = list(dict.fromkeys(course_codes))
+        if not codes:
+            return False, "هیچ درسی انتخاب نشده است!"
+        for code in codes:
+            if code not in self.courses:
+                return False, f"درس {code} یافت نشد!"
+        
+        student = self.students[student_id]
+        
+        # بررسی کل سبد پیش از هر نوشتن: هر درس نسبت به دروس فعلی و سپس نسبت به دروس قبلی سبد
+        total_units = student["total_units"]
+        mask = 0
+        exam_days = {}
+        warnings = []
+        for index, code in enumerate(codes):
+            course = self.courses[code]
+            error = self._enrollment_error(student, code)
+            if error:
+                return False, f"{course['name']}: {error}"
             
-            conn.commit()
-            conn.close()
+            total_units += course["units"]
+            if total_units > self.MAX_UNITS:
+                return False, "مجموع واحدهای دروس انتخابی نمی‌تواند از ۲۰ واحد بیشتر شود!"
             
-            # به روزرسانی کش
-            student["courses"].append(course_code)
-            self._update_student_units(student_id)
-            self._update_course_students(course_code)
+            if course["schedule_mask"] & mask:
+                clash = next(self.courses[c]["name"] for c in codes[:index]
+                             if self.courses[c]["schedule_mask"] & course["schedule_mask"])
+                return False, f"زمان درس {course['name']} با درس {clash} تداخل دارد!"
+            mask |= course["schedule_mask"]
             
-            return True, f"ثبت نام در درس {course['name']} با موفقیت انجام شد"
+            exam_clash = self._exam_clash(student, code) or exam_days.get(course["exam_day"])
+            if exam_clash:
+                if self.EXAM_CLASH_POLICY == "reject":
+                    return False, f"امتحان درس {course['name']} با امتحان درس {self.courses[exam_clash]['name']} در یک روز است!"
+                warnings.append(f"\n⚠️ امتحان درس {course['name']} با امتحان درس {self.courses[exam_clash]['name']} در یک روز است")
+            if course["exam_day"] is not None:
+                exam_days.setdefault(course["exam_day"], code)
+        
+        try:
+            # قفل نوشتن از ابتدای تراکنش گرفته می‌شود تا بین نخ‌ها و پردازه‌ها امن باشد
+            with self.db.transaction(immediate=True) as conn:
+                total_units, current_students = self._apply_enrollments(conn, student_id, codes)
+        except EnrollmentError as e:
+            return False, str(e)
         except Exception as e:
             return False, f"خطا در ثبت نام: {str(e)}"
+        
+        for code in codes:
+            self._cache_enrollment(student_id, code, total_units, current_students[code])
+        
+        return True, f"ثبت نام در {len(codes)} درس با موفقیت انجام شد" + "".join(warnings)
+    
+    def _apply_enrollments(self, conn, student_id, codes):
+        """ثبت‌نام چند درس در تراکنش جاری با یک دستور برای هر جدول؛ خروجی: (مجموع واحدها، {کد درس: تعداد ثبت‌نامی})"""
+        rows = {row[0]: row[1:] for row in self._select_in(
+            conn, 'SELECT course_code, course_name, units, current_students, capacity, status FROM courses WHERE course_code IN ({placeholders})', codes)}
+        for code in codes:
+            if code not in rows:
+                raise EnrollmentError(f"درس {code} یافت نشد!")
+            name, units, current, capacity, status = rows[code]
+            if status not in (None, "approved"):
+                raise EnrollmentError(f"{name}: " + _STATUS_ERRORS.get(status, "این درس قابل ثبت‌نام نیست!"))
+            if current >= capacity:
+                raise EnrollmentError(f"{name}: ظرفیت این درس تکمیل است!")
+        
+        try:
+            conn.executemany('INSERT INTO student_courses (student_id, course_code) VALUES (?, ?)',
+                             [(student_id, code) for code in codes])
+        except sqlite3.IntegrityError:
+            raise EnrollmentError("یکی از دروس قبلاً انتخاب شده است!")
+        
+        # شمارنده‌ها با یک دستور مجموعه‌ای؛ شرط‌های ظرفیت و وضعیت همچنان در خود UPDATE بررسی می‌شوند
+        placeholders = ", ".join("?" * len(codes))
+        cursor = conn.execute(f'''
+            UPDATE courses SET current_students = current_students + 1
+            WHERE course_code IN ({placeholders}) AND current_students < capacity
+              AND COALESCE(status, 'approved') = 'approved'
+        ''', codes)
+        if cursor.rowcount != len(codes):
+            raise EnrollmentError("ظرفیت یکی از دروس تکمیل است یا درس دیگر قابل ثبت‌نام نیست!")
+        
+        units = sum(rows[code][1] for code in codes)
+        cursor = conn.execute('''
+            UPDATE students SET total_units = total_units + ?
+            WHERE sid = ? AND total_units + ? <= ?
+        ''', (units, student_id, units, self.MAX_UNITS))
+        if cursor.rowcount == 0:
+            raise EnrollmentError("مجموع واحدهای شما نمی‌تواند از ۲۰ واحد بیشتر شود!")
+        
+        # ثبت‌نام مستقیم جای دانشجو در صف انتظار همین دروس را آزاد می‌کند
+        conn.execute(f'DELETE FROM waitlist WHERE student_id = ? AND course_code IN ({placeholders})', [student_id] + codes)
+        
+        total_units = conn.execute('SELECT total_units FROM students WHERE sid = ?', (student_id,)).fetchone()[0]
+        return total_units, {code: rows[code][2] + 1 for code in codes}
 
+    @instrumented
+    @synchronized
     def drop_student_course(self, student_id, course_code):
         """حذف درس دانشجو"""
         if course_code not in self.courses:
@@ -568,31 +2518,583 @@ class UniversitySystem:
         if student_id not in self.students:
             return False, "دانشجو یافت نشد!"
         
-        if course_code not in self.students[student_id]["courses"]:
+        student = self.students[student_id]
+        if course_code not in student["courses"]:
             return False, "این درس در لیست دروس شما نیست!"
         
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                total_units, current_students = self._apply_drop(conn, student_id, course_code)
+                # صندلی آزادشده در همین تراکنش به سر صف انتظار می‌رسد
+                promoted = self._promote_waitlist(conn, course_code)
+        except EnrollmentError as e:
+            return False, str(e)
+        except Exception as e:
+            return False, f"خطا در حذف درس: {str(e)}"
+        
+        # به روزرسانی کش
+        student.remove_course(course_code)
+        student["total_units"] = total_units
+        self.courses[course_code]["current_students"] = current_students
+        if self.course_students is not None:
+            self.course_students.get(course_code, set()).discard(student_id)
+        self._refresh_student_schedule(student)
+        for promoted_id, promoted_units, promoted_count in promoted:
+            self._cache_enrollment(promoted_id, course_code, promoted_units, promoted_count)
+        
+        return True, f"درس {self.courses[course_code]['name']} با موفقیت حذف شد"
+    
+    def _promote_waitlist(self, conn, course_code):
+        """ثبت‌نام سر صف انتظار در صندلی‌های خالی درس، در تراکنش جاری
+        
+        دانشجویی که اکنون شرایط ثبت‌نام را ندارد (سقف واحد یا تداخل) جای خود را در صف حفظ می‌کند
+        و نفر بعدی بررسی می‌شود. خروجی: [(شماره دانشجو، مجموع واحد، تعداد دانشجویان درس)] به ترتیب ثبت‌نام
+        """
+        capacity, current_students = conn.execute(
+            'SELECT capacity, current_students FROM courses WHERE course_code = ?', (course_code,)).fetchone()
+        free = capacity - current_students
+        promoted = []
+        if free <= 0:
+            return promoted
+        
+        entries = conn.execute('SELECT id, student_id FROM waitlist WHERE course_code = ? ORDER BY id', (course_code,)).fetchall()
+        for entry_id, student_id in entries:
+            if free == 0:
+                break
+            student = self.students.get(student_id)
+            if student is None:
+                conn.execute('DELETE FROM waitlist WHERE id = ?', (entry_id,))
+                continue
+            if self._enrollment_error(student, course_code, check_capacity=False):
+                continue
+            
+            # شکست یک ثبت‌نام فقط تغییرات همان دانشجو را برمی‌گرداند
+            conn.execute('SAVEPOINT promote_waitlist')
+            try:
+                total_units, current_students = self._apply_enrollment(conn, student_id, course_code)
+            except EnrollmentError:
+                conn.execute('ROLLBACK TO promote_waitlist')
+                conn.execute('RELEASE promote_waitlist')
+                continue
+            conn.execute('DELETE FROM waitlist WHERE id = ?', (entry_id,))
+            conn.execute('RELEASE promote_waitlist')
+            promoted.append((student_id, total_units, current_students))
+            free -= 1
+        return promoted
+    
+    @instrumented
+    @synchronized
+    def promote_waitlist(self, course_code):
+        """پر کردن صندلی‌های خالی درس از صف انتظار در یک تراکنش جداگانه؛ خروجی: تعداد دانشجویان ثبت‌نام‌شده"""
+        if course_code not in self.courses:
+            return 0
+        with self.db.transaction() as conn:
+            promoted = self._promote_waitlist(conn, course_code)
+        for student_id, total_units, current_students in promoted:
+            self._cache_enrollment(student_id, course_code, total_units, current_students)
+        return len(promoted)
+    
+    @instrumented
+    @synchronized
+    def join_waitlist(self, student_id, course_code):
+        """ورود دانشجو به انتهای صف انتظار یک درس تکمیل"""
+        if course_code not in self.courses:
+            return False, "درس یافت نشد!"
+        
+        if student_id not in self.students:
+            return False, "دانشجو یافت نشد!"
+        
+        course = self.courses[course_code]
+        if course["current_students"] < course["capacity"]:
+            return False, "این درس ظرفیت خالی دارد؛ مستقیماً ثبت نام کنید!"
+        
+        # دانشجویی که در صورت خالی شدن صندلی هم نمی‌تواند ثبت‌نام شود وارد صف نمی‌شود
+        error = self._enrollment_error(self.students[student_id], course_code, check_capacity=False)
+        if error:
+            return False, error
+        
+        try:
+            with self.db.transaction() as conn:
+                conn.execute('INSERT INTO waitlist (course_code, student_id) VALUES (?, ?)', (course_code, student_id))
+                entry_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+                position = conn.execute('SELECT COUNT(*) FROM waitlist WHERE course_code = ? AND id <= ?',
+                                        (course_code, entry_id)).fetchone()[0]
+        except sqlite3.IntegrityError:
+            return False, "شما قبلاً در صف انتظار این درس هستید!"
+        except Exception as e:
+            return False, f"خطا در ورود به صف انتظار: {str(e)}"
+        
+        return True, f"در صف انتظار درس {course['name']} قرار گرفتید (نفر {position})"
+    
+    @instrumented
+    def leave_waitlist(self, student_id, course_code):
+        """خروج دانشجو از صف انتظار درس"""
+        try:
+            with self.db.transaction() as conn:
+                cursor = conn.execute('DELETE FROM waitlist WHERE course_code = ? AND student_id = ?', (course_code, student_id))
+        except Exception as e:
+            return False, f"خطا در خروج از صف انتظار: {str(e)}"
+        if cursor.rowcount == 0:
+            return False, "شما در صف انتظار این درس نیستید!"
+        return True, "از صف انتظار خارج شدید"
+    
+    def waitlist_position(self, student_id, course_code):
+        """جایگاه دانشجو در صف انتظار درس (از ۱) یا None"""
+        return self.student_waitlists(student_id).get(course_code)
+    
+    def student_waitlists(self, student_id):
+        """صف‌های انتظار دانشجو: کد درس -> جایگاه در صف؛ صف‌ها در کش نگه داشته نمی‌شوند و همیشه تازه‌اند"""
+        with self.db.connection() as conn:
+            return dict(conn.execute('''
+                SELECT w.course_code,
+                       (SELECT COUNT(*) FROM waitlist ahead WHERE ahead.course_code = w.course_code AND ahead.id <= w.id)
+                FROM waitlist w WHERE w.student_id = ?
+            ''', (student_id,)))
+    
+    def _apply_drop(self, conn, student_id, course_code):
+        """حذف درس در تراکنش جاری با به روزرسانی افزایشی شمارنده‌ها"""
+        cursor = conn.execute('DELETE FROM student_courses WHERE student_id = ? AND course_code = ?', (student_id, course_code))
+        if cursor.rowcount == 0:
+            raise EnrollmentError("این درس در لیست دروس شما نیست!")
+        
+        conn.execute('UPDATE courses SET current_students = MAX(current_students - 1, 0) WHERE course_code = ?', (course_code,))
+        conn.execute('''
+            UPDATE students SET total_units = MAX(total_units - (SELECT units FROM courses WHERE course_code = ?), 0)
+            WHERE sid = ?
+        ''', (course_code, student_id))
+        
+        total_units = conn.execute('SELECT total_units FROM students WHERE sid = ?', (student_id,)).fetchone()[0]
+        current_students = conn.execute('SELECT current_students FROM courses WHERE course_code = ?', (course_code,)).fetchone()[0]
+        return total_units, current_students
+    
+    @instrumented
+    @synchronized
+    def reconcile_counters(self):
+        """بازمحاسبه تمام شمارنده‌ها در یک گذر مجموعه‌ای و گزارش انحراف‌ها
+        
+        خروجی دیکشنری با کلیدهای students و courses است که هر کدام فهرستی از
+        (کلید، مقدار ذخیره‌شده، مقدار صحیح) برای ردیف‌های دارای انحراف است.
+        """
+        with self.db.transaction() as conn:
+            student_drift = conn.execute('''
+                SELECT s.sid, s.total_units, COALESCE(t.units, 0)
+                FROM students s
+                LEFT JOIN (
+                    SELECT sc.student_id, SUM(c.units) AS units
+                    FROM student_courses sc
+                    JOIN courses c ON sc.course_code = c.course_code
+                    GROUP BY sc.student_id
+                ) t ON t.student_id = s.sid
+                WHERE s.total_units IS NOT COALESCE(t.units, 0)
+            ''').fetchall()
+            
+            course_drift = conn.execute('''
+                SELECT c.course_code, c.current_students, COALESCE(t.students, 0)
+                FROM courses c
+                LEFT JOIN (
+                    SELECT course_code, COUNT(*) AS students
+                    FROM student_courses
+                    GROUP BY course_code
+                ) t ON t.course_code = c.course_code
+                WHERE c.current_students IS NOT COALESCE(t.students, 0)
+            ''').fetchall()
+            
+            conn.executemany('UPDATE students SET total_units = ? WHERE sid = ?',
+                             [(actual, sid) for sid, _, actual in student_drift])
+            conn.executemany('UPDATE courses SET current_students = ? WHERE course_code = ?',
+                             [(actual, code) for code, _, actual in course_drift])
+        
+        # به روزرسانی کش
+        for sid, _, actual in student_drift:
+            student = self._cached_student(sid)
+            if student is not None:
+                student["total_units"] = actual
+        for code, _, actual in course_drift:
+            if code in self.courses:
+                self.courses[code]["current_students"] = actual
+        
+        return {"students": student_drift, "courses": course_drift}
+    
+    def _latest_change_version(self):
+        """آخرین نسخه صادرشده در change_log (حتی اگر سطر آن پاک شده باشد)"""
+        with self.db.connection() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        return row[0] if row else 0
+    
+    @instrumented
+    @synchronized
+    def poll_changes(self):
+        """اعمال تغییرات ثبت‌شده در change_log پس از آخرین نسخه دیده‌شده روی کش؛ خروجی: تعداد سطرهای بازخوانی‌شده
+        
+        بدون تغییر جدید فقط یک جستجوی بازه‌ای روی کلید اصلی انجام می‌شود. تغییرات تراکنش‌های همین نمونه
+        که کش را همان موقع به روز کرده‌اند (DatabaseManager.claim_own_changes) دوباره بازخوانی نمی‌شوند.
+        """
+        self.db.track_changes = True
+        with self.db.connection() as conn:
+            rows = conn.execute(
+                'SELECT version, table_name, row_key FROM change_log WHERE version > ? ORDER BY version LIMIT ?',
+                (self.change_version, self.CHANGE_LOG_RELOAD_THRESHOLD + 1)
+            ).fetchall()
+            if not rows:
+                return 0
+            
+            # سطرهای دیده‌نشده پاک شده‌اند یا تعداد تغییرات زیاد است: بارگذاری کامل
+            if rows[0][0] != self.change_version + 1 or len(rows) > self.CHANGE_LOG_RELOAD_THRESHOLD:
+                self._cache_data()
+                self.db.forget_own_changes(self.change_version)
+                return len(rows)
+            
+            # هر سطر فقط یک بار بازخوانی می‌شود
+            own = self.db.claim_own_changes([version for version, _, _ in rows])
+            changed = {"courses": {}, "students": {}}
+            for version, table, key in rows:
+                if version not in own:
+                    changed.setdefault(table, {})[key] = None
+            for code in changed["courses"]:
+                self._reload_course(code)
+            for sid in changed["students"]:
+                self._reload_student(sid)
+            self.change_version = rows[-1][0]
+        return len(changed["courses"]) + len(changed["students"])
+    
+    def _reload_course(self, code):
+        """جایگزینی درس کش‌شده با سطر فعلی پایگاه داده؛ شیء رکورد موجود حفظ می‌شود"""
+        with self.db.connection() as conn:
+            row = conn.execute('''
+                SELECT course_code, course_name, professor, professor_id, units, capacity, current_students,
+                       schedule, department, classroom, exam_date, status
+                FROM courses WHERE course_code = ?
+            ''', (code,)).fetchone()
+        course = self.courses.get(code)
+        
+        if row is None:
+            if course is not None:
+                with self._cache_lock:
+                    del self.courses[code]
+                self.course_index.remove(code)
+                if self.course_students is not None:
+                    self.course_students.pop(code, None)
+            return
+        
+        code, fresh = self._course_record(row)
+        if course is None:
+            with self._cache_lock:
+                self.courses[code] = fresh
+            if self.course_students is not None:
+                self.course_students.setdefault(code, set())
+            self._index_course(code)
+            return
+        
+        old_timing = (course.schedule_mask, course.exam_day)
+        course.update({name: fresh[name] for name in fresh.__slots__})
+        self._index_course(code)
+        if (course.schedule_mask, course.exam_day) != old_timing:
+            for student in self._enrolled_students(code):
+                self._refresh_student_schedule(student)
+    
+    def _reload_student(self, sid):
+        """جایگزینی دانشجوی کش‌شده با سطر فعلی پایگاه داده؛ در حالت تنبل فقط اگر در کش باشد"""
+        old = self._cached_student(sid)
+        if self.lazy and old is None:
+            return
+        fresh = self._load_student(sid)
+        
+        old_courses = set(old.courses) if old is not None else set()
+        new_courses = set(fresh.courses) if fresh is not None else set()
+        if self.course_students is not None:
+            for code in old_courses - new_courses:
+                self.course_students.get(code, set()).discard(sid)
+            for code in new_courses - old_courses:
+                self.course_students.setdefault(code, set()).add(sid)
+        
+        if fresh is None:
+            if old is not None:
+                with self._cache_lock:
+                    del self.students[sid]
+                if self.student_index is not None:
+                    self.student_index.remove(sid)
+            return
+        if old is None:
+            with self._cache_lock:
+                self.students[sid] = fresh
+        else:
+            old.update({name: fresh[name] for name in fresh.__slots__})
+        if self.student_index is not None:
+            self._index_student(sid)
+    
+    @instrumented
+    def prune_change_log(self, max_age=None):
+        """حذف سطرهای قدیمی change_log؛ نمونه‌ای که از سطرهای پاک‌شده عقب مانده باشد کش را کامل بارگذاری می‌کند"""
+        max_age = self.CHANGE_LOG_MAX_AGE if max_age is None else max_age
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM change_log WHERE changed_at < CAST(strftime('%s', 'now') AS INTEGER) - ?", (max_age,)
+            )
+            return cursor.rowcount
+    
+    @instrumented
+    def export_report(self, kind, path, key=None, fmt=None):
+        """خروجی جریانی گزارش‌ها در CSV یا JSON Lines
+        
+        kind: roster (همه ثبت‌نام‌ها)، course (لیست کلاس درس key) یا professor (دانشجویان استاد key).
+        خروجی: (موفقیت، پیام)
+        """
+        if kind not in self.EXPORT_QUERIES:
+            return False, "نوع گزارش نامعتبر است!"
+        sql, needs_key = self.EXPORT_QUERIES[kind]
+        if needs_key and not key:
+            return False, "درس یا استاد مشخص نشده است!"
+        
+        try:
+            with self.db.connection() as conn:
+                count = write_rows(conn.execute(sql, (key,) if needs_key else ()), path, fmt)
+            return True, f"{count} سطر در {path} ذخیره شد"
+        except Exception as e:
+            return False, f"خطا در ذخیره گزارش: {str(e)}"
+    
+    @instrumented
+    def exam_clash_report(self):
+        """فهرست تمام تداخل‌های امتحان دانشجویان در ترم با یک گذر روی student_courses
+        
+        خروجی: فهرست (شماره دانشجویی، تاریخ امتحان، کدهای دروس هم‌روز).
+        """
+        with self.db.connection() as conn:
+            exam_dates = {}
+            exam_days = {}
+            for code, exam_date in conn.execute('SELECT course_code, exam_date FROM courses'):
+                day = parse_exam_date(exam_date)
+                if day is not None:
+                    exam_days[code] = day
+                    exam_dates[code] = exam_date
+            
+            report = []
+            cursor = conn.execute('SELECT student_id, course_code FROM student_courses ORDER BY student_id, course_code')
+            for student_id, rows in groupby(cursor, key=itemgetter(0)):
+                by_day = {}
+                for _, code in rows:
+                    if code in exam_days:
+                        by_day.setdefault(exam_days[code], []).append(code)
+                for day, codes in sorted(by_day.items()):
+                    if len(codes) > 1:
+                        report.append((student_id, exam_dates[codes[0]], codes))
+        return report
+
+
+class VirtualTable:
+    """جدول مجازی روی ttk.Treeview
+    
+    فقط ردیف‌های قابل مشاهده ساخته می‌شوند و در هر بازخوانی فقط ردیف‌های تغییرکرده
+    به روزرسانی می‌شوند. کلید هر ردیف (کد درس یا شماره دانشجویی) شناسه آن در Treeview است.
+    """
+    def __init__(self, parent, columns, height=15, selectmode='browse', bg=None):
+        self.frame = tk.Frame(parent, bg=bg)
+        self.tree = ttk.Treeview(self.frame, columns=[col for col, _ in columns], show='headings',
+                                 height=height, selectmode=selectmode)
+        for col, width in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, anchor='center')
+        
+        self.scrollbar = ttk.Scrollbar(self.frame, orient='vertical', command=self._on_scrollbar)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+        
+        self.selectmode = selectmode
+        self.height = height
+        self.offset = 0
+        self.keys = []
+        self.row_for = None
+        self.selected = set()
+        self.on_select = None
+        self._values = {}  # شناسه ردیف -> مقادیر نمایش داده‌شده
+        self._rendering = False
+        
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll(-1 if e.delta > 0 else 1, 'units'))
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-1, 'units'))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(1, 'units'))
+        self.tree.bind('<Prior>', lambda e: self.scroll(-1, 'pages'))
+        self.tree.bind('<Next>', lambda e: self.scroll(1, 'pages'))
+    
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+    
+    def set_rows(self, keys, row_for):
+        """تعیین فهرست کامل کلیدها و تابع سازنده مقادیر هر ردیف"""
+        self.keys = list(keys)
+        self.row_for = row_for
+        self.selected &= set(self.keys)
+        self.offset = max(0, min(self.offset, len(self.keys) - self.height))
+        self.render()
+    
+    def refresh(self):
+        """بازخوانی ردیف‌های قابل مشاهده پس از تغییر داده‌ها"""
+        self.render()
+    
+    def selection(self):
+        return [key for key in self.keys if key in self.selected]
+    
+    def scroll(self, amount, what='units'):
+        step = amount * (self.height if what == 'pages' else 1)
+        self._move_to(self.offset + step)
+        return 'break'
+    
+    def render(self):
+        if not self.tree.winfo_exists():
+            return
+        window = self.keys[self.offset:self.offset + self.height]
+        visible = set(window)
+        
+        self._rendering = True
+        try:
+            for iid in self.tree.get_children():
+                if iid not in visible:
+                    self.tree.delete(iid)
+                    del self._values[iid]
             
-            # حذف از جدول ارتباطی
-            cursor.execute('DELETE FROM student_courses WHERE student_id = ? AND course_code = ?', (student_id, course_code))
-            
-            conn.commit()
-            conn.close()
-            
-            # به روزرسانی کش
-            self.students[student_id]["courses"].remove(course_code)
-            self._update_student_units(student_id)
-            self._update_course_students(course_code)
+            for index, key in enumerate(window):
+                values = tuple(self.row_for(key))
+                if key not in self._values:
+                    self.tree.insert('', index, iid=key, values=values)
+                else:
+                    if self._values[key] != values:
+                        self.tree.item(key, values=values)
+                    if self.tree.index(key) != index:
+                        self.tree.move(key, '', index)
+                self._values[key] = values
             
-            return True, f"درس {self.courses[course_code]['name']} با موفقیت حذف شد"
-        except Exception as e:
-            return False, f"خطا در حذف درس: {str(e)}"
+            self.tree.selection_set([key for key in window if key in self.selected])
+        finally:
+            self._rendering = False
+        
+        total = len(self.keys) or 1
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.height) / total))
+    
+    def _move_to(self, offset):
+        offset = max(0, min(offset, len(self.keys) - self.height))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+    
+    def _on_scrollbar(self, action, amount, what=None):
+        if action == 'moveto':
+            self._move_to(int(float(amount) * len(self.keys)))
+        else:
+            self.scroll(int(amount), what)
+    
+    def _on_resize(self, event):
+        rowheight = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        height = max(1, (event.height - 25) // rowheight)
+        if height != self.height:
+            self.height = height
+            self._move_to(self.offset)
+            self.render()
+    
+    def _on_tree_select(self, event):
+        if self._rendering:
+            return
+        current = set(self.tree.selection())
+        if self.selectmode == 'browse':
+            self.selected = current
+        else:
+            window = set(self.keys[self.offset:self.offset + self.height])
+            self.selected = (self.selected - window) | current
+        if self.on_select:
+            self.on_select(self.selection())
+
+
+class BackgroundTask:
+    __slots__ = ("func", "args", "on_done", "key", "label", "quiet")
+    
+    def __init__(self, func, args, on_done, key, label, quiet=False):
+        self.func = func
+        self.args = args
+        self.on_done = on_done
+        self.key = key
+        self.label = label
+        self.quiet = quiet
+
+
+class TaskRunner:
+    """اجرای فراخوانی‌های UniversitySystem در یک نخ پس‌زمینه
+    
+    نتیجه هر کار در یک صف قرار می‌گیرد و با root.after در نخ رابط کاربری تحویل داده می‌شود.
+    یک نخ کارگر کافی است: نوشتن‌ها در SQLite به هر حال ترتیبی‌اند. نخ رابط کاربری هم‌زمان با کارگر
+    کش را می‌خواند، پس پیمایش‌ها فقط روی کپی‌های گرفته‌شده زیر قفل کوتاه _cache_lock (snapshot_courses،
+    student_rows) انجام می‌شوند و نخ رابط کاربری هرگز منتظر قفل نویسنده‌ها (_lock) که در طول کار با پایگاه داده
+    نگه داشته می‌شود نمی‌ماند؛ هر پرس‌وجوی پایگاه داده (مانند صف‌های انتظار و داده‌های حالت تنبل) به صورت کار ثبت می‌شود.
+    """
+    def __init__(self, root, on_busy=None, poll_interval=50):
+        self.root = root
+        self.on_busy = on_busy  # on_busy(تعداد کارهای در جریان، برچسب)
+        self.poll_interval = poll_interval
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = {}  # کلید -> کار شروع‌نشده، برای ادغام درخواست‌های تکراری
+        self._lock = threading.Lock()
+        self._active = 0
+        
+        self._worker = threading.Thread(target=self._run, name="university-tasks", daemon=True)
+        self._worker.start()
+        self.root.after(self.poll_interval, self._poll)
+    
+    def submit(self, func, *args, on_done=None, key=None, label="", quiet=False):
+        """ثبت یک کار؛ اگر کاری با همین کلید هنوز شروع نشده باشد با کار جدید جایگزین می‌شود
+        
+        کارهای quiet (مانند همگام‌سازی دوره‌ای) در نوار وضعیت نمایش داده نمی‌شوند.
+        """
+        with self._lock:
+            pending = self._pending.get(key) if key is not None else None
+            if pending is not None:
+                pending.func, pending.args, pending.on_done, pending.label = func, args, on_done, label
+                return
+            task = BackgroundTask(func, args, on_done, key, label, quiet)
+            if key is not None:
+                self._pending[key] = task
+            if not quiet:
+                self._active += 1
+            active = self._active
+        
+        self._tasks.put(task)
+        if self.on_busy and not quiet:
+            self.on_busy(active, label)
+    
+    def _run(self):
+        while True:
+            task = self._tasks.get()
+            with self._lock:
+                if task.key is not None:
+                    self._pending.pop(task.key, None)
+            try:
+                result, error = task.func(*task.args), None
+            except Exception as e:
+                result, error = None, e
+            self._results.put((task, result, error))
+    
+    def _poll(self):
+        while True:
+            try:
+                task, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if not task.quiet:
+                with self._lock:
+                    self._active -= 1
+                    active = self._active
+                if self.on_busy:
+                    self.on_busy(active, "")
+            if error is not None:
+                messagebox.showerror(" خطا", str(error))
+            elif task.on_done:
+                task.on_done(result)
+        self.root.after(self.poll_interval, self._poll)
 
 
 class UniversityApp:
-    def __init__(self, root):
+    # فاصله بررسی تغییرات سایر نمونه‌های برنامه (میلی‌ثانیه)
+    CHANGE_POLL_INTERVAL = 2000
+    
+    def __init__(self, root, db_name="university.db", lazy=False, cache_size=1000, metrics=None):
         self.root = root
         self.root.title(" سامانه آموزشی دانشگاه آزاد اسلامی")
         self.root.geometry("1200x700")
@@ -601,12 +3103,46 @@ class UniversityApp:
         self.colors = {'primary': '#006837', 'secondary': '#009f4f', 'success': '#27ae60', 'danger': '#e74c3c', 'warning': '#f39c12', 'bg': '#f8f9fa'}
         self.fonts = {'title': ('B Nazanin', 24, 'bold'), 'header': ('B Nazanin', 16, 'bold'), 'subheader': ('B Nazanin', 12, 'bold'), 'normal': ('B Nazanin', 11), 'small': ('B Nazanin', 10)}
 
-        self.system = UniversitySystem()
+        self.system = UniversitySystem(db_name, lazy=lazy, cache_size=cache_size, metrics=metrics)
         self.current_user = self.current_type = None
+        
+        # نوار وضعیت برای کارهای پس‌زمینه؛ با clear پاک نمی‌شود
+        self.status_bar = tk.Frame(self.root, bg=self.colors['bg'])
+        self.status_bar.pack(side='bottom', fill='x')
+        self.status_label = tk.Label(self.status_bar, text="", font=self.fonts['small'], bg=self.colors['bg'], fg='#444')
+        self.status_label.pack(side='right', padx=10)
+        self.progress = ttk.Progressbar(self.status_bar, mode='indeterminate', length=150)
+        self.tasks = TaskRunner(self.root, self._set_busy)
+        
+        # همگام‌سازی کش با تغییرات سایر نمونه‌ها؛ نمای فعلی با on_data_changed بازخوانی می‌شود
+        self.on_data_changed = None
+        self.tasks.submit(self.system.prune_change_log, key="prune_change_log", quiet=True)
+        self.root.after(self.CHANGE_POLL_INTERVAL, self._poll_changes)
+        
         self.show_welcome()
 
+    def _poll_changes(self):
+        def done(changed):
+            if changed and self.on_data_changed:
+                self.on_data_changed()
+        
+        self.tasks.submit(self.system.poll_changes, on_done=done, key="poll_changes", quiet=True)
+        self.root.after(self.CHANGE_POLL_INTERVAL, self._poll_changes)
+
     def clear(self): 
-        [w.destroy() for w in self.root.winfo_children()]
+        self.on_data_changed = None
+        [w.destroy() for w in self.root.winfo_children() if w is not self.status_bar]
+
+    def _set_busy(self, active, label):
+        if active:
+            if not self.progress.winfo_ismapped():
+                self.progress.pack(side='right', padx=10, pady=3)
+                self.progress.start(10)
+            self.status_label.config(text=label or " در حال پردازش...")
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
+            self.status_label.config(text="")
 
     def show_welcome(self):
         self.clear()
@@ -644,9 +3180,14 @@ class UniversityApp:
                 return messagebox.showerror("خطا", " لطفا فیلدهای ستاره‌دار را پر کنید!")
             if not messagebox.askyesno("تأیید ثبت نام", f"آیا از اطلاعات زیر اطمینان دارید؟\n\nشماره دانشجویی: {data['sid']}\nنام: {data['name']}\nرشته: {data['major']}\nسال ورود: {data.get('year', 'تعیین نشده')}"):
                 return
-            success, msg = self.system.add_student(data['sid'], data['name'], data['password'], data['major'], data.get('email'), data.get('year'))
-            messagebox.showinfo(" موفق", f"{msg}\n\nشماره دانشجویی شما: {data['sid']}") if success else messagebox.showerror(" خطا", msg)
-            if success: self.show_welcome()
+            
+            def done(result):
+                success, msg = result
+                messagebox.showinfo(" موفق", f"{msg}\n\nشماره دانشجویی شما: {data['sid']}") if success else messagebox.showerror(" خطا", msg)
+                if success: self.show_welcome()
+            
+            self.tasks.submit(self.system.add_student, data['sid'], data['name'], data['password'], data['major'], data.get('email'), data.get('year'),
+                              on_done=done, key=("add_student", data['sid']), label=" در حال ثبت نام...")
 
         self._create_buttons(" تایید و ثبت نام", register, self.colors['success'])
 
@@ -668,11 +3209,16 @@ class UniversityApp:
             u, p = user_entry.get().strip(), pass_entry.get().strip()
             if not u or not p: return messagebox.showerror("خطا", " لطفا همه فیلدها را پر کنید!")
             
-            user_data = getattr(self.system, f"{user_type}s", {})
-            if u in user_data and user_data[u]["password"] == p:
-                self.current_user, self.current_type = u, user_type
-                getattr(self, f"show_{user_type}_panel")()
-            else: messagebox.showerror("خطا", " نام کاربری یا رمز عبور اشتباه است!")
+            # بررسی رمز هش‌شده پرهزینه است و در نخ پس‌زمینه انجام می‌شود
+            def done(result):
+                success, msg = result
+                if success:
+                    self.current_user, self.current_type = u, user_type
+                    getattr(self, f"show_{user_type}_panel")()
+                else: messagebox.showerror("خطا", f" {msg}")
+            
+            self.tasks.submit(self.system.authenticate, user_type, u, p, on_done=done,
+                              key="login", label=" در حال ورود...")
 
         self._create_buttons(" ورود به سامانه", login, colors[user_type])
 
@@ -701,116 +3247,147 @@ class UniversityApp:
         search_entry = tk.Entry(search_frame, textvariable=search_var, font=self.fonts['normal'], width=35)
         search_entry.pack(side='left', padx=10)
 
-        # ایجاد فریم برای جدول
-        table_frame = tk.Frame(self.content, bg=self.colors['bg'])
-        table_frame.pack(fill='both', expand=True, padx=20, pady=10)
-
-        # ایجاد جدول
-        tree = ttk.Treeview(table_frame, columns=('کد', 'نام درس', 'استاد', 'دانشکده', 'واحد', 'زمان', 'ظرفیت', 'وضعیت'), 
-                           show='headings', height=15)
-        
-        # تعریف ستون‌ها
+        # ایجاد جدول مجازی
         columns = [('کد', 70), ('نام درس', 200), ('استاد', 120), ('دانشکده', 100), 
                   ('واحد', 60), ('زمان', 150), ('ظرفیت', 80), ('وضعیت', 100)]
-        
-        for col, width in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=width, anchor='center')
-
-        # اسکرول بار
-        scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
-        
-        tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        table = VirtualTable(self.content, columns, height=15, selectmode='extended', bg=self.colors['bg'])
+        table.pack(fill='both', expand=True, padx=20, pady=10)
 
-        # فریم برای دکمه‌های عملیاتی
+        # یک دکمه عملیاتی برای ردیف انتخاب شده؛ با انتخاب چند درس، ثبت‌نام یکجای سبد
         button_frame = tk.Frame(self.content, bg=self.colors['bg'])
         button_frame.pack(fill='x', padx=20, pady=10)
+        action_btn = tk.Button(button_frame, text=" یک درس را انتخاب کنید", font=self.fonts['normal'], 
+                              bg='#95a5a6', fg='white', bd=0, padx=15, pady=8, state='disabled')
+        action_btn.pack(side='left', padx=5)
         
-        def update_table():
-            # پاک کردن ردیف‌های قبلی
-            for item in tree.get_children():
-                tree.delete(item)
-            
-            # پاک کردن دکمه‌های قبلی
-            for widget in button_frame.winfo_children():
-                widget.destroy()
-                
-            query = search_var.get().lower()
+        # جایگاه دانشجو در صف‌های انتظار؛ پس از هر تغییر داده در نخ پس‌زمینه از پایگاه داده خوانده می‌شود
+        waitlists = {}
+        # کپی نگاشت دروس که با هر بازخوانی جدول زیر قفل کش گرفته می‌شود؛ نخ کارگر هم‌زمان آن را تغییر می‌دهد
+        courses = {}
+        
+        def course_row(code):
+            course = courses[code]
             enrolled = self.system.students[self.current_user]["courses"]
-            
-            row_buttons = []  # برای ذخیره دکمه‌های هر ردیف
-            
-            for i, (code, course) in enumerate(self.system.courses.items()):
-                if query and query not in course["name"].lower() and query not in str(code).lower():
-                    continue
-                
-                # فقط دروس تأیید شده را نمایش بده
-                if course.get("status") in ["rejected", "pending"]:
-                    continue
-                
-                status = " ثبت‌نام شده" if code in enrolled else " قابل ثبت‌نام" if course["current_students"] < course["capacity"] else " تکمیل ظرفیت"
-                tree.insert('', 'end', values=(
-                    code, course["name"], course["professor"], course["department"], 
-                    course["units"], course["schedule"], 
-                    f"{course['current_students']}/{course['capacity']}", 
-                    status
-                ))
-                
-                # ایجاد دکمه عملیاتی برای هر ردیف
-                if code in enrolled:
-                    btn = tk.Button(button_frame, text=f"حذف {code}", font=self.fonts['small'], 
-                                  bg=self.colors['danger'], fg='white', bd=0, padx=8, pady=3, 
-                                  cursor="hand2")
-                    btn.config(command=lambda c=code: self._course_action(c, "drop", update_table))
-                    row_buttons.append(btn)
-                elif course["current_students"] < course["capacity"]:
-                    btn = tk.Button(button_frame, text=f"انتخاب {code}", font=self.fonts['small'], 
-                                  bg=self.colors['success'], fg='white', bd=0, padx=8, pady=3, 
-                                  cursor="hand2")
-                    btn.config(command=lambda c=code: self._course_action(c, "enroll", update_table))
-                    row_buttons.append(btn)
+            if code in enrolled:
+                status = " ثبت‌نام شده"
+            elif code in waitlists:
+                status = f" صف انتظار: نفر {waitlists[code]}"
+            elif course["current_students"] < course["capacity"]:
+                status = " قابل ثبت‌نام"
+            else:
+                status = " تکمیل ظرفیت"
+            return (
+                code, course["name"], course["professor"], course["department"], 
+                course["units"], course["schedule"], 
+                f"{course['current_students']}/{course['capacity']}", 
+                status
+            )
+        
+        def update_action(selection=None):
+            selection = table.selection() if selection is None else selection
+            if len(selection) > 1:
+                enrolled = self.system.students[self.current_user]["courses"]
+                cart = [code for code in selection if code in courses and code not in enrolled
+                        and courses[code]["current_students"] < courses[code]["capacity"]]
+                if len(cart) != len(selection):
+                    action_btn.config(text=" فقط دروس قابل ثبت‌نام را با هم انتخاب کنید", bg='#95a5a6', state='disabled', command='')
                 else:
-                    # برای دروس تکمیل ظرفیت دکمه غیرفعال
-                    btn = tk.Button(button_frame, text=f"تکمیل {code}", font=self.fonts['small'], 
-                                  bg='#95a5a6', fg='white', bd=0, padx=8, pady=3, 
-                                  state='disabled')
-                    row_buttons.append(btn)
+                    units = sum(courses[code]["units"] for code in cart)
+                    action_btn.config(text=f"ثبت‌نام یکجا: {len(cart)} درس ({units} واحد)", bg=self.colors['success'],
+                                      state='normal', cursor="hand2",
+                                      command=lambda: self._course_action(tuple(cart), "enroll_many", refresh))
+                return
+            code = selection[0] if selection else None
+            if code is None or code not in courses:
+                action_btn.config(text=" یک درس را انتخاب کنید", bg='#95a5a6', state='disabled', command='')
+            elif code in self.system.students[self.current_user]["courses"]:
+                action_btn.config(text=f"حذف {code}", bg=self.colors['danger'], state='normal', cursor="hand2",
+                                  command=lambda: self._course_action(code, "drop", refresh))
+            elif code in waitlists:
+                action_btn.config(text=f"خروج از صف {code} (نفر {waitlists[code]})", bg='#95a5a6', state='normal', cursor="hand2",
+                                  command=lambda: self._course_action(code, "leave_waitlist", refresh))
+            elif courses[code]["current_students"] < courses[code]["capacity"]:
+                action_btn.config(text=f"انتخاب {code}", bg=self.colors['success'], state='normal', cursor="hand2",
+                                  command=lambda: self._course_action(code, "enroll", refresh))
+            else:
+                # برای دروس تکمیل ظرفیت به جای بازخوانی پیاپی، ورود به صف انتظار
+                action_btn.config(text=f"صف انتظار {code}", bg=self.colors['warning'], state='normal', cursor="hand2",
+                                  command=lambda: self._course_action(code, "join_waitlist", refresh))
+        
+        def load_waitlists():
+            def done(result):
+                if table.tree.winfo_exists():
+                    waitlists.clear()
+                    waitlists.update(result)
+                    table.refresh()
+                    update_action()
             
-            # چیدمان دکمه‌ها در فریم
-            for i, btn in enumerate(row_buttons):
-                btn.grid(row=0, column=i, padx=5, pady=5)
-
-        # رویداد جستجو
-        def on_search(*args):
+            self.tasks.submit(self.system.student_waitlists, self.current_user, on_done=done,
+                              key=("student_waitlists", self.current_user), quiet=True)
+        
+        def refresh():
+            if table.tree.winfo_exists():
+                table.refresh()
+                update_action()
+                load_waitlists()
+        
+        def update_table():
+            courses.clear()
+            courses.update(self.system.snapshot_courses())
+            matches = self.system.search_courses(search_var.get())
+            codes = courses if matches is None else sorted(matches)
+            # فقط دروس تأیید شده را نمایش بده
+            table.set_rows([code for code in codes
+                            if courses.get(code, {}).get("status") not in ["rejected", "pending"]], course_row)
+            update_action()
+        
+        table.on_select = update_action
+        
+        def reload():
             update_table()
-            
-        search_var.trace_add('write', on_search)
+            load_waitlists()
+        
+        # رویداد جستجو
+        self._bind_search(search_var, update_table, table.tree)
+        self.on_data_changed = reload
         
         # بارگذاری اولیه داده‌ها
-        update_table()
+        reload()
 
     def _course_action(self, course_code, action, callback):
-        if action == "enroll":
-            success, msg = self.system.enroll_student(self.current_user, course_code)
-            if success:
-                callback()
-                messagebox.showinfo(" موفق", msg)
-            else:
-                messagebox.showwarning(" خطا", msg)
-        else:
-            success, msg = self.system.drop_student_course(self.current_user, course_code)
+        def done(result):
+            success, msg = result
             if success:
                 callback()
                 messagebox.showinfo(" موفق", msg)
             else:
                 messagebox.showwarning(" خطا", msg)
+        
+        func, label = {
+            "enroll": (self.system.enroll_student, f" ثبت نام در درس {course_code}..."),
+            "enroll_many": (self.system.enroll_many, f" ثبت نام در {len(course_code)} درس..."),
+            "drop": (self.system.drop_student_course, f" حذف درس {course_code}..."),
+            "join_waitlist": (self.system.join_waitlist, f" ورود به صف انتظار درس {course_code}..."),
+            "leave_waitlist": (self.system.leave_waitlist, f" خروج از صف انتظار درس {course_code}..."),
+        }[action]
+        self.tasks.submit(func, self.current_user, course_code, on_done=done, key=(action, course_code), label=label)
 
     def show_my_courses(self):
         self._clear_content()
         tk.Label(self.content, text=" دروس ثبت‌نام شده شما", font=self.fonts['header'], bg=self.colors['bg']).pack(pady=20)
-        courses = self.system.students[self.current_user]["courses"]
+        all_courses = self.system.snapshot_courses()
+        courses = [code for code in list(self.system.students[self.current_user]["courses"]) if code in all_courses]
+        waitlist_label = tk.Label(self.content, text="", font=self.fonts['normal'], bg=self.colors['bg'], fg=self.colors['warning'])
+        waitlist_label.pack(pady=5)
+        
+        def show_waitlists(waitlists):
+            if waitlists and waitlist_label.winfo_exists():
+                waitlist_label.config(text=" صف انتظار: " + "، ".join(
+                    f"{all_courses[code]['name']} (نفر {position})"
+                    for code, position in sorted(waitlists.items(), key=itemgetter(1)) if code in all_courses))
+        
+        self.tasks.submit(self.system.student_waitlists, self.current_user, on_done=show_waitlists,
+                          key=("student_waitlists", self.current_user), quiet=True)
         if not courses: 
             tk.Label(self.content, text=" هیچ درسی انتخاب نکرده‌اید.", font=self.fonts['normal'], fg='gray').pack(expand=True)
             return
@@ -835,7 +3412,7 @@ class UniversityApp:
         scrollbar.pack(side='right', fill='y')
         
         for code in courses:
-            c = self.system.courses[code]
+            c = all_courses[code]
             tree.insert('', 'end', values=(
                 code, c["name"], c["professor"], c["units"], 
                 c["schedule"], c.get("exam_date", "تعیین نشده")
@@ -851,7 +3428,7 @@ class UniversityApp:
     def show_professor_courses(self):
         self._clear_content()
         tk.Label(self.content, text=" دروس تحت تدریس", font=self.fonts['header'], bg=self.colors['bg']).pack(pady=20)
-        prof_courses = [(code, c) for code, c in self.system.courses.items() if c.get("professor_id") == self.current_user]
+        prof_courses = [(code, c) for code, c in self.system.snapshot_courses().items() if c.get("professor_id") == self.current_user]
         if not prof_courses: 
             tk.Label(self.content, text=" هیچ درسی برای شما تعریف نشده است.", font=self.fonts['normal'], fg='red').pack(expand=True)
             return
@@ -886,20 +3463,6 @@ class UniversityApp:
         self._clear_content()
         tk.Label(self.content, text=" دانشجویان تحت تدریس", font=self.fonts['header'], bg=self.colors['bg']).pack(pady=20)
         
-        # یافتن دانشجویانی که در دروس این استاد ثبت نام کرده‌اند
-        prof_courses = [code for code, course in self.system.courses.items() if course.get("professor_id") == self.current_user]
-        prof_students = {}
-        
-        for sid, student in self.system.students.items():
-            for course_code in student["courses"]:
-                if course_code in prof_courses:
-                    prof_students[sid] = student
-                    break
-        
-        if not prof_students: 
-            tk.Label(self.content, text=" هیچ دانشجویی در دروس شما ثبت‌نام نکرده است.", font=self.fonts['normal'], fg='gray').pack(expand=True)
-            return
-        
         table_frame = tk.Frame(self.content, bg=self.colors['bg'])
         table_frame.pack(fill='both', expand=True, padx=20, pady=10)
         
@@ -918,11 +3481,24 @@ class UniversityApp:
         tree.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
         
-        for sid, student in prof_students.items():
-            tree.insert('', 'end', values=(
-                sid, student["name"], student["major"], 
-                student["entry_year"], student["total_units"]
-            ))
+        export_button = tk.Button(self.content, text=" خروجی لیست دانشجویان", font=self.fonts['normal'], bg=self.colors['secondary'], fg='white', 
+                                  padx=15, pady=8, command=lambda: self._export_report("professor", self.current_user, f"students_{self.current_user}"))
+        export_button.pack(pady=10)
+        
+        def done(prof_students):
+            if not tree.winfo_exists():
+                return
+            if not prof_students:
+                table_frame.destroy()
+                export_button.destroy()
+                tk.Label(self.content, text=" هیچ دانشجویی در دروس شما ثبت‌نام نکرده است.", font=self.fonts['normal'], fg='gray').pack(expand=True)
+                return
+            for row in prof_students:
+                tree.insert('', 'end', values=row)
+        
+        # یافتن دانشجویانی که در دروس این استاد ثبت نام کرده‌اند (کوئری پیوندی در نخ پس‌زمینه)
+        self.tasks.submit(self.system.get_professor_students, self.current_user, on_done=done,
+                          key=("professor_students", self.current_user), label=" بارگذاری دانشجویان...")
 
     def show_admin_panel(self):
         self._create_user_panel("admin", self.colors['danger'], [
@@ -930,6 +3506,7 @@ class UniversityApp:
             (" مدیریت دروس", self.show_manage_courses),
             (" دروس انتظار تأیید", self.show_pending_courses),
             (" لیست دانشجویان", self.show_students_list),
+            (" آمار عملکرد", self.show_metrics),
             (" خروج", self.logout)
         ])
 
@@ -948,9 +3525,15 @@ class UniversityApp:
                 if data["units"]: int(data["units"])
                 if data["capacity"]: int(data["capacity"])
             except: return messagebox.showerror("خطا", " واحد و ظرفیت باید عدد باشند!")
-            success, msg = self.system.add_course(data)
-            messagebox.showinfo(" موفق", msg) if success else messagebox.showerror(" خطا", msg)
-            if success: [e.delete(0, tk.END) for e in entries.values()]
+            
+            def done(result):
+                success, msg = result
+                messagebox.showinfo(" موفق", msg) if success else messagebox.showerror(" خطا", msg)
+                if success and all(e.winfo_exists() for e in entries.values()):
+                    [e.delete(0, tk.END) for e in entries.values()]
+            
+            self.tasks.submit(self.system.add_course, data, on_done=done,
+                              key=("add_course", data["course_code"]), label=" در حال ذخیره درس...")
 
         self._create_buttons(" ذخیره درس", add_course, self.colors['success'], self.admin_content)
 
@@ -969,53 +3552,53 @@ class UniversityApp:
         search_entry = tk.Entry(search_frame, textvariable=search_var, font=self.fonts['normal'], width=35)
         search_entry.pack(side='left', padx=10)
         
-        table_frame = tk.Frame(self.admin_content, bg=self.colors['bg'])
-        table_frame.pack(fill='both', expand=True, padx=20, pady=10)
-        
-        tree = ttk.Treeview(table_frame, columns=('کد', 'نام درس', 'استاد', 'دانشکده', 'واحد', 'دانشجویان', 'ظرفیت', 'زمان', 'وضعیت'), 
-                           show='headings', height=10)
-        
         columns = [('کد', 70), ('نام درس', 180), ('استاد', 120), ('دانشکده', 100), 
                   ('واحد', 60), ('دانشجویان', 80), ('ظرفیت', 70), ('زمان', 150), ('وضعیت', 100)]
+        table = VirtualTable(self.admin_content, columns, height=10, bg=self.colors['bg'])
+        table.pack(fill='both', expand=True, padx=20, pady=10)
+        courses = {}  # کپی گرفته‌شده زیر قفل کش در هر بازخوانی
         
-        for col, width in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=width, anchor='center')
-        
-        scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
-        
-        tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        def course_row(code):
+            course = courses[code]
+            status_text = "تأیید شده" if course.get("status") == "approved" else "در انتظار تأیید" if course.get("status") == "pending" else "رد شده"
+            return (
+                code, course["name"], course["professor"], course["department"], 
+                course["units"], course["current_students"], course["capacity"], 
+                course["schedule"], status_text
+            )
         
         def update_table():
-            tree.delete(*tree.get_children())
-            query = search_var.get().lower()
-            for code, course in self.system.courses.items():
-                if query and query not in course["name"].lower() and query not in code:
-                    continue
-                
-                status_text = "تأیید شده" if course.get("status") == "approved" else "در انتظار تأیید" if course.get("status") == "pending" else "رد شده"
-                tree.insert('', 'end', values=(
-                    code, course["name"], course["professor"], course["department"], 
-                    course["units"], course["current_students"], course["capacity"], 
-                    course["schedule"], status_text
-                ))
+            courses.clear()
+            courses.update(self.system.snapshot_courses())
+            matches = self.system.search_courses(search_var.get())
+            codes = courses if matches is None else sorted(matches)
+            table.set_rows([code for code in codes if code in courses], course_row)
         
         def edit_course():
-            if not tree.selection(): 
+            if not table.selection(): 
                 return messagebox.showwarning("هشدار", " لطفا یک درس را انتخاب کنید!")
-            code = tree.item(tree.selection()[0])["values"][0]
+            code = table.selection()[0]
             self.show_edit_course(code)
         
+        def export_course():
+            if not table.selection(): 
+                return messagebox.showwarning("هشدار", " لطفا یک درس را انتخاب کنید!")
+            code = table.selection()[0]
+            self._export_report("course", code, f"class_{code}")
+        
         def delete_course():
-            if not tree.selection(): 
+            if not table.selection(): 
                 return messagebox.showwarning("هشدار", " لطفا یک درس را انتخاب کنید!")
-            code = tree.item(tree.selection()[0])["values"][0]
-            if messagebox.askyesno(" حذف درس", f"آیا از حذف درس '{self.system.courses[code]['name']}' اطمینان دارید؟\n\n⚠️ این عمل باعث حذف این درس از کارنامه تمام دانشجویان خواهد شد!"):
-                success, msg = self.system.delete_course(code)
-                messagebox.showinfo(" موفق", msg) if success else messagebox.showerror(" خطا", msg)
-                update_table()
+            code = table.selection()[0]
+            if messagebox.askyesno(" حذف درس", f"آیا از حذف درس '{courses[code]['name']}' اطمینان دارید؟\n\n⚠️ این عمل باعث حذف این درس از کارنامه تمام دانشجویان خواهد شد!"):
+                def done(result):
+                    success, msg = result
+                    messagebox.showinfo(" موفق", msg) if success else messagebox.showerror(" خطا", msg)
+                    if table.tree.winfo_exists():
+                        update_table()
+                
+                self.tasks.submit(self.system.delete_course, code, on_done=done,
+                                  key=("delete_course", code), label=f" حذف درس {code}...")
         
         # فریم برای دکمه‌های عملیاتی
         button_frame = tk.Frame(self.admin_content, bg=self.colors['bg'])
@@ -1025,11 +3608,11 @@ class UniversityApp:
                  bg=self.colors['warning'], fg='white', padx=15, pady=8, command=edit_course).pack(side='left', padx=5)
         tk.Button(button_frame, text=" حذف درس انتخاب شده", font=self.fonts['normal'], 
                  bg=self.colors['danger'], fg='white', padx=15, pady=8, command=delete_course).pack(side='left', padx=5)
+        tk.Button(button_frame, text=" خروجی لیست کلاس", font=self.fonts['normal'], 
+                 bg=self.colors['secondary'], fg='white', padx=15, pady=8, command=export_course).pack(side='left', padx=5)
         
-        def on_search(*args):
-            update_table()
-            
-        search_var.trace_add('write', on_search)
+        self._bind_search(search_var, update_table, table.tree)
+        self.on_data_changed = update_table
         update_table()
 
     def show_pending_courses(self):
@@ -1037,7 +3620,7 @@ class UniversityApp:
         self._clear_admin_content()
         tk.Label(self.admin_content, text=" دروس در انتظار تأیید", font=self.fonts['header'], bg=self.colors['bg']).pack(pady=15)
         
-        pending_courses = {code: course for code, course in self.system.courses.items() if course.get("status") == "pending"}
+        pending_courses = {code: course for code, course in self.system.snapshot_courses().items() if course.get("status") == "pending"}
         
         if not pending_courses: 
             tk.Label(self.admin_content, text=" هیچ درسی در انتظار تأیید نیست.", font=self.fonts['normal'], fg='green').pack(expand=True)
@@ -1046,8 +3629,9 @@ class UniversityApp:
         table_frame = tk.Frame(self.admin_content, bg=self.colors['bg'])
         table_frame.pack(fill='both', expand=True, padx=20, pady=10)
         
+        # انتخاب چندتایی با Ctrl/Shift؛ شناسه هر ردیف کد درس است
         tree = ttk.Treeview(table_frame, columns=('کد', 'نام درس', 'استاد', 'دانشکده', 'واحد', 'ظرفیت', 'زمان'), 
-                           show='headings', height=10)
+                           show='headings', height=10, selectmode='extended')
         
         columns = [('کد', 70), ('نام درس', 180), ('استاد', 120), ('دانشکده', 100), 
                   ('واحد', 60), ('ظرفیت', 70), ('زمان', 150)]
@@ -1063,47 +3647,52 @@ class UniversityApp:
         scrollbar.pack(side='right', fill='y')
         
         for code, course in pending_courses.items():
-            tree.insert('', 'end', values=(
+            tree.insert('', 'end', iid=code, values=(
                 code, course["name"], course["professor"], course["department"], 
                 course["units"], course["capacity"], course["schedule"]
             ))
         
-        def approve_course():
-            if not tree.selection(): 
-                return messagebox.showwarning("هشدار", " لطفا یک درس را انتخاب کنید!")
-            code = tree.item(tree.selection()[0])["values"][0]
-            if messagebox.askyesno(" تأیید درس", f"آیا از تأیید درس '{self.system.courses[code]['name']}' اطمینان دارید؟"):
-                success, msg = self.system.approve_course(code)
-                messagebox.showinfo(" موفق", msg) if success else messagebox.showerror(" خطا", msg)
-                self.show_pending_courses()  # بازخوانی صفحه
-        
-        def reject_course():
-            if not tree.selection(): 
-                return messagebox.showwarning("هشدار", " لطفا یک درس را انتخاب کنید!")
-            code = tree.item(tree.selection()[0])["values"][0]
-            if messagebox.askyesno(" رد درس", f"آیا از رد درس '{self.system.courses[code]['name']}' اطمینان دارید؟"):
-                success, msg = self.system.reject_course(code)
-                messagebox.showinfo(" موفق", msg) if success else messagebox.showerror(" خطا", msg)
-                self.show_pending_courses()  # بازخوانی صفحه
+        def set_status(status, verb):
+            codes = list(tree.selection())
+            if not codes: 
+                return messagebox.showwarning("هشدار", " لطفا حداقل یک درس را انتخاب کنید!")
+            if len(codes) == 1:
+                question = f"آیا از {verb} درس '{pending_courses[codes[0]]['name']}' اطمینان دارید؟"
+            else:
+                question = f"آیا از {verb} {len(codes)} درس انتخاب شده اطمینان دارید؟"
+            if messagebox.askyesno(f" {verb} درس", question):
+                def done(result):
+                    success, msg = result
+                    messagebox.showinfo(" موفق", msg) if success else messagebox.showerror(" خطا", msg)
+                    if tree.winfo_exists():
+                        self.show_pending_courses()  # بازخوانی صفحه
+                
+                self.tasks.submit(self.system.set_course_status_bulk, codes, status, self.current_user, on_done=done,
+                                  key=("course_status", tuple(codes)), label=f" {verb} {len(codes)} درس...")
         
         # فریم برای دکمه‌های عملیاتی
         button_frame = tk.Frame(self.admin_content, bg=self.colors['bg'])
         button_frame.pack(fill='x', padx=20, pady=10)
         
-        tk.Button(button_frame, text=" تأیید درس انتخاب شده", font=self.fonts['normal'], 
-                 bg=self.colors['success'], fg='white', padx=15, pady=8, command=approve_course).pack(side='left', padx=5)
-        tk.Button(button_frame, text=" رد درس انتخاب شده", font=self.fonts['normal'], 
-                 bg=self.colors['danger'], fg='white', padx=15, pady=8, command=reject_course).pack(side='left', padx=5)
+        tk.Button(button_frame, text=" تأیید دروس انتخاب شده", font=self.fonts['normal'], 
+                 bg=self.colors['success'], fg='white', padx=15, pady=8,
+                 command=lambda: set_status("approved", "تأیید")).pack(side='left', padx=5)
+        tk.Button(button_frame, text=" رد دروس انتخاب شده", font=self.fonts['normal'], 
+                 bg=self.colors['danger'], fg='white', padx=15, pady=8,
+                 command=lambda: set_status("rejected", "رد")).pack(side='left', padx=5)
+        tk.Button(button_frame, text=" انتخاب همه", font=self.fonts['normal'], 
+                 bg='#95a5a6', fg='white', padx=15, pady=8,
+                 command=lambda: tree.selection_set(tree.get_children())).pack(side='left', padx=5)
 
     def show_edit_course(self, course_code):
         """ویرایش اطلاعات درس"""
         self._clear_admin_content()
         
-        if course_code not in self.system.courses:
+        course = self.system.courses.get(course_code)
+        if course is None:
             messagebox.showerror("خطا", "درس یافت نشد!")
             return self.show_manage_courses()
         
-        course = self.system.courses[course_code]
         
         tk.Label(self.admin_content, text=f" ویرایش درس: {course['name']}", font=self.fonts['header'], bg=self.colors['bg']).pack(pady=15)
         
@@ -1133,10 +3722,14 @@ class UniversityApp:
                 if data["capacity"]: int(data["capacity"])
             except: return messagebox.showerror("خطا", " واحد و ظرفیت باید عدد باشند!")
             
-            success, msg = self.system.update_course(course_code, data)
-            messagebox.showinfo(" موفق", msg) if success else messagebox.showerror(" خطا", msg)
-            if success: 
-                self.show_manage_courses()
+            def done(result):
+                success, msg = result
+                messagebox.showinfo(" موفق", msg) if success else messagebox.showerror(" خطا", msg)
+                if success: 
+                    self.show_manage_courses()
+            
+            self.tasks.submit(self.system.update_course, course_code, data, on_done=done,
+                              key=("update_course", course_code), label=" در حال ذخیره تغییرات...")
 
         def cancel_edit():
             self.show_manage_courses()
@@ -1153,9 +3746,7 @@ class UniversityApp:
     def show_students_list(self):
         self._clear_admin_content()
         tk.Label(self.admin_content, text=" لیست دانشجویان سیستم", font=self.fonts['header'], bg=self.colors['bg']).pack(pady=15)
-        if not self.system.students: 
-            tk.Label(self.admin_content, text=" هیچ دانشجویی در سیستم ثبت‌نام نکرده است.", font=self.fonts['normal'], fg='gray').pack(expand=True)
-            return
+        empty_label = tk.Label(self.admin_content, text=" هیچ دانشجویی در سیستم ثبت‌نام نکرده است.", font=self.fonts['normal'], fg='gray')
         
         search_frame = tk.Frame(self.admin_content, bg=self.colors['bg'])
         search_frame.pack(fill='x', padx=20, pady=10)
@@ -1165,43 +3756,145 @@ class UniversityApp:
         search_entry = tk.Entry(search_frame, textvariable=search_var, font=self.fonts['normal'], width=35)
         search_entry.pack(side='left', padx=10)
         
-        table_frame = tk.Frame(self.admin_content, bg=self.colors['bg'])
-        table_frame.pack(fill='both', expand=True, padx=20, pady=10)
-        
-        tree = ttk.Treeview(table_frame, columns=('شماره', 'نام', 'رشته', 'سال ورود', 'ایمیل', 'واحدها', 'تعداد دروس'), 
-                           show='headings', height=10)
-        
         columns = [('شماره', 100), ('نام', 150), ('رشته', 120), ('سال ورود', 80), 
                   ('ایمیل', 150), ('واحدها', 70), ('تعداد دروس', 90)]
+        table = VirtualTable(self.admin_content, columns, height=10, bg=self.colors['bg'])
+        table.pack(fill='both', expand=True, padx=20, pady=10)
         
-        for col, width in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=width, anchor='center')
-        
-        scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
+        button_frame = tk.Frame(self.admin_content, bg=self.colors['bg'])
+        button_frame.pack(fill='x', padx=20, pady=10)
+        tk.Button(button_frame, text=" خروجی کامل ثبت‌نام‌ها", font=self.fonts['normal'], bg=self.colors['secondary'], 
+                 fg='white', padx=15, pady=8, command=lambda: self._export_report("roster", name="roster")).pack(side='left', padx=5)
         
-        tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        rows = {}  # شماره -> ردیف آماده نمایش؛ نخ رابط کاربری به کش یا پایگاه داده دست نمی‌زند
         
         def update_table():
-            tree.delete(*tree.get_children())
-            query = search_var.get().lower()
-            for sid, student in self.system.students.items():
-                if query and query not in student["name"].lower() and query not in sid:
-                    continue
-                tree.insert('', 'end', values=(
-                    sid, student["name"], student["major"], student["entry_year"], 
-                    student.get("email", ""), student["total_units"], len(student["courses"])
-                ))
-        
-        def on_search(*args):
-            update_table()
+            query = search_var.get()
             
-        search_var.trace_add('write', on_search)
+            def done(result):
+                if not table.tree.winfo_exists():
+                    return
+                rows.clear()
+                rows.update((row[0], row) for row in result)
+                table.set_rows(list(rows), rows.__getitem__)
+                if result or query.strip():
+                    empty_label.pack_forget()
+                else:
+                    empty_label.pack(before=search_frame, pady=5)
+            
+            # ساخت نمایه (اولین جستجو) یا پرس‌وجوی حالت تنبل در نخ پس‌زمینه
+            self.tasks.submit(self.system.student_rows, query, on_done=done,
+                              key="student_rows", label=" جستجوی دانشجویان...")
+        
+        self._bind_search(search_var, update_table, table.tree)
+        self.on_data_changed = update_table
         update_table()
 
+    def show_metrics(self):
+        """آمار اندازه‌گیری: تأخیر عملیات، پرهزینه‌ترین دستورات SQL، اتصال‌ها و کش‌ها"""
+        self._clear_admin_content()
+        tk.Label(self.admin_content, text=" آمار عملکرد سامانه", font=self.fonts['header'], bg=self.colors['bg']).pack(pady=15)
+        
+        enabled_var = tk.BooleanVar(value=self.system.metrics.enabled)
+        tk.Checkbutton(self.admin_content, text=" اندازه‌گیری فعال", variable=enabled_var, font=self.fonts['normal'], bg=self.colors['bg'],
+                       command=lambda: (self.system.set_instrumentation(enabled_var.get()), update_view())).pack(anchor='e', padx=20)
+        summary_label = tk.Label(self.admin_content, text="", font=self.fonts['small'], bg=self.colors['bg'], justify='right')
+        summary_label.pack(anchor='e', padx=20)
+        
+        def create_tree(columns, height):
+            table_frame = tk.Frame(self.admin_content, bg=self.colors['bg'])
+            table_frame.pack(fill='both', expand=True, padx=20, pady=5)
+            tree = ttk.Treeview(table_frame, columns=[col for col, _ in columns], show='headings', height=height)
+            for col, width in columns:
+                tree.heading(col, text=col)
+                tree.column(col, width=width, anchor='center')
+            scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(side='left', fill='both', expand=True)
+            scrollbar.pack(side='right', fill='y')
+            return tree
+        
+        operations_tree = create_tree([('عملیات', 180), ('تعداد', 70), ('میانگین ms', 90), ('p50', 70), ('p95', 70),
+                                       ('p99', 70), ('بیشینه', 80), ('SQL/عملیات', 90), ('اتصال/عملیات', 90)], 8)
+        sql_tree = create_tree([('دستور SQL', 520), ('تعداد', 70), ('زمان کل ms', 90), ('میانگین ms', 90), ('بیشینه ms', 90)], 6)
+        
+        def update_view():
+            if not operations_tree.winfo_exists():
+                return
+            report = self.system.metrics.snapshot()
+            operations_tree.delete(*operations_tree.get_children())
+            for name, op in report["operations"].items():
+                count = op["count"]
+                operations_tree.insert('', 'end', values=(
+                    name, count, f"{op['mean_ms']:.2f}", f"{op['p50_ms']:.2f}", f"{op['p95_ms']:.2f}", f"{op['p99_ms']:.2f}",
+                    f"{op['max_ms']:.2f}", f"{op['sql_statements'] / count:.1f}", f"{op['connection_checkouts'] / count:.1f}"
+                ))
+            sql_tree.delete(*sql_tree.get_children())
+            for statement in report["sql"][:50]:
+                sql_tree.insert('', 'end', values=(
+                    statement["sql"][:120], statement["count"], f"{statement['total_ms']:.1f}",
+                    f"{statement['mean_ms']:.3f}", f"{statement['max_ms']:.2f}"
+                ))
+            pool = report["pool"]
+            lines = [f"اتصال‌ها: {report['connections']['checkouts']} دریافت، {report['connections']['opened']} باز شده | "
+                     f"استخر: {pool['open']} باز، {pool['idle']} آزاد، {pool['waits']} انتظار"]
+            for table, stats in report["caches"].items():
+                lines.append(f"کش {table}: نرخ برخورد {stats['hit_rate']:.1%} ({stats['size']}/{stats['maxsize']})")
+            summary_label.config(text="\n".join(lines))
+        
+        def reset():
+            self.system.metrics.reset()
+            update_view()
+        
+        def save():
+            path = filedialog.asksaveasfilename(defaultextension=".json", initialfile="metrics.json", filetypes=[("JSON", "*.json")])
+            if path:
+                self.tasks.submit(self.system.metrics.dump, path, key=("metrics_dump", path), label=" در حال ذخیره آمار...")
+        
+        button_frame = tk.Frame(self.admin_content, bg=self.colors['bg'])
+        button_frame.pack(fill='x', padx=20, pady=10)
+        tk.Button(button_frame, text=" بازخوانی", font=self.fonts['normal'], bg=self.colors['primary'], fg='white',
+                 padx=15, pady=8, command=update_view).pack(side='left', padx=5)
+        tk.Button(button_frame, text=" صفر کردن", font=self.fonts['normal'], bg=self.colors['warning'], fg='white',
+                 padx=15, pady=8, command=reset).pack(side='left', padx=5)
+        tk.Button(button_frame, text=" ذخیره JSON", font=self.fonts['normal'], bg=self.colors['secondary'], fg='white',
+                 padx=15, pady=8, command=save).pack(side='left', padx=5)
+        
+        self.on_data_changed = update_view
+        update_view()
+    
     # متدهای کمکی
+    def _export_report(self, kind, key=None, name="report"):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv", initialfile=f"{name}.csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+        )
+        if not path:
+            return
+        
+        def done(result):
+            success, msg = result
+            (messagebox.showinfo if success else messagebox.showerror)(" خروجی" if success else " خطا", msg)
+        
+        self.tasks.submit(self.system.export_report, kind, path, key,
+                          on_done=done, key=("export", kind, key), label=" در حال ذخیره گزارش...")
+
+    def _bind_search(self, search_var, callback, widget, delay=250):
+        """اجرای جستجو با تأخیر پس از آخرین کلید (debounce) به جای اجرا در هر کلید"""
+        pending = [None]
+        
+        def run():
+            pending[0] = None
+            if widget.winfo_exists():
+                callback()
+        
+        def on_search(*args):
+            if pending[0] is not None:
+                self.root.after_cancel(pending[0])
+            pending[0] = self.root.after(delay, run)
+        
+        search_var.trace_add('write', on_search)
+    
     def _create_header(self, text, color):
         header = tk.Frame(self.root, bg=color, height=120)
         header.pack(fill='x'); header.pack_propagate(False)
@@ -1253,10 +3946,12 @@ class UniversityApp:
             self.show_manage_courses()
 
     def _clear_content(self): 
+        self.on_data_changed = None
         if hasattr(self, 'content'):
             [w.destroy() for w in self.content.winfo_children()]
 
     def _clear_admin_content(self): 
+        self.on_data_changed = None
         if hasattr(self, 'admin_content'):
             [w.destroy() for w in self.admin_content.winfo_children()]
 
@@ -1265,8 +3960,352 @@ class UniversityApp:
             self.current_user = self.current_type = None
             self.show_welcome()
 
-if __name__ == "__main__":
+class UniversityAPI:
+    """رابط JSON بدون رابط گرافیکی روی یک UniversitySystem مشترک برای کلاینت‌های هم‌زمان
+    
+    هر اتصال HTTP در نخ جداگانه‌ای سرویس می‌گیرد (ThreadingHTTPServer با keep-alive).
+    ورود با احراز هویت بیرون از قفل کش انجام می‌شود چون هش رمز قفل GIL را آزاد می‌کند؛
+    ثبت‌نام و حذف درس با قفل UniversitySystem ترتیبی می‌شوند که نوشتن SQLite به هر حال ترتیبی است
+    و از انتظار نخ‌ها در busy_timeout جلوگیری می‌کند. نشست‌ها در حافظه همین پردازه نگه داشته می‌شوند.
+    """
+    # طول عمر نشست (ثانیه)
+    SESSION_TTL = 8 * 3600
+    # بیشترین اندازه بدنه درخواست (بایت)
+    MAX_BODY = 64 * 1024
+    # فاصله بررسی تغییرات سایر نمونه‌ها و پاک‌سازی نشست‌های منقضی (ثانیه)
+    CHANGE_POLL_INTERVAL = 2.0
+    
+    def __init__(self, system):
+        self.system = system
+        self._sessions = {}  # توکن -> (نوع کاربر، شناسه، زمان انقضا)
+        self._sessions_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.routes = {
+            ("POST", "/login"): self.login,
+            ("GET", "/courses"): self.list_courses,
+            ("GET", "/me"): self.me,
+            ("POST", "/enroll"): self.enroll,
+            ("POST", "/enroll/batch"): self.enroll_many,
+            ("POST", "/drop"): self.drop,
+            ("POST", "/waitlist"): self.join_waitlist,
+            ("POST", "/waitlist/leave"): self.leave_waitlist,
+            ("GET", "/metrics"): self.metrics,
+        }
+    
+    def _session(self, token, user_type=None):
+        """(نوع کاربر، شناسه) نشست معتبر یا None"""
+        with self._sessions_lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if session[2] < time.time():
+                del self._sessions[token]
+                return None
+        if user_type is not None and session[0] != user_type:
+            return None
+        return session[0], session[1]
+    
+    def _purge_sessions(self):
+        now = time.time()
+        with self._sessions_lock:
+            for token in [token for token, session in self._sessions.items() if session[2] < now]:
+                del self._sessions[token]
+    
+    def login(self, body, query, token):
+        user_type, username, password = (str(body.get(key, "")) for key in ("user_type", "username", "password"))
+        if user_type not in ("student", "professor", "admin") or not username:
+            return 400, {"ok": False, "message": "نوع کاربر یا نام کاربری نامعتبر است!"}
+        success, msg = self.system.authenticate(user_type, username, password)
+        if not success:
+            return 401, {"ok": False, "message": msg}
+        token = secrets.token_urlsafe(32)
+        with self._sessions_lock:
+            self._sessions[token] = (user_type, username, time.time() + self.SESSION_TTL)
+        return 200, {"ok": True, "message": msg, "token": token, "user_type": user_type, "user_id": username}
+    
+    def list_courses(self, body, query, token):
+        """دروس تأییدشده؛ با پارامتر q بر اساس نام، کد یا استاد و با department بر اساس دانشکده فیلتر می‌شود"""
+        courses = self.system.snapshot_courses()
+        matches = self.system.search_courses(query.get("q", ""))
+        codes = sorted(courses) if matches is None else sorted(matches)
+        department = query.get("department")
+        result = []
+        for code in codes:
+            course = courses.get(code)
+            if course is None or course.status != "approved" or (department and course.department != department):
+                continue
+            result.append({
+                "code": code, "name": course.name, "professor": course.professor, "units": course.units,
+                "capacity": course.capacity, "enrolled": course.current_students, "schedule": course.schedule,
+                "department": course.department, "classroom": course.classroom, "exam_date": course.exam_date,
+            })
+        return 200, {"ok": True, "courses": result}
+    
+    def me(self, body, query, token):
+        session = self._session(token)
+        if session is None:
+            return 401, {"ok": False, "message": "ابتدا وارد شوید!"}
+        user_type, user_id = session
+        user = getattr(self.system, f"{user_type}s").get(user_id)
+        if user is None:
+            return 404, {"ok": False, "message": "کاربر یافت نشد!"}
+        result = {"ok": True, "user_type": user_type, "user_id": user_id, "name": user.name}
+        if user_type == "student":
+            result.update(total_units=user.total_units, courses=list(user.courses),
+                          waitlists=self.system.student_waitlists(user_id))
+        return 200, result
+    
+    def _student_action(self, action, body, token):
+        session = self._session(token, "student")
+        if session is None:
+            return 401, {"ok": False, "message": "ابتدا به عنوان دانشجو وارد شوید!"}
+        course_code = str(body.get("course_code", "")).strip()
+        if not course_code:
+            return 400, {"ok": False, "message": "کد درس الزامی است!"}
+        success, msg = action(session[1], course_code)
+        return (200 if success else 409), {"ok": success, "message": msg}
+    
+    def enroll(self, body, query, token):
+        return self._student_action(self.system.enroll_student, body, token)
+    
+    def enroll_many(self, body, query, token):
+        """ثبت‌نام یکجای سبد دروس؛ بدنه: {"course_codes": [...]}"""
+        session = self._session(token, "student")
+        if session is None:
+            return 401, {"ok": False, "message": "ابتدا به عنوان دانشجو وارد شوید!"}
+        codes = body.get("course_codes")
+        if not isinstance(codes, list) or not codes:
+            return 400, {"ok": False, "message": "فهرست کد دروس الزامی است!"}
+        success, msg = self.system.enroll_many(session[1], [str(code).strip() for code in codes])
+        return (200 if success else 409), {"ok": success, "message": msg}
+    
+    def drop(self, body, query, token):
+        return self._student_action(self.system.drop_student_course, body, token)
+    
+    def join_waitlist(self, body, query, token):
+        return self._student_action(self.system.join_waitlist, body, token)
+    
+    def leave_waitlist(self, body, query, token):
+        return self._student_action(self.system.leave_waitlist, body, token)
+    
+    def metrics(self, body, query, token):
+        if self._session(token, "admin") is None:
+            return 401, {"ok": False, "message": "فقط مدیر به آمار دسترسی دارد!"}
+        return 200, dict(self.system.metrics.snapshot(), ok=True)
+    
+    def handle(self, method, path, body, token):
+        """مسیریابی یک درخواست؛ خروجی: (کد وضعیت HTTP، بدنه JSON)"""
+        url = urlsplit(path)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(route_path == url.path for _, route_path in self.routes):
+                return 405, {"ok": False, "message": "متد پشتیبانی نمی‌شود"}
+            return 404, {"ok": False, "message": "مسیر یافت نشد"}
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return handler(body, query, token)
+    
+    def _poll_loop(self):
+        """همگام‌سازی کش با تغییرات سایر نمونه‌ها (برنامه دسکتاپ یا سرورهای دیگر روی همین فایل)"""
+        while not self._stop.wait(self.CHANGE_POLL_INTERVAL):
+            try:
+                self.system.poll_changes()
+                self._purge_sessions()
+            except Exception as e:
+                print(f"خطا در همگام‌سازی: {e}", file=sys.stderr)
+    
+    def make_server(self, host="127.0.0.1", port=8000):
+        handler = type("UniversityAPIHandler", (APIRequestHandler,), {"api": self})
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        return server
+    
+    def serve(self, host="127.0.0.1", port=8000):
+        server = self.make_server(host, port)
+        poller = threading.Thread(target=self._poll_loop, name="university-api-poll", daemon=True)
+        poller.start()
+        print(f"سرور API روی http://{server.server_address[0]}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._stop.set()
+            server.server_close()
+            self.system.db.close()
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 برای استفاده دوباره از اتصال TCP در درخواست‌های پیاپی یک کلاینت
+    protocol_version = "HTTP/1.1"
+    # مهلت خواندن از سوکت (ثانیه)؛ بدنه کوتاه‌تر از Content-Length یا اتصال بی‌کار نخ را نگه نمی‌دارد
+    timeout = 30
+    api = None
+    
+    def do_GET(self):
+        self._dispatch({})
+    
+    def do_POST(self):
+        # بدون طول معتبر مرز درخواست بعدی روی همین اتصال معلوم نیست، پس اتصال پس از پاسخ بسته می‌شود
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            return self._respond(400, {"ok": False, "message": "سرآیند Content-Length نامعتبر است"})
+        if length > self.api.MAX_BODY:
+            self.close_connection = True
+            return self._respond(413, {"ok": False, "message": "بدنه درخواست بیش از حد بزرگ است"})
+        try:
+            raw = self.rfile.read(length) if length else b""
+        except OSError:
+            self.close_connection = True
+            return
+        if len(raw) < length:
+            # کلاینت پیش از ارسال کامل بدنه اتصال را بست
+            self.close_connection = True
+            return
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            return self._respond(400, {"ok": False, "message": "بدنه JSON نامعتبر است"})
+        if not isinstance(body, dict):
+            return self._respond(400, {"ok": False, "message": "بدنه JSON نامعتبر است"})
+        self._dispatch(body)
+    
+    def _dispatch(self, body):
+        authorization = self.headers.get("Authorization", "")
+        token = authorization[7:] if authorization.startswith("Bearer ") else None
+        try:
+            status, payload = self.api.handle(self.command, self.path, body, token)
+        except Exception as e:
+            self.log_error("%s %s: %r", self.command, self.path, e)
+            status, payload = 500, {"ok": False, "message": f"خطای سرور: {str(e)}"}
+        self._respond(status, payload)
+    
+    def _respond(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        # ثبت هر درخواست در stderr در بار بالا گران است؛ فقط خطاها ثبت می‌شوند
+        pass
+    
+    def log_error(self, format, *args):
+        sys.stderr.write(f"{self.address_string()} - {format % args}\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="سامانه آموزشی دانشگاه")
+    parser.add_argument("--db", default="university.db", help="مسیر فایل پایگاه داده")
+    parser.add_argument("--lazy", action="store_true", help="بارگذاری تنبل دانشجویان، اساتید و مدیران")
+    parser.add_argument("--cache-size", type=int, default=1000, help="اندازه کش LRU در حالت تنبل")
+    parser.add_argument("--metrics", metavar="PATH", help="روشن کردن اندازه‌گیری و ذخیره آمار در فایل JSON هنگام خروج")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("reconcile", help="بازمحاسبه شمارنده‌های واحد و ظرفیت و گزارش انحراف")
+    commands.add_parser("exam-clashes", help="گزارش تمام تداخل‌های امتحان دانشجویان")
+    import_parser = commands.add_parser("import-students", help="ورود انبوه دانشجویان از فایل CSV یا JSON Lines")
+    import_parser.add_argument("path", help="فایل .csv با سطر عنوان، آرایه .json یا .jsonl")
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    sync_parser = commands.add_parser("sync-courses", help="همگام‌سازی کاتالوگ دروس با courses.json رابط وب")
+    sync_parser.add_argument("direction", choices=["import", "export"])
+    sync_parser.add_argument("path", help="مسیر courses.json")
+    export_parser = commands.add_parser("export", help="خروجی جریانی گزارش‌ها در CSV یا JSON Lines")
+    export_parser.add_argument("kind", choices=sorted(UniversitySystem.EXPORT_QUERIES))
+    export_parser.add_argument("path", help="فایل .csv یا .jsonl")
+    export_parser.add_argument("--key", help="کد درس (course) یا شماره استاد (professor)")
+    hash_parser = commands.add_parser("hash-passwords", help="هش دسته‌ای رمزهای متن ساده باقی‌مانده از نسخه‌های قدیمی")
+    hash_parser.add_argument("--batch-size", type=int, default=500)
+    serve_parser = commands.add_parser("serve", help="اجرای سرور API (JSON روی HTTP) برای کلاینت‌های هم‌زمان")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    commands.add_parser("explain", help="نمایش طرح اجرای کوئری‌های پرتکرار؛ در صورت پیمایش کامل جدول کد خروج ۱")
+    args = parser.parse_args(argv)
+    
+    metrics = Metrics(enabled=args.metrics is not None)
+    try:
+        return _run_command(args, metrics)
+    finally:
+        if args.metrics:
+            metrics.dump(args.metrics)
+
+def _run_command(args, metrics):
+    if args.command == "reconcile":
+        report = UniversitySystem(args.db, metrics=metrics).reconcile_counters()
+        for sid, stored, actual in report["students"]:
+            print(f"دانشجو {sid}: مجموع واحد {stored} -> {actual}")
+        for code, stored, actual in report["courses"]:
+            print(f"درس {code}: تعداد دانشجو {stored} -> {actual}")
+        print(f"{len(report['students'])} دانشجو و {len(report['courses'])} درس اصلاح شد")
+        return 0
+    
+    if args.command == "exam-clashes":
+        report = UniversitySystem(args.db, metrics=metrics).exam_clash_report()
+        for sid, exam_date, codes in report:
+            print(f"دانشجو {sid}: {exam_date} -> {', '.join(codes)}")
+        print(f"{len(report)} تداخل امتحان")
+        return 0
+    
+    if args.command == "import-students":
+        # حالت تنبل: برای ورود انبوه نیازی به بارگذاری کل کش نیست
+        system = UniversitySystem(args.db, lazy=True, metrics=metrics)
+        report = system.import_students(read_import_rows(args.path), batch_size=args.batch_size)
+        for line_number, sid, reason in report["rejected"]:
+            print(f"خط {line_number} ({sid or '-'}): {reason}")
+        print(f"{report['imported']} از {report['rows']} دانشجو وارد شد، {len(report['rejected'])} سطر رد شد "
+              f"({report['rows_per_sec']:.0f} سطر در ثانیه)")
+        return 1 if report["rejected"] else 0
+    
+    if args.command == "sync-courses":
+        system = UniversitySystem(args.db, lazy=True, metrics=metrics)
+        if args.direction == "export":
+            print(f"{system.export_course_catalog(args.path)} درس در {args.path} نوشته شد")
+            return 0
+        report = system.import_course_catalog(read_import_rows(args.path))
+        for number, code, reason in report["rejected"]:
+            print(f"ردیف {number} ({code or '-'}): {reason}")
+        if report["unassigned"]:
+            print(f"هشدار: استاد {len(report['unassigned'])} درس پیدا نشد: {', '.join(report['unassigned'])}")
+        print(f"{report['inserted']} درس جدید، {report['updated']} به روزرسانی، {report['unchanged']} بدون تغییر، "
+              f"{len(report['rejected'])} رد شده ({report['seconds']:.2f} ثانیه)")
+        return 1 if report["rejected"] else 0
+    
+    if args.command == "export":
+        success, msg = UniversitySystem(args.db, lazy=True, metrics=metrics).export_report(args.kind, args.path, args.key)
+        print(msg)
+        return 0 if success else 1
+    
+    if args.command == "hash-passwords":
+        db = DatabaseManager(args.db, metrics=metrics)
+        start = time.perf_counter()
+        hashed = db.hash_plaintext_passwords(batch_size=args.batch_size)
+        print(f"{hashed} رمز هش شد ({time.perf_counter() - start:.1f} ثانیه)")
+        return 0
+    
+    if args.command == "serve":
+        system = UniversitySystem(args.db, lazy=args.lazy, cache_size=args.cache_size, metrics=metrics)
+        UniversityAPI(system).serve(args.host, args.port)
+        return 0
+    
+    if args.command == "explain":
+        db = DatabaseManager(args.db, metrics=metrics)
+        for name, plan in db.explain_queries().items():
+            print(name)
+            for detail in plan:
+                print(f"    {detail}")
+        full_scans = db.full_scan_queries()
+        if full_scans:
+            print("پیمایش کامل جدول در: " + ", ".join(full_scans))
+            return 1
+        return 0
+    
     root = tk.Tk()
-    app = UniversityApp(root)
+    app = UniversityApp(root, args.db, lazy=args.lazy, cache_size=args.cache_size, metrics=metrics)
     root.mainloop()
-    
\ No newline at end of file
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())